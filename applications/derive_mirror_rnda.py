@@ -62,6 +62,8 @@
         used to replace the default random_focal_length from the model.
     random_flen (float, optional)
         Value to replace the default random_focal_length. Only used if use_random_flen is activated.
+    workers (int, optional)
+        Number of sim_telarray jobs to run in parallel (default=1).
     test (activation mode, optional)
         If activated, application will be faster by simulating only few mirrors.
     verbosity (str, optional)
@@ -199,6 +201,12 @@ if __name__ == '__main__':
         type=float,
         required=False
     )
+    parser.add_argument(
+        '--workers',
+        help='Number of sim_telarray jobs to run in parallel (default=1)',
+        type=int,
+        default=1
+    )
     parser.add_argument(
         '--test',
         help='Test option will be faster by simulating only 10 mirrors.',
@@ -235,15 +243,16 @@ if __name__ == '__main__':
 
     def run(rnda, plot=False):
         ''' Runs the simulations for one given value of rnda '''
-        tel.changeParameters(mirror_reflection_random_angle=str(rnda))
+        # Each value of rnda gets its own model (and config file), sharing the other parameters.
+        telRnda = tel.derive(mirror_reflection_random_angle=str(rnda))
         ray = RayTracing(
-            telescopeModel=tel,
+            telescopeModel=telRnda,
             singleMirrorMode=True,
             mirrorNumbers=list(range(1, 10)) if args.test else 'all',
             useRandomFocalLength=args.use_random_flen,
             logger=logger.name
         )
-        ray.simulate(test=False, force=True)  # force has to be True, always
+        ray.simulate(test=False, force=True, maxWorkers=args.workers)  # force has to be True, always
         ray.analyze(force=True)
 
         # Plotting D80 histograms
@@ -288,10 +297,7 @@ if __name__ == '__main__':
     if args.rnda != 0:
         rndaStart = args.rnda
     else:
-        rndaStart = tel.getParameter('mirror_reflection_random_angle')
-        if isinstance(rndaStart, str):
-            rndaStart = rndaStart.split()
-            rndaStart = float(rndaStart[0])
+        rndaStart = tel.getParameterValue('mirror_reflection_random_angle', asArray=True)[0]
 
     if not args.no_tunning:
         resultsRnda = list()
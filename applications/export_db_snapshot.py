@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+
+'''
+    Summary
+    -------
+    This application exports a model version from MongoDB into a local SQLite snapshot,
+    including the files of tabulated data.
+
+    The snapshot can be used instead of MongoDB (e.g. on batch nodes without access to the DB)
+    by setting the config entry dbSnapshotFile to the name of the snapshot file.
+
+    Command line arguments
+    ----------------------
+    output_file (str, required)
+        Name of the snapshot file.
+    model_version (str, optional)
+        Model version (default=Current)
+    verbosity (str, optional)
+        Log level to print (default=INFO).
+
+    Example
+    -------
+    Current model
+
+    .. code-block:: console
+
+        python applications/export_db_snapshot.py --output_file model-current.sqlite
+'''
+
+import logging
+import argparse
+
+import simtools.config as cfg
+import simtools.util.general as gen
+from simtools import db_handler
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description=(
+            'Export a model version from MongoDB into a local SQLite snapshot.'
+        )
+    )
+    parser.add_argument(
+        '--output_file',
+        help='Name of the snapshot file',
+        type=str,
+        required=True
+    )
+    parser.add_argument(
+        '--model_version',
+        help='Model version (default=Current)',
+        type=str,
+        default='Current'
+    )
+    parser.add_argument(
+        '-v',
+        '--verbosity',
+        dest='logLevel',
+        action='store',
+        default='info',
+        help='Log level to print (default is INFO)'
+    )
+
+    args = parser.parse_args()
+    label = 'export_db_snapshot'
+
+    logger = logging.getLogger(label)
+    logger.setLevel(gen.getLogLevelFromUser(args.logLevel))
+
+    if not cfg.get('useMongoDB'):
+        raise ValueError('This application works only with MongoDB and you asked not to use it')
+
+    db = db_handler.DatabaseHandler(logger.name)
+    db.exportSnapshot(args.output_file, args.model_version)
@@ -64,7 +64,8 @@ if __name__ == '__main__':
         version = args.version
     pars = db.getModelParameters(args.tel_type, version)
     print()
-    pprint(pars[args.parameter])
+    # entryDate is only computed on request.
+    pprint({**pars[args.parameter], 'entryDate': pars[args.parameter]['entryDate']})
     print()
 
 
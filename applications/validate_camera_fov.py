@@ -97,7 +97,7 @@ if __name__ == '__main__':
     print('\nValidating the camera FoV of {}\n'.format(telModel.telescopeName))
 
     cameraConfigFile = telModel.getParameter('camera_config_file')
-    focalLength = float(telModel.getParameter('effective_focal_length'))
+    focalLength = telModel.getParameterValue('effective_focal_length')
     camera = Camera(
         telescopeName=telModel.telescopeName,
         cameraConfigFile=cfg.findFile(cameraConfigFile),
@@ -37,6 +37,10 @@
         Zenith angle in deg (default=20).
     max_offset (float, optional)
         Maximum offset angle in deg (default=4).
+    workers (int, optional)
+        Number of sim_telarray jobs to run in parallel (default=1).
+    parallel_runs (int, optional)
+        Number of repetitions of each sim_telarray job to run in parallel (default=1).
     test (activation mode, optional)
         If activated, application will be faster by simulating fewer photons.
     verbosity (str, optional)
@@ -114,6 +118,18 @@ if __name__ == '__main__':
         type=float,
         default=4
     )
+    parser.add_argument(
+        '--workers',
+        help='Number of sim_telarray jobs to run in parallel (default=1)',
+        type=int,
+        default=1
+    )
+    parser.add_argument(
+        '--parallel_runs',
+        help='Number of repetitions of each sim_telarray job to run in parallel (default=1)',
+        type=int,
+        default=1
+    )
     parser.add_argument(
         '--test',
         help='Test option will be faster by simulating fewer photons.',
@@ -157,7 +173,12 @@ if __name__ == '__main__':
         offAxisAngle=np.linspace(0, args.max_offset, int(args.max_offset / 0.25) + 1) * u.deg,
         logger=logger.name
     )
-    ray.simulate(test=args.test, force=False)
+    ray.simulate(
+        test=args.test,
+        force=False,
+        maxWorkers=args.workers,
+        maxParallelRuns=args.parallel_runs
+    )
     ray.analyze(force=True)
 
     # Plotting
@@ -0,0 +1,478 @@
+''' Module with an asyncio interface to the DB, to read several models concurrently. '''
+
+import asyncio
+import copy
+import logging
+
+import pymongo
+
+import simtools.config as cfg
+from simtools.db_handler import DatabaseHandler, ParameterEntry
+from simtools.util import names
+
+try:
+    # asyncio API of pymongo (pymongo >= 4.10)
+    from pymongo import AsyncMongoClient
+    from gridfs import AsyncGridFS
+except ImportError:
+    AsyncMongoClient = None
+    AsyncGridFS = None
+
+__all__ = ['AsyncDatabaseHandler']
+
+
+class AsyncDatabaseHandler:
+    '''
+    asyncio version of the reading methods of DatabaseHandler (getModelParameters,
+    getSiteParameters, readMongoDB and getFileMongoDB), based on the asyncio API of pymongo.
+    The SSH tunnel, the caches of parameters and tags and the local file store are the ones of
+    DatabaseHandler. With the Yaml DB or a DB snapshot, the DatabaseHandler methods are run in a
+    worker thread.
+
+    The MongoDB client is bound to the event loop in which it is first used, therefore an
+    instance must not be shared between event loops. It is closed by close or at the end of an
+    "async with" block.
+
+    Methods
+    -------
+    getModelParameters()
+        Get the model parameters of a specific telescope with a specific version.
+    getSiteParameters()
+        Get the site parameters of a specific version of a site.
+    readMongoDB()
+        Read the parameters of a telescope label from MongoDB.
+    getFileMongoDB()
+        Get a file from GridFS.
+    close()
+        Close the MongoDB client.
+    '''
+
+    def __init__(self, logger=__name__):
+        '''
+        AsyncDatabaseHandler init.
+
+        Parameters
+        ----------
+        logger: str
+            Logger name to use in this instance
+        '''
+        self._logger = logging.getLogger(logger)
+        self._logger.debug('Init AsyncDatabaseHandler')
+        self._dbHandler = DatabaseHandler(logger)
+        self._client = None
+        # Serializes the opening of the client (and the SSH tunnel) by concurrent tasks.
+        self._clientLock = asyncio.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        ''' Close the MongoDB client (the SSH tunnel is kept, see DatabaseHandler). '''
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    @staticmethod
+    def _useSyncHandler():
+        ''' The Yaml DB and the snapshots are read by DatabaseHandler. '''
+        return not cfg.get('useMongoDB') or DatabaseHandler.snapshot is not None
+
+    async def _getAsyncClient(self):
+        '''
+        Get the asyncio MongoDB client, opened on the first call through the SSH tunnel managed
+        by DatabaseHandler. The tunnel is opened (or restarted, if it died) in a worker thread,
+        so that the event loop is not blocked.
+
+        Returns
+        -------
+        AsyncMongoClient
+        '''
+        if AsyncMongoClient is None:
+            raise ImportError('The asyncio interface to the DB requires pymongo >= 4.10')
+
+        tunnel = DatabaseHandler.tunnel
+        if self._client is not None and (tunnel is None or tunnel.poll() is None):
+            return self._client
+
+        async with self._clientLock:
+            tunnel = DatabaseHandler.tunnel
+            if self._client is None or (tunnel is not None and tunnel.poll() is not None):
+                await asyncio.to_thread(self._dbHandler._openTunnel)
+            if self._client is not None:
+                return self._client
+            dbDetails = DatabaseHandler.dbDetails
+            self._client = AsyncMongoClient(
+                'localhost',
+                port=dbDetails['dbPort'],
+                username=dbDetails['userDB'],
+                password=dbDetails['passDB'],
+                authSource=dbDetails['authenticationDatabase'],
+                ssl=True,
+                tlsallowinvalidhostnames=True,
+                tlsallowinvalidcertificates=True,
+                maxPoolSize=DatabaseHandler.maxPoolSize,
+                minPoolSize=DatabaseHandler.minPoolSize
+            )
+            return self._client
+
+    async def _getParametersCollection(self, dbName, collectionName):
+        collection = (await self._getAsyncClient())[dbName][collectionName]
+        return collection.with_options(
+            codec_options=collection.codec_options.with_options(document_class=ParameterEntry)
+        )
+
+    async def _getTaggedVersion(self, dbName, version='Current'):
+        '''
+        Get the version of the "Current" or "Latest" tag, sharing the cache of DatabaseHandler.
+
+        Parameters
+        ----------
+        dbName: str
+            the name of the DB
+        version: str
+            Can be "Current" or "Latest" (default: "Current").
+
+        Returns
+        -------
+        str
+        '''
+        if version not in ['Current', 'Latest']:
+            raise ValueError('The only default versions are "Current" or "Latest"')
+
+        tags = DatabaseHandler.taggedVersionsCache.get(dbName)
+        DatabaseHandler.metrics.record('taggedVersionsCache', cacheHit=tags is not None, db=dbName)
+        if tags is None:
+            collection = (await self._getAsyncClient())[dbName].metadata
+            with DatabaseHandler.metrics.measure('getTaggedVersion', db=dbName) as event:
+                post = await collection.find_one(
+                    {'Entry': 'Simulation-Model-Tags'},
+                    sort=[('_id', pymongo.DESCENDING)]
+                )
+                event['documents'] = 1
+            tags = post['Tags']
+            DatabaseHandler.taggedVersionsCache.set(dbName, tags)
+
+        return tags[version]['Value']
+
+    async def _readParameters(
+        self,
+        operation,
+        dbName,
+        collectionName,
+        query,
+        nameField,
+        fields=None
+    ):
+        '''
+        Run a query on the telescopes or sites collection, returning the entries of each
+        parameter in the format of DatabaseHandler.readMongoDB. The query is recorded in the
+        DatabaseHandler metrics as operation.
+        '''
+        collection = await self._getParametersCollection(dbName, collectionName)
+        projection = DatabaseHandler._getParametersProjection(fields)
+        _parameters = dict()
+        with DatabaseHandler.metrics.measure(
+            operation,
+            version=query['Version'],
+            source='mongoDB',
+            **{nameField.lower(): query[nameField]}
+        ) as event:
+            async for post in collection.find(query, projection):
+                parNow = post.pop('Parameter')
+                post.pop(nameField, None)
+                _parameters[parNow] = post
+            event['documents'] = len(_parameters)
+        if len(_parameters) == 0:
+            raise ValueError(
+                'The following query returned zero results! Check the input data and rerun.\n',
+                query
+            )
+        return _parameters
+
+    async def readMongoDB(
+        self,
+        dbName,
+        telescopeName,
+        version,
+        runLocation,
+        writeFiles=True,
+        onlyApplicable=False,
+        fields=None
+    ):
+        '''
+        asyncio version of DatabaseHandler.readMongoDB.
+
+        Parameters
+        ----------
+        dbName: str
+            the name of the DB
+        telescopeName: str
+        version: str
+            Version of the model.
+        runLocation: Path or str
+            The sim_telarray run location to write the tabulated data files into.
+        writeFiles: bool
+            If true, write the files to the runLocation.
+        onlyApplicable: bool
+            If True, only applicable parameters will be read.
+        fields: list of str, optional
+            Fields of the entries to be read. If not given, all the fields are read.
+
+        Returns
+        -------
+        dict containing the parameters
+        '''
+        if self._useSyncHandler():
+            return await asyncio.to_thread(
+                self._dbHandler.readMongoDB,
+                dbName,
+                telescopeName,
+                version,
+                runLocation,
+                writeFiles,
+                onlyApplicable,
+                fields
+            )
+
+        _version = version
+        if version in ['Current', 'Latest']:
+            _version = await self._getTaggedVersion(dbName, version)
+
+        query = {
+            'Telescope': telescopeName,
+            'Version': _version,
+        }
+        if onlyApplicable:
+            query['Applicable'] = onlyApplicable
+        _parameters = await self._readParameters(
+            'readMongoDB',
+            dbName,
+            'telescopes',
+            query,
+            'Telescope',
+            fields
+        )
+
+        if writeFiles:
+            await self._writeFiles(dbName, runLocation, _parameters)
+
+        return _parameters
+
+    async def _writeFiles(self, dbName, path, parameters):
+        '''
+        Write the files listed in the parameter values into path, using the file store and the
+        download threads of DatabaseHandler.
+        '''
+        if path is None:
+            return
+        await asyncio.to_thread(
+            self._dbHandler.writeFilesFromMongoToDisk,
+            dbName,
+            path,
+            [_parInfo['Value'] for _parInfo in parameters.values() if _parInfo['File']]
+        )
+
+    async def getModelParameters(
+        self,
+        telescopeName,
+        version,
+        runLocation=None,
+        onlyApplicable=False,
+        fields=None
+    ):
+        '''
+        asyncio version of DatabaseHandler.getModelParameters. The entries of the camera and
+        structure of MSTs and SSTs are read concurrently.
+
+        Parameters
+        ----------
+        telescopeName: str
+        version: str
+            Version of the model.
+        runLocation: Path or str
+            The sim_telarray run location to write the tabulated data files into.
+        onlyApplicable: bool
+            If True, only applicable parameters will be read.
+        fields: list of str, optional
+            Fields of the MongoDB entries to be read (see DatabaseHandler.getModelParameters).
+
+        Returns
+        -------
+        dict containing the parameters
+        '''
+        if self._useSyncHandler():
+            return await asyncio.to_thread(
+                self._dbHandler.getModelParameters,
+                telescopeName,
+                version,
+                runLocation,
+                onlyApplicable,
+                fields
+            )
+
+        dbName = DatabaseHandler.DB_CTA_SIMULATION_MODEL
+        _version = version
+        if version in ['Current', 'Latest']:
+            _version = await self._getTaggedVersion(dbName, version)
+
+        _cacheKey = DatabaseHandler._getParametersCacheKey(
+            'model',
+            dbName,
+            names.validateTelescopeName(telescopeName),
+            _version,
+            onlyApplicable,
+            fields
+        )
+        _pars = DatabaseHandler.parametersCache.get(_cacheKey)
+        DatabaseHandler.metrics.record(
+            'parametersCache',
+            cacheHit=_pars is not None,
+            key=_cacheKey
+        )
+        if _pars is not None:
+            self._logger.debug('Using cached parameters for {}'.format(_cacheKey))
+            await self._writeFiles(dbName, runLocation, _pars)
+            return copy.deepcopy(_pars)
+
+        _versionValidated = names.validateModelVersionName(_version)
+        _labels = DatabaseHandler._getTelescopeLabelsMongoDB(telescopeName, onlyApplicable)
+        _labelPars = await asyncio.gather(*[
+            self.readMongoDB(
+                dbName,
+                _tel,
+                _versionValidated,
+                runLocation,
+                False,
+                _selectOnlyApplicable,
+                fields
+            )
+            for _tel, _selectOnlyApplicable in _labels
+        ])
+        _pars = dict()
+        for _telPars in _labelPars:
+            _pars.update(_telPars)
+
+        await self._writeFiles(dbName, runLocation, _pars)
+        DatabaseHandler.parametersCache.set(_cacheKey, copy.deepcopy(_pars))
+        return _pars
+
+    async def getSiteParameters(
+        self,
+        site,
+        version,
+        runLocation,
+        onlyApplicable=False,
+        fields=None
+    ):
+        '''
+        asyncio version of DatabaseHandler.getSiteParameters.
+
+        Parameters
+        ----------
+        site: str
+        version: str
+            Version of the model.
+        runLocation: Path or str
+            The sim_telarray run location to write the tabulated data files into.
+        onlyApplicable: bool
+            If True, only applicable parameters will be read.
+        fields: list of str, optional
+            Fields of the MongoDB entries to be read (see DatabaseHandler.getModelParameters).
+
+        Returns
+        -------
+        dict containing the parameters
+        '''
+        if self._useSyncHandler():
+            return await asyncio.to_thread(
+                self._dbHandler.getSiteParameters,
+                site,
+                version,
+                runLocation,
+                onlyApplicable,
+                fields
+            )
+
+        if site not in ['North', 'South']:
+            raise ValueError('Site must be "North" or "South" (case sensitive!)')
+
+        dbName = DatabaseHandler.DB_CTA_SIMULATION_MODEL
+        _version = version
+        if version in ['Current', 'Latest']:
+            _version = await self._getTaggedVersion(dbName, version)
+
+        _cacheKey = DatabaseHandler._getParametersCacheKey(
+            'site',
+            dbName,
+            site,
+            _version,
+            onlyApplicable,
+            fields
+        )
+        _pars = DatabaseHandler.parametersCache.get(_cacheKey)
+        DatabaseHandler.metrics.record(
+            'parametersCache',
+            cacheHit=_pars is not None,
+            key=_cacheKey
+        )
+        if _pars is not None:
+            self._logger.debug('Using cached parameters for {}'.format(_cacheKey))
+            await self._writeFiles(dbName, runLocation, _pars)
+            return copy.deepcopy(_pars)
+
+        query = {
+            'Site': site,
+            'Version': _version,
+        }
+        if onlyApplicable:
+            query['Applicable'] = onlyApplicable
+        _pars = await self._readParameters(
+            'getSiteParameters',
+            dbName,
+            'sites',
+            query,
+            'Site',
+            fields
+        )
+
+        await self._writeFiles(dbName, runLocation, _pars)
+        DatabaseHandler.parametersCache.set(_cacheKey, copy.deepcopy(_pars))
+        return _pars
+
+    async def getFileMongoDB(self, dbName, fileName):
+        '''
+        asyncio version of DatabaseHandler.getFileMongoDB.
+
+        Parameters
+        ----------
+        dbName: str
+            the name of the DB with files of tabulated data
+        fileName: str
+            The name of the file requested
+
+        Returns
+        -------
+        AsyncGridOut or SnapshotFile
+            A file instance returned by GridFS find_one (latest revision of the file), or by the
+            snapshot, if used.
+        '''
+        if self._useSyncHandler():
+            return await asyncio.to_thread(self._dbHandler.getFileMongoDB, dbName, fileName)
+
+        fileSystem = AsyncGridFS((await self._getAsyncClient())[dbName])
+        with DatabaseHandler.metrics.measure('getFileMongoDB', file=fileName) as event:
+            file = await fileSystem.find_one(
+                {'filename': fileName},
+                sort=DatabaseHandler.GRIDFS_LATEST_FIRST
+            )
+            event['documents'] = int(file is not None)
+        if file is None:
+            raise FileNotFoundError(
+                'The file {} does not exist in the database {}'.format(fileName, dbName)
+            )
+        return file
+
+# END of AsyncDatabaseHandler
@@ -155,10 +155,10 @@ class CameraEfficiency:
         pixelDiameter = self._telescopeModel.camera.getPixelDiameter()
 
         # Processing focal length
-        focalLength = self._telescopeModel.getParameter('effective_focal_length')
+        focalLength = self._telescopeModel.getParameterValue('effective_focal_length')
         if focalLength == 0.:
             self._logger.warning('Using focal_lenght because effective_focal_length is 0')
-            focalLength = self._telescopeModel.getParameter('focal_length')
+            focalLength = self._telescopeModel.getParameterValue('focal_length')
 
         # Processing mirror class
         mirrorClass = 1
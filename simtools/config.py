@@ -3,13 +3,30 @@
 import logging
 import yaml
 import copy
+import json
 import os
 from pathlib import Path
 
-__all__ = ['setConfigFileName', 'loadConfig', 'get', 'findFile', 'change']
+__all__ = [
+    'setConfigFileName',
+    'loadConfig',
+    'get',
+    'findFile',
+    'change',
+    'clearConfigCache',
+    'setFileIndexCacheFileName',
+    'clearFileIndexes'
+]
 
 logger = logging.getLogger(__name__)
 
+# Parsed config files, indexed by their absolute path.
+CONFIG_SNAPSHOTS = dict()
+
+# Filename indexes of the directories searched by findFile, indexed by their absolute path.
+FILE_INDEXES = dict()
+FILE_INDEX_CACHE_FILE_NAME = None
+
 
 class ConfigEnvironmentalVariableNotSet(Exception):
     pass
@@ -29,6 +46,72 @@ def setConfigFileName(fileName):
     CONFIG_FILE_NAME = fileName
 
 
+def _getConfigFileName(fileName=None):
+    '''
+    Return the config file name following the options described in loadConfig.
+
+    Parameters
+    ----------
+    fileName: str, optional
+        Config file name.
+
+    Returns
+    -------
+    str
+    '''
+    if fileName is not None:
+        return fileName
+    elif 'CONFIG_FILE_NAME' in globals():
+        return CONFIG_FILE_NAME
+    else:
+        return 'config.yml'
+
+
+def _getConfigSnapshot(fileName=None):
+    '''
+    Return the in-memory snapshot of a config file. The file is only parsed if it was not
+    read before by this process or if its modification time or size changed since then.
+
+    Parameters
+    ----------
+    fileName: str, optional
+        Config file name.
+
+    Returns
+    -------
+    dict
+        Snapshot with the parsed config (key config) and the cache of the values of the
+        environmental variables (key environ).
+    '''
+    thisFileName = os.path.abspath(_getConfigFileName(fileName))
+    fileStat = os.stat(thisFileName)
+    snapshot = CONFIG_SNAPSHOTS.get(thisFileName, None)
+    if (
+        snapshot is None
+        or snapshot['mtime'] != fileStat.st_mtime_ns
+        or snapshot['size'] != fileStat.st_size
+    ):
+        logger.debug('Reading config file {}'.format(thisFileName))
+        with open(thisFileName, 'r') as stream:
+            config = yaml.load(stream, Loader=yaml.FullLoader)
+        snapshot = {
+            'mtime': fileStat.st_mtime_ns,
+            'size': fileStat.st_size,
+            'config': config,
+            'environ': dict()
+        }
+        CONFIG_SNAPSHOTS[thisFileName] = snapshot
+    return snapshot
+
+
+def clearConfigCache():
+    '''
+    Remove all the config snapshots kept in memory. The config file will be read again by the
+    next call to get or loadConfig, as well as the values of the environmental variables.
+    '''
+    CONFIG_SNAPSHOTS.clear()
+
+
 def loadConfig(fileName=None):
     '''
     Load config file and return it as a dict.
@@ -37,6 +120,8 @@ def loadConfig(fileName=None):
     2nd - CONFIG_FILE_NAME exists (set by setConfigFileName)
     3rd - ./config.yml
 
+    The parsed file is kept in memory and only read again if it was modified.
+
     Parameters
     ----------
     fileName: str, optional
@@ -47,15 +132,7 @@ def loadConfig(fileName=None):
     dict
         A dictionary containing all the info from the global configuration setting.
     '''
-    if fileName is not None:
-        thisFileName = fileName
-    elif 'CONFIG_FILE_NAME' in globals():
-        thisFileName = CONFIG_FILE_NAME
-    else:
-        thisFileName = 'config.yml'
-
-    with open(thisFileName, 'r') as stream:
-        config = yaml.load(stream, Loader=yaml.FullLoader)
+    config = copy.copy(_getConfigSnapshot(fileName)['config'])
 
     # Running over the parameters set for change
     if 'CONFIG_CHANGED_PARS' in globals():
@@ -65,6 +142,29 @@ def loadConfig(fileName=None):
     return config
 
 
+def _getEnvironmentalVariable(par, value):
+    '''
+    Get the value of the environmental variable given by a config entry (e.g. $SIMTELPATH or
+    ${SIMTELPATH}).
+
+    Raises
+    ------
+    ConfigEnvironmentalVariableNotSet
+        If the environmental variable is not set.
+    '''
+    envName = value[1:].replace('{', '')
+    envName = envName.replace('}', '')
+    envPath = os.environ.get(envName)
+    if envPath is None:
+        msg = (
+            'Config entry {} is interpreted as environmental variables '.format(par)
+            + 'that is not set.'
+        )
+        logger.error(msg)
+        raise ConfigEnvironmentalVariableNotSet(msg)
+    return envPath
+
+
 def get(par):
     '''
     Get a single entry from the config settings.
@@ -78,23 +178,22 @@ def get(par):
     -------
     Value of the entry from the config settings.
     '''
-    config = loadConfig()
+    if 'CONFIG_CHANGED_PARS' in globals() and par in CONFIG_CHANGED_PARS:
+        value = CONFIG_CHANGED_PARS[par]
+        if isinstance(value, str) and value[0] == '$':
+            return _getEnvironmentalVariable(par, value)
+        return value
+
+    snapshot = _getConfigSnapshot()
+    config = snapshot['config']
     if par not in config.keys():
         logger.error('Config does not contain {}'.format(par))
         raise KeyError()
     else:
         if isinstance(config[par], str) and config[par][0] == '$':
-            envName = config[par][1:].replace('{', '')
-            envName = envName.replace('}', '')
-            envPath = os.environ.get(envName)
-            if envPath is None:
-                msg = (
-                    'Config entry {} is interpreted as environmental variables '.format(par)
-                    + 'that is not set.'
-                )
-                logger.error(msg)
-                raise ConfigEnvironmentalVariableNotSet(msg)
-            return envPath
+            if par not in snapshot['environ']:
+                snapshot['environ'][par] = _getEnvironmentalVariable(par, config[par])
+            return snapshot['environ'][par]
         else:
             return config[par]
 
@@ -135,9 +234,167 @@ def getConfigArg(name, value):
     return Path(value) if value is not None else get(name)
 
 
+def setFileIndexCacheFileName(fileName):
+    '''
+    Set the file in which the filename indexes used by findFile are persisted between
+    processes. If it is not set, the indexes are only kept in memory.
+
+    Parameters
+    ----------
+    fileName: str or Path
+        Index cache file name (json format). None turns off the persistence.
+    '''
+    logger.debug('Setting the file index cache file name to {}'.format(fileName))
+    global FILE_INDEX_CACHE_FILE_NAME
+    FILE_INDEX_CACHE_FILE_NAME = fileName
+    # Indexes in memory may not be in the new cache file yet.
+    _loadFileIndexCache()
+
+
+def clearFileIndexes():
+    ''' Remove all the filename indexes kept in memory. '''
+    FILE_INDEXES.clear()
+
+
+def _buildFileIndex(directory):
+    '''
+    Walk a directory recursively and index the path of all files by their names. If a name
+    appears more than once, the first one found is kept (files of a directory first, then each
+    sub-directory in alphabetical order).
+
+    Parameters
+    ----------
+    directory: str
+        Absolute path of the directory.
+
+    Returns
+    -------
+    dict
+        Index with the paths of the files (key files) and the modification times of all the
+        directories (key dirMtimes).
+    '''
+    logger.debug('Indexing directory {}'.format(directory))
+    files = dict()
+    dirMtimes = dict()
+    for root, subdirs, fileNames in os.walk(directory, followlinks=True):
+        subdirs.sort()
+        dirMtimes[root] = os.stat(root).st_mtime_ns
+        for fileName in sorted(fileNames):
+            files.setdefault(fileName, os.path.join(root, fileName))
+    return {'files': files, 'dirMtimes': dirMtimes}
+
+
+def _isFileIndexOutdated(index):
+    '''
+    Check whether any directory of an index was modified (files added, removed or renamed).
+
+    Returns
+    -------
+    bool
+    '''
+    for directory, mtime in index['dirMtimes'].items():
+        try:
+            if os.stat(directory).st_mtime_ns != mtime:
+                return True
+        except FileNotFoundError:
+            return True
+    return False
+
+
+def _loadFileIndexCache():
+    ''' Load the indexes persisted in the index cache file, if it is set and exists. '''
+    if FILE_INDEX_CACHE_FILE_NAME is None:
+        return
+    cacheFile = Path(FILE_INDEX_CACHE_FILE_NAME)
+    if not cacheFile.exists():
+        return
+    try:
+        with open(cacheFile, 'r') as stream:
+            indexes = json.load(stream)
+    except (OSError, ValueError):
+        logger.warning('File index cache {} could not be read'.format(cacheFile))
+        return
+    for directory, index in indexes.items():
+        if directory not in FILE_INDEXES and not _isFileIndexOutdated(index):
+            FILE_INDEXES[directory] = index
+
+
+def _saveFileIndexCache():
+    ''' Write the indexes in memory into the index cache file, if it is set. '''
+    if FILE_INDEX_CACHE_FILE_NAME is None:
+        return
+    cacheFile = Path(FILE_INDEX_CACHE_FILE_NAME)
+    tmpFile = cacheFile.with_name(cacheFile.name + '.{}.tmp'.format(os.getpid()))
+    try:
+        with open(tmpFile, 'w') as stream:
+            json.dump(FILE_INDEXES, stream)
+        os.replace(tmpFile, cacheFile)
+    except OSError:
+        logger.warning('File index cache {} could not be written'.format(cacheFile))
+
+
+def _getFileIndex(directory, checkOutdated=False):
+    '''
+    Get the filename index of a directory, building it if needed.
+
+    Parameters
+    ----------
+    directory: str
+        Absolute path of the directory.
+    checkOutdated: bool
+        If True, the index is rebuilt in case any of its directories was modified.
+
+    Returns
+    -------
+    dict
+    '''
+    index = FILE_INDEXES.get(directory, None)
+    if index is None or (checkOutdated and _isFileIndexOutdated(index)):
+        index = _buildFileIndex(directory)
+        FILE_INDEXES[directory] = index
+        _saveFileIndexCache()
+    return index
+
+
+def _searchFileIndexes(directories, name):
+    '''
+    Search for a file in the filename indexes of several directories. All the indexes are
+    searched first without checking them against the directory modification times, which are
+    only checked (and the outdated indexes rebuilt) if the file is not found in any of them
+    (or if it was removed).
+
+    Parameters
+    ----------
+    directories: list of str or Path
+        Locations where to search for the file (recursively), in order of priority.
+    name: str
+        File name to be searched for.
+
+    Returns
+    -------
+    Path of the file if found, otherwise None.
+    '''
+    absDirectories = list()
+    for directory in directories:
+        if Path(directory).is_dir():
+            absDirectories.append(os.path.abspath(directory))
+        else:
+            logger.debug('Directory {} does not exist'.format(directory))
+
+    for checkOutdated in [False, True]:
+        for absDirectory in absDirectories:
+            filePath = _getFileIndex(absDirectory, checkOutdated)['files'].get(name, None)
+            if filePath is not None and os.path.exists(filePath):
+                logger.debug('File {} found in {}'.format(name, absDirectory))
+                return Path(filePath)
+    return None
+
+
 def findFile(name, loc=None):
     '''
     Search for model files inside of given directories, recursively, and return its full path.
+    The given directories are indexed once per process (see setFileIndexCacheFileName to persist
+    the indexes), so that files are found without walking the directories again.
 
     Parameters
     ----------
@@ -188,10 +445,16 @@ def findFile(name, loc=None):
     if ff is not None:
         return ff
     # Searching file in given locations
-    for ll in allLocations:
-        ff = _searchDirectory(ll, name, True)
+    # Names containing a directory cannot be found in the filename indexes.
+    if Path(name).name == str(name):
+        ff = _searchFileIndexes(allLocations, name)
         if ff is not None:
             return ff
+    else:
+        for ll in allLocations:
+            ff = _searchDirectory(ll, name, True)
+            if ff is not None:
+                return ff
     msg = 'File {} could not be found in {}'.format(name, loc)
     logger.error(msg)
     raise FileNotFoundError(msg)
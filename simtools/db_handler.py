@@ -1,29 +1,60 @@
 ''' Module to handle interaction with DB. '''
 
 import logging
+import copy
 import datetime
+import hashlib
+import os
+import pickle
+import shutil
 import yaml
 import shlex
 import subprocess
 import time
+import uuid
 import atexit
 import getpass
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from bson.objectid import ObjectId
 from threading import Lock
 
 import pymongo
 import gridfs
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from pymongo.errors import BulkWriteError
 from astropy.time import Time
 
 import simtools.config as cfg
+import simtools.io_handler as io
+from simtools.db_snapshot import DBSnapshot, SnapshotFile
 from simtools.util import names
+from simtools.util.cache import TimedLRUCache
+from simtools.util.metrics import QueryMetrics
 from simtools.util.model import getTelescopeClass
 
 __all__ = ['DatabaseHandler']
 
+# libyaml based loader is much faster, if available.
+YAML_LOADER = getattr(yaml, 'CFullLoader', yaml.FullLoader)
+
+
+class ParameterEntry(dict):
+    '''
+    Dict holding a parameter entry read from MongoDB. The entryDate (creation time of the entry)
+    is not stored, but computed from the _id when it is requested.
+    '''
+    def __missing__(self, key):
+        if key == 'entryDate' and '_id' in self:
+            return ObjectId(self['_id']).generation_time
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
 
 class DatabaseHandler:
     '''
@@ -38,18 +69,48 @@ class DatabaseHandler:
     -------
     getModelParameters()
         Get the model parameters of a specific telescope with a specific version.
+    getModelParametersMultiple()
+        Get the model parameters of several telescopes, reading them with a single query.
     getSiteParameters()
         Get the site parameters of a specific version of a site.
+    diffModelVersions()
+        Get the parameters added, removed and changed between two model versions.
     copyTelescope()
         Copy a full telescope configuration of a specific version to a new telescope name.
     deleteQuery()
         Delete all entries from the DB which correspond to the provided query.
     updateParameter()
         Update a parameter value for a specific telescope/version.
+    updateParameters()
+        Update several parameter values with a single bulk write.
+    ensureIndexes()
+        Create the indexes used by the queries of this class.
+    explainQueries()
+        Get the execution statistics of the standard queries.
     addParameter()
         Add a parameter value for a specific telescope.
     addNewParamete()
         Add a new parameter for a specific telescope.
+    writeFilesFromMongoToDisk()
+        Write several files from MongoDB to disk, downloading them concurrently.
+    setParametersCache(maxSize=128, ttl=600, useDiskCache=False)
+        Replace the cache of the model and site parameters.
+    setTaggedVersionsCache(ttl=300)
+        Set the time-to-live of the cached versions of the "Current" and "Latest" tags.
+    refreshTaggedVersions(dbName=None)
+        Forget the cached versions of the tags, so that they are read again from the DB.
+    setConnectionPool(maxPoolSize=100, minPoolSize=0)
+        Set the size of the connection pool of the MongoDB client.
+    closeConnection()
+        Close the MongoDB client and the SSH tunnel.
+    setSnapshotFile(fileName)
+        Read the MongoDB entries from a SQLite snapshot.
+    exportSnapshot(fileName, version='Current')
+        Export a model version from MongoDB into a SQLite snapshot.
+    getMetrics(reset=False)
+        Get the timings, documents, bytes and cache hits/misses of the DB operations.
+    setMetricsLogEvents(logEvents=True)
+        Log each DB operation as a structured (JSON) event.
     '''
 
     # TODO move into config file?
@@ -57,8 +118,51 @@ class DatabaseHandler:
     DB_CTA_SIMULATION_MODEL = 'CTA-Simulation-Model'
     DB_CTA_SIMULATION_MODEL_DESCRIPTIONS = 'CTA-Simulation-Model-Descriptions'
 
+    # Connection to MongoDB shared by all instances, opened when first needed (see _getDBClient).
     dbClient = None
     tunnel = None
+    dbDetails = None
+    maxPoolSize = 100
+    minPoolSize = 0
+    _connectionLock = Lock()
+    _closeRegistered = False
+    parsedYamlFiles = dict()
+    parametersCache = TimedLRUCache(maxSize=128, ttl=600, logger=__name__)
+    # Versions of the "Current" and "Latest" tags of each DB (see setTaggedVersionsCache).
+    taggedVersionsCache = TimedLRUCache(maxSize=16, ttl=300, logger=__name__)
+    # Timings, documents, bytes and cache hits/misses of the DB operations (see getMetrics).
+    metrics = QueryMetrics(logger=__name__)
+
+    # Local content-addressed store of the files from GridFS.
+    useFileStore = True
+    fileStoreMaxSize = 2 * 1024**3  # bytes
+    # Number of threads used to download files from GridFS.
+    fileDownloadMaxWorkers = 8
+    # SQLite snapshot replacing the MongoDB (see setSnapshotFile).
+    snapshot = None
+    # Number of documents inserted per insert_many call when copying.
+    insertChunkSize = 1000
+    # Compound indexes matching the queries run by this class (see ensureIndexes).
+    INDEXES = {
+        'telescopes': [
+            [('Telescope', pymongo.ASCENDING), ('Version', pymongo.ASCENDING),
+             ('Parameter', pymongo.ASCENDING)],
+            [('Telescope', pymongo.ASCENDING), ('Parameter', pymongo.ASCENDING),
+             ('_id', pymongo.DESCENDING)],
+            [('Version', pymongo.ASCENDING)]
+        ],
+        'sites': [
+            [('Site', pymongo.ASCENDING), ('Version', pymongo.ASCENDING),
+             ('Parameter', pymongo.ASCENDING)]
+        ],
+        'metadata': [
+            [('Entry', pymongo.ASCENDING), ('_id', pymongo.DESCENDING)]
+        ]
+    }
+    # Fields of the entries compared by diffModelVersions.
+    DIFF_FIELDS = ['Value', 'Type', 'Applicable', 'File']
+    # Sort of the GridFS files putting the latest revision of each file name first.
+    GRIDFS_LATEST_FIRST = [('uploadDate', pymongo.DESCENDING), ('_id', pymongo.DESCENDING)]
 
     def __init__(
         self,
@@ -76,10 +180,14 @@ class DatabaseHandler:
         self._logger.debug('Initialize DatabaseHandler')
 
         if cfg.get('useMongoDB'):
-            if DatabaseHandler.dbClient is None or DatabaseHandler.tunnel is None:
-                with Lock():
-                    self.dbDetails = self._readDetailsMongoDB()
-                    DatabaseHandler.dbClient, DatabaseHandler.tunnel = self._openMongoDB()
+            if DatabaseHandler.snapshot is None:
+                # The optional config entry dbSnapshotFile replaces the MongoDB by a snapshot.
+                _snapshotFile = cfg.loadConfig().get('dbSnapshotFile', None)
+                if _snapshotFile is not None:
+                    DatabaseHandler.setSnapshotFile(_snapshotFile)
+            if DatabaseHandler.snapshot is not None:
+                self._logger.debug('Using DB snapshot {}'.format(DatabaseHandler.snapshot))
+            # The connection to MongoDB is only opened when first needed (see _getDBClient).
 
     # END of _init_
 
@@ -100,41 +208,96 @@ class DatabaseHandler:
 
         return dbDetails
 
-    def _openMongoDB(self):
+    def _getDBClient(self):
         '''
-        Open a connection to MongoDB and return the client to read/write to the DB with.
+        Get the MongoDB client shared by all the DatabaseHandler instances (and threads) of the
+        process. The SSH tunnel and the client are opened on the first call. If the tunnel
+        process died in the meantime, it is restarted (the client reconnects by itself).
 
         Returns
         -------
-        A PyMongo DB client and the tunnel process handle
+        MongoClient
+        '''
+        with DatabaseHandler._connectionLock:
+            if DatabaseHandler.dbClient is None:
+                self._startTunnel()
+                DatabaseHandler.dbClient = self._openMongoDB()
+            elif DatabaseHandler.tunnel is not None:
+                self._startTunnel()
+            return DatabaseHandler.dbClient
+
+    def _openTunnel(self):
+        '''
+        Open the SSH tunnel to the MongoDB (reading the DB details), or restart it if the tunnel
+        process died, without opening the MongoDB client. Used by clients other than the one
+        of _getDBClient (e.g. AsyncDatabaseHandler). Nothing is done if a client was set without
+        tunnel.
         '''
+        with DatabaseHandler._connectionLock:
+            if DatabaseHandler.dbClient is None or DatabaseHandler.tunnel is not None:
+                self._startTunnel()
 
-        user = getpass.getuser()
+    def _startTunnel(self):
+        '''
+        Start the SSH tunnel if it is not running (the _connectionLock must be held).
+        The DB details are read if needed.
+        '''
+        if DatabaseHandler.dbDetails is None:
+            DatabaseHandler.dbDetails = self._readDetailsMongoDB()
+
+        if DatabaseHandler.tunnel is not None:
+            if DatabaseHandler.tunnel.poll() is None:
+                return
+            self._logger.warning('SSH tunnel exited with code {}, restarting it'.format(
+                DatabaseHandler.tunnel.returncode
+            ))
+        DatabaseHandler.tunnel = self._createTunnelFromDetails()
+        if not DatabaseHandler._closeRegistered:
+            atexit.register(DatabaseHandler.closeConnection)
+            DatabaseHandler._closeRegistered = True
 
-        # Start tunnel
-        _tunnel = self._createTunnel(
-            localport=self.dbDetails['localport'],
-            remoteport=self.dbDetails['remoteport'],
-            user=user,
-            mongodbServer=self.dbDetails['mongodbServer'],
-            tunnelServer=self.dbDetails['tunnelServer']
-        )
-        atexit.register(self._closeSSHTunnel, [_tunnel])
+    def _openMongoDB(self):
+        '''
+        Open a connection to MongoDB (through the SSH tunnel, see _startTunnel) and return the
+        client to read/write to the DB with.
 
-        userDB = self.dbDetails['userDB']
+        Returns
+        -------
+        A PyMongo DB client
+        '''
+
+        userDB = DatabaseHandler.dbDetails['userDB']
         dbServer = 'localhost'
         _dbClient = MongoClient(
             dbServer,
-            port=self.dbDetails['dbPort'],
+            port=DatabaseHandler.dbDetails['dbPort'],
             username=userDB,
-            password=self.dbDetails['passDB'],
-            authSource=self.dbDetails['authenticationDatabase'],
+            password=DatabaseHandler.dbDetails['passDB'],
+            authSource=DatabaseHandler.dbDetails['authenticationDatabase'],
             ssl=True,
             tlsallowinvalidhostnames=True,
-            tlsallowinvalidcertificates=True
+            tlsallowinvalidcertificates=True,
+            maxPoolSize=DatabaseHandler.maxPoolSize,
+            minPoolSize=DatabaseHandler.minPoolSize
         )
 
-        return _dbClient, _tunnel
+        return _dbClient
+
+    def _createTunnelFromDetails(self):
+        '''
+        Create the SSH tunnel described in the MongoDB details.
+
+        Returns
+        -------
+        Tunnel process handle.
+        '''
+        return self._createTunnel(
+            localport=DatabaseHandler.dbDetails['localport'],
+            remoteport=DatabaseHandler.dbDetails['remoteport'],
+            user=getpass.getuser(),
+            mongodbServer=DatabaseHandler.dbDetails['mongodbServer'],
+            tunnelServer=DatabaseHandler.dbDetails['tunnelServer']
+        )
 
     def _createTunnel(self, localport, remoteport, user, mongodbServer, tunnelServer):
         '''
@@ -176,23 +339,323 @@ class DatabaseHandler:
         # after the script ends
         return _tunnel
 
-    def _closeSSHTunnel(self, tunnels):
+    @classmethod
+    def closeConnection(cls):
+        '''
+        Close the MongoDB client and the SSH tunnel, if open. A new connection is opened
+        when the DB is used again. Called at exit.
+        '''
+        with cls._connectionLock:
+            if cls.dbClient is not None:
+                cls.dbClient.close()
+                cls.dbClient = None
+            if cls.tunnel is not None:
+                logging.getLogger(__name__).info('Closing SSH tunnel')
+                cls.tunnel.kill()
+                cls.tunnel.wait()
+                cls.tunnel = None
+
+    @classmethod
+    def setConnectionPool(cls, maxPoolSize=100, minPoolSize=0):
+        '''
+        Set the size of the connection pool of the MongoDB client. An open client is closed,
+        so that the next DB access opens a new one with the new settings.
+
+        Parameters
+        ----------
+        maxPoolSize: int
+            Maximum number of connections kept by the client (i.e., concurrent operations).
+        minPoolSize: int
+            Minimum number of connections kept open by the client.
+        '''
+        cls.maxPoolSize = maxPoolSize
+        cls.minPoolSize = minPoolSize
+        with cls._connectionLock:
+            if cls.dbClient is not None:
+                cls.dbClient.close()
+                cls.dbClient = None
+
+    @classmethod
+    def setParametersCache(cls, maxSize=128, ttl=600, useDiskCache=False):
+        '''
+        Replace the cache of the results of getModelParameters and getSiteParameters.
+
+        Parameters
+        ----------
+        maxSize: int
+            Maximum number of results kept in memory.
+        ttl: float
+            Time-to-live of the cached results in seconds. None means no expiration.
+        useDiskCache: bool
+            If True, results are also stored in the cache directory
+            (see io_handler.getCacheDirectory), so they can be reused by later processes.
+        '''
+        cacheDirectory = (
+            io.getCacheDirectory(cfg.get('outputLocation'), 'db-parameters')
+            if useDiskCache else None
+        )
+        cls.parametersCache = TimedLRUCache(
+            maxSize=maxSize,
+            ttl=ttl,
+            cacheDirectory=cacheDirectory,
+            logger=__name__
+        )
+
+    @classmethod
+    def setTaggedVersionsCache(cls, ttl=300):
         '''
-        Close SSH tunnels given in the process handles "tunnels"
+        Set the time-to-live of the cached versions of the "Current" and "Latest" tags.
 
         Parameters
         ----------
-        tunnels: a tunnel process handle (or a list of those)
+        ttl: float
+            Time-to-live in seconds. None means that the tags are read only once per process
+            (unless refreshTaggedVersions is called) and 0 that they are always read from the DB.
         '''
+        cls.taggedVersionsCache = TimedLRUCache(maxSize=16, ttl=ttl, logger=__name__)
 
-        self._logger.info('Closing SSH tunnel(s)')
-        if not isinstance(tunnels, list):
-            tunnels = [tunnels]
+    @classmethod
+    def refreshTaggedVersions(cls, dbName=None):
+        '''
+        Forget the cached versions of the "Current" and "Latest" tags, so that they are read
+        again from the DB (e.g. after a new version was tagged).
 
-        for _tunnel in tunnels:
-            _tunnel.kill()
+        Parameters
+        ----------
+        dbName: str, optional
+            the name of the DB. If not given, the tags of all DBs are forgotten.
+        '''
+        cls.taggedVersionsCache.invalidate(
+            None if dbName is None else (lambda key: key == dbName)
+        )
 
-        return
+    @classmethod
+    def setSnapshotFile(cls, fileName):
+        '''
+        Read the MongoDB entries (parameters, tags and files) from a SQLite snapshot written by
+        exportSnapshot, instead of connecting to the MongoDB. The snapshot can also be given by
+        the config entry dbSnapshotFile.
+
+        Parameters
+        ----------
+        fileName: str or Path
+            Name of the snapshot file. If None, the MongoDB is used again.
+        '''
+        cls.snapshot = DBSnapshot(fileName, logger=__name__) if fileName is not None else None
+        cls.parametersCache.invalidate(lambda key: key[1] in ['mongoDB', 'snapshot'])
+
+    @classmethod
+    def getMetrics(cls, reset=False):
+        '''
+        Get the metrics of the DB operations of all instances: number of calls and errors,
+        total and maximum time (in seconds), documents returned, bytes downloaded and cache
+        hits/misses. The operations are the DB queries (e.g. readMongoDB, getTaggedVersion),
+        the file downloads (downloadFile), the files written to disk (writeFileFromMongoToDisk),
+        the Yaml DB files loaded (loadYamlFile) and the accesses to the caches (parametersCache,
+        taggedVersionsCache and fileStore). The time of an operation includes the time of the
+        operations it calls.
+
+        Parameters
+        ----------
+        reset: bool
+            If True, the metrics are reset after being read.
+
+        Returns
+        -------
+        dict
+            Metrics (dict) of each operation.
+        '''
+        metrics = cls.metrics.snapshot()
+        if reset:
+            cls.metrics.reset()
+        return metrics
+
+    @classmethod
+    def setMetricsLogEvents(cls, logEvents=True):
+        '''
+        Log (INFO level) each DB operation as a JSON event, with its duration, documents,
+        bytes, cache hit and details (e.g. telescope name and version). The event dict is also
+        attached to the log records as dbMetricsEvent, to be used by structured log handlers.
+
+        Parameters
+        ----------
+        logEvents: bool
+            If True, events are logged.
+        '''
+        cls.metrics.logEvents = logEvents
+
+    @staticmethod
+    def _getParametersSource():
+        ''' Source of the parameters, used in the keys of the parameters cache. '''
+        if not cfg.get('useMongoDB'):
+            return 'yaml'
+        return 'mongoDB' if DatabaseHandler.snapshot is None else 'snapshot'
+
+    def exportSnapshot(self, fileName, version='Current', dbName=None):
+        '''
+        Export a model version from MongoDB into a SQLite snapshot, including the tags and
+        the files of tabulated data used by the parameters. The snapshot can then be used
+        with setSnapshotFile (or the config entry dbSnapshotFile), e.g. on nodes without
+        access to the DB.
+
+        Parameters
+        ----------
+        fileName: str or Path
+            Name of the snapshot file.
+        version: str
+            Version of the model.
+        dbName: str, optional
+            the name of the DB (default is DB_CTA_SIMULATION_MODEL).
+        '''
+        if DatabaseHandler.snapshot is not None:
+            raise RuntimeError('A snapshot can only be exported from MongoDB')
+
+        dbName = DatabaseHandler.DB_CTA_SIMULATION_MODEL if dbName is None else dbName
+        tags = {_tag: self._getTaggedVersion(dbName, _tag) for _tag in ['Current', 'Latest']}
+        _version = tags[version] if version in tags else version
+        self._logger.info('Exporting version {} of DB {} into {}'.format(
+            _version,
+            dbName,
+            fileName
+        ))
+
+        entries = list()
+        for collectionName, nameField in [('telescopes', 'Telescope'), ('sites', 'Site')]:
+            collection = self._getParametersCollection(dbName, collectionName)
+            for post in collection.find({'Version': _version}):
+                name = post.pop(nameField)
+                parameter = post.pop('Parameter')
+                entries.append((collectionName, name, _version, parameter, post))
+
+        fileNames = sorted({entry['Value'] for *_, entry in entries if entry['File']})
+        fileSystem = gridfs.GridFS(self._getDBClient()[dbName])
+        # Only the latest revision of each file is exported.
+        _latestFiles = dict()
+        for file in fileSystem.find(
+            {'filename': {'$in': fileNames}},
+            sort=DatabaseHandler.GRIDFS_LATEST_FIRST
+        ):
+            _latestFiles.setdefault(file.filename, file)
+        files = (
+            (file.filename, getattr(file, 'md5', None), file.read())
+            for file in _latestFiles.values()
+        )
+
+        DBSnapshot.write(fileName, tags, entries, files)
+        self._logger.info('Exported {} parameters and {} files'.format(
+            len(entries),
+            len(fileNames)
+        ))
+
+    def _invalidateParametersCache(self, dbName, version=None):
+        '''
+        Remove the cached parameters of a DB (and version, if given).
+        To be called after any modification of the DB.
+
+        Parameters
+        ----------
+        dbName: str
+            the name of the DB
+        version: str, optional
+            Version of the model. If not given, all versions are removed.
+        '''
+        self._logger.debug('Invalidating cached parameters of DB {} (version {})'.format(
+            dbName,
+            version
+        ))
+        DatabaseHandler.parametersCache.invalidate(
+            lambda key: key[2] == dbName and (version is None or key[4] == version)
+        )
+
+    @staticmethod
+    def _getParametersCacheKey(kind, dbName, name, version, onlyApplicable, fields):
+        '''
+        Get the key of the parameters cache.
+
+        Parameters
+        ----------
+        kind: str
+            'model' or 'site'
+        dbName: str
+            the name of the DB
+        name: str
+            Validated telescope name or site.
+        version: str
+            Version of the model (with tags already resolved, if MongoDB is used).
+        onlyApplicable: bool
+            If True, only applicable parameters are read.
+        fields: list of str
+            Fields of the MongoDB entries read (ignored for the Yaml DB).
+
+        Returns
+        -------
+        tuple
+        '''
+        _source = DatabaseHandler._getParametersSource()
+        _fields = None if fields is None or _source == 'yaml' else tuple(sorted(fields))
+        return (kind, _source, dbName, name, version, onlyApplicable, _fields)
+
+    @staticmethod
+    def _getParametersProjection(fields, requiredFields=('Parameter',)):
+        '''
+        Get the projection to read only the given fields of the parameter entries.
+
+        Parameters
+        ----------
+        fields: list of str
+            Fields to be read. If None, all the fields are read.
+        requiredFields: list of str
+            Fields required by the caller, read in addition to fields (Value and File are always
+            included).
+
+        Returns
+        -------
+        dict or None
+            Projection to be passed to find.
+        '''
+        if fields is None:
+            return None
+        # _id is included by default (used to compute entryDate).
+        return {field: True for field in [*requiredFields, 'Value', 'File', *fields]}
+
+    def _getParametersCollection(self, dbName, collectionName):
+        '''
+        Get a collection of parameters, returning the documents as ParameterEntry.
+
+        Parameters
+        ----------
+        dbName: str
+            the name of the DB
+        collectionName: str
+            'telescopes' or 'sites'
+
+        Returns
+        -------
+        pymongo.collection.Collection
+        '''
+        collection = self._getDBClient()[dbName][collectionName]
+        return collection.with_options(
+            codec_options=collection.codec_options.with_options(document_class=ParameterEntry)
+        )
+
+    def _writeMissingFilesFromMongoToDisk(self, dbName, path, parameters):
+        '''
+        Write the files listed in the parameter values into path, if they are not there yet.
+
+        Parameters
+        ----------
+        dbName: str
+            the name of the DB with files of tabulated data
+        path: str or Path
+            The path to write the files to
+        parameters: dict
+            Parameters as returned by readMongoDB
+        '''
+        self.writeFilesFromMongoToDisk(
+            dbName,
+            path,
+            [_parInfo['Value'] for _parInfo in parameters.values() if _parInfo['File']]
+        )
 
     def getModelParameters(
         self,
@@ -200,6 +663,7 @@ class DatabaseHandler:
         version,
         runLocation=None,
         onlyApplicable=False,
+        fields=None
     ):
         '''
         Get parameters from either MongoDB or Yaml DB for a specific telescope.
@@ -213,27 +677,60 @@ class DatabaseHandler:
             The sim_telarray run location to write the tabulated data files into.
         onlyApplicable: bool
             If True, only applicable parameters will be read.
+        fields: list of str, optional
+            Fields of the MongoDB entries to be read (e.g. ['Value']). Value and File are
+            always read. If not given, all the fields are read. Ignored for the Yaml DB.
 
         Returns
         -------
         dict containing the parameters
         '''
 
+        _useMongoDB = cfg.get('useMongoDB')
+
+        # The tag is resolved once here and the version passed down to the MongoDB readers.
         _version = version
-        if version in ['Current', 'Latest']:
+        if _useMongoDB and version in ['Current', 'Latest']:
             _version = self._getTaggedVersion(DatabaseHandler.DB_CTA_SIMULATION_MODEL, version)
 
-        if cfg.get('useMongoDB'):
+        _cacheKey = self._getParametersCacheKey(
+            'model',
+            DatabaseHandler.DB_CTA_SIMULATION_MODEL,
+            names.validateTelescopeName(telescopeName),
+            _version,
+            onlyApplicable,
+            fields
+        )
+        _pars = DatabaseHandler.parametersCache.get(_cacheKey)
+        DatabaseHandler.metrics.record(
+            'parametersCache',
+            cacheHit=_pars is not None,
+            key=_cacheKey
+        )
+        if _pars is not None:
+            self._logger.debug('Using cached parameters for {}'.format(_cacheKey))
+            if _useMongoDB and runLocation is not None:
+                self._writeMissingFilesFromMongoToDisk(
+                    DatabaseHandler.DB_CTA_SIMULATION_MODEL,
+                    runLocation,
+                    _pars
+                )
+            return copy.deepcopy(_pars)
+
+        if _useMongoDB:
             _pars = self._getModelParametersMongoDB(
                 DatabaseHandler.DB_CTA_SIMULATION_MODEL,
                 telescopeName,
                 _version,
                 runLocation,
-                onlyApplicable
+                onlyApplicable,
+                fields
             )
-            return _pars
         else:
-            return self._getModelParametersYaml(telescopeName, version, onlyApplicable)
+            _pars = self._getModelParametersYaml(telescopeName, version, onlyApplicable)
+
+        DatabaseHandler.parametersCache.set(_cacheKey, copy.deepcopy(_pars))
+        return _pars
 
     def _getModelParametersYaml(self, telescopeName, version, onlyApplicable=False):
         '''
@@ -295,7 +792,8 @@ class DatabaseHandler:
         telescopeName,
         version,
         runLocation=None,
-        onlyApplicable=False
+        onlyApplicable=False,
+        fields=None
     ):
         '''
         Get parameters from MongoDB for a specific telescope.
@@ -311,16 +809,55 @@ class DatabaseHandler:
             The sim_telarray run location to write the tabulated data files into.
         onlyApplicable: bool
             If True, only applicable parameters will be read.
+        fields: list of str, optional
+            Fields of the entries to be read. If not given, all the fields are read.
 
         Returns
         -------
         dict containing the parameters
         '''
 
+        _versionValidated = names.validateModelVersionName(version)
+
+        # Selecting version and applicable (if on)
+        _pars = dict()
+        for _tel, _selectOnlyApplicable in self._getTelescopeLabelsMongoDB(
+            telescopeName,
+            onlyApplicable
+        ):
+            _pars.update(self.readMongoDB(
+                dbName,
+                _tel,
+                _versionValidated,
+                runLocation,
+                (runLocation is not None),
+                _selectOnlyApplicable,
+                fields
+            ))
+
+        return _pars
+
+    @staticmethod
+    def _getTelescopeLabelsMongoDB(telescopeName, onlyApplicable=False):
+        '''
+        Get the labels of the MongoDB entries building up the model of a telescope,
+        in the order they must be merged. MSTs are built from the camera and the MST structure
+        and SSTs from the SST camera and the SST structure.
+
+        Parameters
+        ----------
+        telescopeName: str
+        onlyApplicable: bool
+            If True, only applicable parameters will be read.
+
+        Returns
+        -------
+        list of (str, bool)
+            Telescope labels and whether only applicable parameters must be read for them.
+        '''
         _telNameValidated = names.validateTelescopeName(telescopeName)
         _telClass = getTelescopeClass(_telNameValidated)
         _site = names.getSiteFromTelescopeName(_telNameValidated)
-        _versionValidated = names.validateModelVersionName(version)
 
         if _telClass == 'MST':
             # MST-FlashCam or MST-NectarCam
@@ -331,27 +868,567 @@ class DatabaseHandler:
         else:
             _whichTelLabels = [_telNameValidated]
 
-        # Selecting version and applicable (if on)
-        _pars = dict()
-        for _tel in _whichTelLabels:
+        # If tel is a struture, only applicable pars will be collected, always.
+        # The default ones will be covered by the camera pars.
+        _structureLabels = [
+            '{}-MST-Structure-D'.format(_site),
+            '{}-SST-Structure-D'.format(_site)
+        ]
+        return [
+            (_tel, onlyApplicable or (_tel in _structureLabels)) for _tel in _whichTelLabels
+        ]
+
+    def getModelParametersMultiple(
+        self,
+        telescopeNames,
+        version,
+        runLocation=None,
+        onlyApplicable=False,
+        fields=None
+    ):
+        '''
+        Get parameters from either MongoDB or Yaml DB for several telescopes.
+        With MongoDB, the parameters of all the telescopes not found in the cache are read
+        with a single query.
+
+        Parameters
+        ----------
+        telescopeNames: list of str
+        version: str or list of str
+            Version of the model, either the same for all telescopes or one per telescope.
+        runLocation: Path or str
+            The sim_telarray run location to write the tabulated data files into.
+        onlyApplicable: bool
+            If True, only applicable parameters will be read.
+        fields: list of str, optional
+            Fields of the MongoDB entries to be read (see getModelParameters).
+
+        Returns
+        -------
+        dict
+            Dict containing the parameters of each telescope (with telescopeNames as keys).
+        '''
+        if isinstance(version, str):
+            versions = [version] * len(telescopeNames)
+        else:
+            versions = list(version)
+            if len(versions) != len(telescopeNames):
+                raise ValueError('version must be a str or a list with one entry per telescope')
+
+        if not cfg.get('useMongoDB'):
+            return {
+                telName: self.getModelParameters(telName, ver, runLocation, onlyApplicable, fields)
+                for telName, ver in zip(telescopeNames, versions)
+            }
+
+        dbName = DatabaseHandler.DB_CTA_SIMULATION_MODEL
+        _taggedVersions = {
+            ver: self._getTaggedVersion(dbName, ver)
+            for ver in set(versions) if ver in ['Current', 'Latest']
+        }
+        _allPars = dict()
+        _toRead = dict()
+        for telName, ver in zip(telescopeNames, versions):
+            _version = _taggedVersions.get(ver, ver)
+            _cacheKey = self._getParametersCacheKey(
+                'model',
+                dbName,
+                names.validateTelescopeName(telName),
+                _version,
+                onlyApplicable,
+                fields
+            )
+            _pars = DatabaseHandler.parametersCache.get(_cacheKey)
+            DatabaseHandler.metrics.record(
+                'parametersCache',
+                cacheHit=_pars is not None,
+                key=_cacheKey
+            )
+            if _pars is not None:
+                self._logger.debug('Using cached parameters for {}'.format(_cacheKey))
+                _allPars[telName] = copy.deepcopy(_pars)
+            else:
+                _toRead[telName] = (names.validateModelVersionName(_version), _cacheKey)
+
+        if len(_toRead) > 0:
+            _parsRead = self._readMongoDBMultiple(dbName, _toRead, onlyApplicable, fields)
+            for telName, _pars in _parsRead.items():
+                DatabaseHandler.parametersCache.set(_toRead[telName][1], copy.deepcopy(_pars))
+            _allPars.update(_parsRead)
+
+        if runLocation is not None:
+            self.writeFilesFromMongoToDisk(
+                dbName,
+                runLocation,
+                [
+                    _parInfo['Value']
+                    for _pars in _allPars.values()
+                    for _parInfo in _pars.values()
+                    if _parInfo['File']
+                ]
+            )
+
+        return {telName: _allPars[telName] for telName in telescopeNames}
+
+    def _readMongoDBMultiple(
+        self,
+        dbName,
+        telescopesAndVersions,
+        onlyApplicable=False,
+        fields=None
+    ):
+        '''
+        Read the parameters of several telescopes from MongoDB with a single query.
+        The entries of the camera and structure labels are merged client side,
+        as in _getModelParametersMongoDB.
+
+        Parameters
+        ----------
+        dbName: str
+            the name of the DB
+        telescopesAndVersions: dict
+            Validated model version (first item of the values) of each telescope name (keys).
+        onlyApplicable: bool
+            If True, only applicable parameters will be read.
+        fields: list of str, optional
+            Fields of the entries to be read. If not given, all the fields are read.
+
+        Returns
+        -------
+        dict
+            Dict containing the parameters of each telescope.
+        '''
+        if DatabaseHandler.snapshot is not None:
+            # Reading from the local snapshot, no need to group the queries.
+            return {
+                telName: self._getModelParametersMongoDB(
+                    dbName,
+                    telName,
+                    _version,
+                    onlyApplicable=onlyApplicable,
+                    fields=fields
+                )
+                for telName, (_version, *_) in telescopesAndVersions.items()
+            }
+
+        _labels = {
+            telName: self._getTelescopeLabelsMongoDB(telName, onlyApplicable)
+            for telName in telescopesAndVersions.keys()
+        }
+        # Only the (label, version) pairs needed are read, since the telescopes may be
+        # requested with different versions.
+        _pairs = sorted({
+            (_tel, _version)
+            for telName, (_version, *_) in telescopesAndVersions.items()
+            for _tel, _ in _labels[telName]
+        })
+        query = {
+            '$or': [{'Telescope': _tel, 'Version': _version} for _tel, _version in _pairs]
+        }
+        if onlyApplicable:
+            query['Applicable'] = onlyApplicable
+
+        # Posts of each (label, version), kept in the order returned by the DB.
+        _posts = dict()
+        collection = self._getParametersCollection(dbName, 'telescopes')
+        projection = self._getParametersProjection(
+            fields,
+            ['Parameter', 'Telescope', 'Version', 'Applicable']
+        )
+        with DatabaseHandler.metrics.measure(
+            'readMongoDBMultiple',
+            telescopes=sorted(telescopesAndVersions.keys())
+        ) as event:
+            for post in collection.find(query, projection):
+                _posts.setdefault((post['Telescope'], post['Version']), list()).append(post)
+            event['documents'] = sum(len(_telPosts) for _telPosts in _posts.values())
+
+        _allPars = dict()
+        for telName, (_version, *_) in telescopesAndVersions.items():
+            _pars = dict()
+            for _tel, _selectOnlyApplicable in _labels[telName]:
+                _telPosts = [
+                    post for post in _posts.get((_tel, _version), list())
+                    if post['Applicable'] or not _selectOnlyApplicable
+                ]
+                if len(_telPosts) == 0:
+                    _failedQuery = {'Telescope': _tel, 'Version': _version}
+                    if _selectOnlyApplicable:
+                        _failedQuery['Applicable'] = _selectOnlyApplicable
+                    raise ValueError(
+                        'The following query returned zero results! '
+                        'Check the input data and rerun.\n',
+                        _failedQuery
+                    )
+                for post in _telPosts:
+                    # The same post may be used by several telescopes (e.g. structures).
+                    post = copy.copy(post)
+                    parNow = post.pop('Parameter')
+                    post.pop('Telescope', None)
+                    _pars[parNow] = post
+            _allPars[telName] = _pars
+
+        return _allPars
+
+    def diffModelVersions(self, telescopeNames, version1, version2, onlyApplicable=False):
+        '''
+        Get the parameters added, removed and changed from version1 to version2 of the model of
+        one or several telescopes, without reading the full models.
+
+        With MongoDB, the entries of both versions of all the telescopes are compared by a
+        single aggregation pipeline, which returns only the parameters that differ. With the
+        Yaml DB (or a DB snapshot) the parameters of both versions are joined by name.
+        Parameters pointing to files with different names are compared by the checksums of
+        the files (md5 stored in GridFS, or computed for the local files of the Yaml DB), so
+        that the files are not downloaded. Files without checksum are compared by name.
+
+        Parameters
+        ----------
+        telescopeNames: str or list of str
+        version1: str
+            Version of the model to compare from.
+        version2: str
+            Version of the model to compare to.
+        onlyApplicable: bool
+            If True, only applicable parameters are compared.
+
+        Returns
+        -------
+        dict
+            Differences of each telescope (with telescopeNames as keys), given as a dict with
+            the keys 'added' and 'removed' (entries of each parameter) and 'changed' (entries of
+            each parameter in version1 and version2). With MongoDB, the entries contain only
+            DIFF_FIELDS.
+        '''
+        if isinstance(telescopeNames, str):
+            telescopeNames = [telescopeNames]
+
+        dbName = DatabaseHandler.DB_CTA_SIMULATION_MODEL
+        _versions = list()
+        for version in [version1, version2]:
+            if cfg.get('useMongoDB') and version in ['Current', 'Latest']:
+                version = self._getTaggedVersion(dbName, version)
+            _versions.append(names.validateModelVersionName(version))
+
+        if not cfg.get('useMongoDB'):
+            _allPars = {
+                telName: [
+                    self._getModelParametersYaml(telName, _version, onlyApplicable)
+                    for _version in _versions
+                ]
+                for telName in telescopeNames
+            }
+        elif DatabaseHandler.snapshot is not None:
+            _allPars = {
+                telName: [
+                    self._getModelParametersSnapshotForDiff(telName, _version, onlyApplicable)
+                    for _version in _versions
+                ]
+                for telName in telescopeNames
+            }
+        else:
+            _allPars = self._getChangedParametersMongoDB(
+                dbName,
+                telescopeNames,
+                _versions,
+                onlyApplicable
+            )
+
+        diffs = {
+            telName: self._diffParameters(*_allPars[telName]) for telName in telescopeNames
+        }
+        self._removeChangesOfEqualFiles(dbName, diffs)
+
+        for telName, diff in diffs.items():
+            self._logger.debug('{} from {} to {}: {} added, {} removed, {} changed'.format(
+                telName,
+                *_versions,
+                len(diff['added']),
+                len(diff['removed']),
+                len(diff['changed'])
+            ))
+        return diffs
+
+    @staticmethod
+    def _diffParameters(parameters1, parameters2):
+        '''
+        Join the parameters of two versions by name.
+
+        Returns
+        -------
+        dict
+            Entries of the parameters added, removed and changed (pairs of entries).
+        '''
+        diff = {'added': dict(), 'removed': dict(), 'changed': dict()}
+        for parName, entry1 in parameters1.items():
+            if parName not in parameters2:
+                diff['removed'][parName] = entry1
+            elif parameters2[parName] != entry1:
+                diff['changed'][parName] = (entry1, parameters2[parName])
+        for parName, entry2 in parameters2.items():
+            if parName not in parameters1:
+                diff['added'][parName] = entry2
+        return diff
+
+    def _getModelParametersSnapshotForDiff(self, telescopeName, version, onlyApplicable=False):
+        '''
+        Get the parameters of a telescope from the snapshot, reduced to DIFF_FIELDS.
+        Labels not found in the snapshot give no parameters.
+        '''
+        _pars = dict()
+        for _tel, _selectOnlyApplicable in self._getTelescopeLabelsMongoDB(
+            telescopeName,
+            onlyApplicable
+        ):
+            for parName, entry in self._readSnapshot(
+                'telescopes',
+                _tel,
+                version,
+                _selectOnlyApplicable
+            ).items():
+                _pars[parName] = {
+                    field: entry[field] for field in DatabaseHandler.DIFF_FIELDS if field in entry
+                }
+        return _pars
+
+    def _getChangedParametersMongoDB(self, dbName, telescopeNames, versions, onlyApplicable=False):
+        '''
+        Compare the entries of two versions of several telescopes with an aggregation pipeline.
+        The entries are grouped by parameter and only the groups in which the entry of any
+        telescope label differs between the versions are returned. Each group holds the entries
+        of all the labels, so that the models can be merged client side as in
+        _getModelParametersMongoDB.
+
+        Parameters
+        ----------
+        dbName: str
+            the name of the DB
+        telescopeNames: list of str
+        versions: list of str
+            The two validated versions.
+        onlyApplicable: bool
+            If True, only applicable parameters are compared.
+
+        Returns
+        -------
+        dict
+            Parameters of both versions (list of two dicts) of each telescope, restricted to the
+            parameters that may differ.
+        '''
+        _labels = {
+            telName: self._getTelescopeLabelsMongoDB(telName, onlyApplicable)
+            for telName in telescopeNames
+        }
+        match = {
+            'Telescope': {
+                '$in': sorted({_tel for _telLabels in _labels.values() for _tel, _ in _telLabels})
+            },
+            'Version': {'$in': sorted(set(versions))}
+        }
+        if onlyApplicable:
+            match['Applicable'] = onlyApplicable
+
+        # Entry of a label used by readMongoDB for each version, with and without selecting
+        # only the applicable ones (later entries replace the earlier ones).
+        _entryFields = {
+            (iVersion, _selectOnlyApplicable): 'entry{}{}'.format(
+                iVersion,
+                'Applicable' if _selectOnlyApplicable else ''
+            )
+            for iVersion in range(2)
+            for _selectOnlyApplicable in [False, True]
+        }
+
+        def _lastEntry(iVersion, _selectOnlyApplicable):
+            cond = {'$eq': ['$$this.Version', versions[iVersion]]}
+            if _selectOnlyApplicable:
+                cond = {'$and': [cond, {'$eq': ['$$this.entry.Applicable', True]}]}
+            return {
+                '$arrayElemAt': [{'$filter': {'input': '$entries', 'cond': cond}}, -1]
+            }
+
+        pipeline = [
+            {'$match': match},
+            {'$sort': {'_id': pymongo.ASCENDING}},
+            {
+                '$group': {
+                    '_id': {'Telescope': '$Telescope', 'Parameter': '$Parameter'},
+                    'entries': {
+                        '$push': {
+                            'Version': '$Version',
+                            'entry': {field: '$' + field for field in DatabaseHandler.DIFF_FIELDS}
+                        }
+                    }
+                }
+            },
+            {
+                '$project': {
+                    entryField: _lastEntry(*key) for key, entryField in _entryFields.items()
+                }
+            },
+            {
+                '$project': {
+                    # Missing entries are made explicit (null).
+                    entryField: {'$ifNull': ['$' + entryField + '.entry', None]}
+                    for entryField in _entryFields.values()
+                }
+            },
+            {
+                '$group': {
+                    '_id': '$_id.Parameter',
+                    'labels': {
+                        '$push': {
+                            'Telescope': '$_id.Telescope',
+                            **{
+                                entryField: '$' + entryField
+                                for entryField in _entryFields.values()
+                            }
+                        }
+                    },
+                    'changed': {
+                        '$max': {
+                            '$or': [
+                                {'$ne': ['$entry0', '$entry1']},
+                                {'$ne': ['$entry0Applicable', '$entry1Applicable']}
+                            ]
+                        }
+                    }
+                }
+            },
+            {'$match': {'changed': True}}
+        ]
+
+        # Entries of each parameter of each label, for each (version, selectOnlyApplicable).
+        entriesOfLabel = {key: dict() for key in _entryFields.keys()}
+        collection = self._getDBClient()[dbName].telescopes
+        with DatabaseHandler.metrics.measure(
+            'diffModelVersions',
+            telescopes=telescopeNames,
+            versions=versions
+        ) as event:
+            groups = list(collection.aggregate(pipeline))
+            event['documents'] = len(groups)
+        for group in groups:
+            for label in group['labels']:
+                for key, entryField in _entryFields.items():
+                    if label.get(entryField, None) is not None:
+                        entriesOfLabel[key].setdefault(
+                            label['Telescope'],
+                            dict()
+                        )[group['_id']] = label[entryField]
+
+        _allPars = dict()
+        for telName in telescopeNames:
+            _allPars[telName] = list()
+            for iVersion in range(2):
+                _pars = dict()
+                for _tel, _selectOnlyApplicable in _labels[telName]:
+                    _pars.update(
+                        entriesOfLabel[(iVersion, _selectOnlyApplicable)].get(_tel, dict())
+                    )
+                _allPars[telName].append(_pars)
+        return _allPars
+
+    def _removeChangesOfEqualFiles(self, dbName, diffs):
+        '''
+        Remove from the changed parameters of diffs the ones pointing to different files
+        with the same checksum.
+        '''
+        _useMongoDB = cfg.get('useMongoDB')
+
+        def _isFile(entry):
+            if _useMongoDB:
+                return entry.get('File', False)
+            return isinstance(entry, str) and ('.dat' in entry or '.txt' in entry)
+
+        def _fileName(entry):
+            return entry['Value'] if _useMongoDB else entry
+
+        def _onlyFileChanged(entry1, entry2):
+            if not (_isFile(entry1) and _isFile(entry2)):
+                return False
+            # With MongoDB, the other fields of the entries must be equal.
+            return not _useMongoDB or all(
+                entry1.get(field) == entry2.get(field)
+                for field in DatabaseHandler.DIFF_FIELDS if field != 'Value'
+            )
 
-            # If tel is a struture, only applicable pars will be collected, always.
-            # The default ones will be covered by the camera pars.
-            _selectOnlyApplicable = onlyApplicable or (_tel in [
-                '{}-MST-Structure-D'.format(_site),
-                '{}-SST-Structure-D'.format(_site)
-            ])
+        _fileChanges = [
+            (diff['changed'], parName)
+            for diff in diffs.values()
+            for parName, (entry1, entry2) in diff['changed'].items()
+            if _onlyFileChanged(entry1, entry2)
+        ]
+        if len(_fileChanges) == 0:
+            return
 
-            _pars.update(self.readMongoDB(
-                dbName,
-                _tel,
-                _versionValidated,
-                runLocation,
-                (runLocation is not None),
-                _selectOnlyApplicable
-            ))
+        checksums = self._getFileChecksums(
+            dbName,
+            {_fileName(entry) for changed, parName in _fileChanges for entry in changed[parName]}
+        )
+        for changed, parName in _fileChanges:
+            md5s = [checksums.get(_fileName(entry), None) for entry in changed[parName]]
+            if md5s[0] is not None and md5s[0] == md5s[1]:
+                changed.pop(parName)
 
-        return _pars
+    def _getFileChecksums(self, dbName, fileNames):
+        '''
+        Get the md5 checksums of files, without reading them from the DB: from the GridFS
+        metadata (with a single query), from the DB snapshot or computed for the local files of
+        the Yaml DB. Files without checksum (or not found) are not included.
+
+        Parameters
+        ----------
+        dbName: str
+            the name of the DB with files of tabulated data
+        fileNames: iterable of str
+
+        Returns
+        -------
+        dict
+            md5 of each file name.
+        '''
+        checksums = dict()
+        if not cfg.get('useMongoDB'):
+            for fileName in fileNames:
+                try:
+                    _file = cfg.findFile(fileName, cfg.get('modelFilesLocations'))
+                except FileNotFoundError:
+                    continue
+                with open(_file, 'rb') as stream:
+                    checksums[fileName] = hashlib.md5(stream.read()).hexdigest()
+        elif DatabaseHandler.snapshot is not None:
+            for fileName in fileNames:
+                try:
+                    checksums[fileName] = DatabaseHandler.snapshot.getFile(fileName).md5
+                except FileNotFoundError:
+                    continue
+        else:
+            collection = self._getDBClient()[dbName]['fs.files']
+            for post in collection.find(
+                {'filename': {'$in': sorted(fileNames)}},
+                {'filename': True, 'md5': True},
+                sort=DatabaseHandler.GRIDFS_LATEST_FIRST
+            ):
+                # Keeping the latest revision of each file.
+                checksums.setdefault(post['filename'], post.get('md5', None))
+        return {fileName: md5 for fileName, md5 in checksums.items() if md5 is not None}
+
+    @staticmethod
+    def _readSnapshot(collectionName, name, version, onlyApplicable=False):
+        '''
+        Read the parameter entries of a telescope label or site from the snapshot,
+        in the format returned by readMongoDB.
+        '''
+        return {
+            parameter: ParameterEntry(entry)
+            for parameter, entry in DatabaseHandler.snapshot.getParameters(
+                collectionName,
+                name,
+                version,
+                onlyApplicable
+            ).items()
+        }
 
     def readMongoDB(
         self,
@@ -360,11 +1437,13 @@ class DatabaseHandler:
         version,
         runLocation,
         writeFiles=True,
-        onlyApplicable=False
+        onlyApplicable=False,
+        fields=None
     ):
         '''
         Build and execute query to Read the MongoDB for a specific telescope.
-        Also writes the files listed in the parameter values into the sim_telarray run location
+        Also writes the files listed in the parameter values into the sim_telarray run location.
+        The entryDate of each parameter is computed (from the _id) only when requested.
 
         Parameters
         ----------
@@ -379,13 +1458,15 @@ class DatabaseHandler:
             If true, write the files to the runLocation.
         onlyApplicable: bool
             If True, only applicable parameters will be read.
+        fields: list of str, optional
+            Fields of the entries to be read (e.g. ['Value']). Value and File are always read.
+            If not given, all the fields are read.
 
         Returns
         -------
         dict containing the parameters
         '''
 
-        collection = DatabaseHandler.dbClient[dbName]['telescopes']
         _parameters = dict()
 
         _version = version
@@ -398,24 +1479,34 @@ class DatabaseHandler:
         }
         if onlyApplicable:
             query['Applicable'] = onlyApplicable
-        if collection.count_documents(query) < 1:
+        with DatabaseHandler.metrics.measure(
+            'readMongoDB',
+            telescope=telescopeName,
+            version=_version,
+            source=self._getParametersSource()
+        ) as event:
+            if DatabaseHandler.snapshot is not None:
+                _parameters = self._readSnapshot(
+                    'telescopes',
+                    telescopeName,
+                    _version,
+                    onlyApplicable
+                )
+            else:
+                collection = self._getParametersCollection(dbName, 'telescopes')
+                for post in collection.find(query, self._getParametersProjection(fields)):
+                    parNow = post.pop('Parameter')
+                    post.pop('Telescope', None)
+                    _parameters[parNow] = post
+            event['documents'] = len(_parameters)
+        if len(_parameters) == 0:
             raise ValueError(
                 'The following query returned zero results! Check the input data and rerun.\n',
                 query
             )
-        for post in collection.find(query):
-            parNow = post['Parameter']
-            _parameters[parNow] = post
-            _parameters[parNow].pop('Parameter', None)
-            _parameters[parNow].pop('Telescope', None)
-            _parameters[parNow]['entryDate'] = ObjectId(post['_id']).generation_time
-            if _parameters[parNow]['File'] and writeFiles:
-                file = self.getFileMongoDB(
-                    dbName,
-                    _parameters[parNow]['Value']
-                )
 
-                self.writeFileFromMongoToDisk(dbName, runLocation, file)
+        if writeFiles:
+            self._writeMissingFilesFromMongoToDisk(dbName, runLocation, _parameters)
 
         return _parameters
 
@@ -441,9 +1532,83 @@ class DatabaseHandler:
             cfg.get('modelFilesLocations')
         )
         self._logger.debug('Reading DB file {}'.format(_yamlFile))
-        with open(_yamlFile, 'r') as stream:
-            _allPars = yaml.load(stream, Loader=yaml.FullLoader)
-        return _allPars
+        return self._loadYamlFile(_yamlFile)
+
+    def _loadYamlFile(self, yamlFile):
+        '''
+        Load a file of the Yaml DB. Parsed files are kept in memory and pickled into the cache
+        directory (see io_handler.getCacheDirectory), so that they are only parsed again if
+        their modification time or size changed. The libyaml based loader is used if available.
+        The returned dict is shared by all calls and must not be modified.
+
+        Parameters
+        ----------
+        yamlFile: str or Path
+            Yaml file to be loaded.
+
+        Returns
+        -------
+        dict containing the content of the file
+        '''
+        _start = time.perf_counter()
+        _yamlFile = Path(yamlFile).absolute()
+        _fileStat = _yamlFile.stat()
+        _fileKey = (_fileStat.st_mtime_ns, _fileStat.st_size)
+
+        # Memory cache
+        _cached = DatabaseHandler.parsedYamlFiles.get(str(_yamlFile), None)
+        if _cached is not None and _cached['key'] == _fileKey:
+            DatabaseHandler.metrics.record(
+                'loadYamlFile',
+                duration=time.perf_counter() - _start,
+                documents=len(_cached['content']),
+                cacheHit=True,
+                file=_yamlFile.name,
+                cache='memory'
+            )
+            return _cached['content']
+
+        # Disk cache
+        _cacheFile = io.getCacheDirectory(cfg.get('outputLocation'), 'yaml-db').joinpath(
+            '{}-{}.pickle'.format(
+                _yamlFile.stem,
+                hashlib.sha1(str(_yamlFile).encode()).hexdigest()
+            )
+        )
+        _content = None
+        _cache = None
+        if _cacheFile.exists():
+            try:
+                with open(_cacheFile, 'rb') as stream:
+                    _cachedKey, _cachedContent = pickle.load(stream)
+                if tuple(_cachedKey) == _fileKey:
+                    self._logger.debug('Using cached DB file {}'.format(_cacheFile))
+                    _content = _cachedContent
+                    _cache = 'disk'
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+                self._logger.warning('Cached DB file {} could not be read'.format(_cacheFile))
+
+        if _content is None:
+            with open(_yamlFile, 'r') as stream:
+                _content = yaml.load(stream, Loader=YAML_LOADER)
+            _tmpFile = _cacheFile.with_name(_cacheFile.name + '.{}.tmp'.format(os.getpid()))
+            try:
+                with open(_tmpFile, 'wb') as stream:
+                    pickle.dump((_fileKey, _content), stream, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(_tmpFile, _cacheFile)
+            except OSError:
+                self._logger.warning('Cached DB file {} could not be written'.format(_cacheFile))
+
+        DatabaseHandler.parsedYamlFiles[str(_yamlFile)] = {'key': _fileKey, 'content': _content}
+        DatabaseHandler.metrics.record(
+            'loadYamlFile',
+            duration=time.perf_counter() - _start,
+            documents=len(_content),
+            cacheHit=_cache is not None,
+            file=_yamlFile.name,
+            cache=_cache
+        )
+        return _content
 
     def getSiteParameters(
         self,
@@ -451,6 +1616,7 @@ class DatabaseHandler:
         version,
         runLocation,
         onlyApplicable=False,
+        fields=None
     ):
         '''
         Get parameters from either MongoDB or Yaml DB for a specific site.
@@ -464,23 +1630,59 @@ class DatabaseHandler:
             The sim_telarray run location to write the tabulated data files into.
         onlyApplicable: bool
             If True, only applicable parameters will be read.
+        fields: list of str, optional
+            Fields of the MongoDB entries to be read (see getModelParameters).
 
         Returns
         -------
         dict containing the parameters
         '''
 
-        if cfg.get('useMongoDB'):
+        _useMongoDB = cfg.get('useMongoDB')
+
+        # The tag is resolved once here and the version passed down to the MongoDB readers.
+        _version = version
+        if _useMongoDB and version in ['Current', 'Latest']:
+            _version = self._getTaggedVersion(DatabaseHandler.DB_CTA_SIMULATION_MODEL, version)
+
+        _cacheKey = self._getParametersCacheKey(
+            'site',
+            DatabaseHandler.DB_CTA_SIMULATION_MODEL,
+            site,
+            _version,
+            onlyApplicable,
+            fields
+        )
+        _pars = DatabaseHandler.parametersCache.get(_cacheKey)
+        DatabaseHandler.metrics.record(
+            'parametersCache',
+            cacheHit=_pars is not None,
+            key=_cacheKey
+        )
+        if _pars is not None:
+            self._logger.debug('Using cached parameters for {}'.format(_cacheKey))
+            if _useMongoDB:
+                self._writeMissingFilesFromMongoToDisk(
+                    DatabaseHandler.DB_CTA_SIMULATION_MODEL,
+                    runLocation,
+                    _pars
+                )
+            return copy.deepcopy(_pars)
+
+        if _useMongoDB:
             _pars = self._getSiteParametersMongoDB(
                 DatabaseHandler.DB_CTA_SIMULATION_MODEL,
                 site,
-                version,
+                _version,
                 runLocation,
-                onlyApplicable
+                onlyApplicable,
+                fields
             )
-            return _pars
         else:
-            return self._getSiteParametersYaml(site, version, onlyApplicable)
+            _pars = self._getSiteParametersYaml(site, version, onlyApplicable)
+
+        DatabaseHandler.parametersCache.set(_cacheKey, copy.deepcopy(_pars))
+        return _pars
 
     def _getSiteParametersYaml(self, site, version, onlyApplicable=False):
         '''
@@ -506,8 +1708,7 @@ class DatabaseHandler:
 
         yamlFile = cfg.findFile('parValues-Sites.yml', cfg.get('modelFilesLocations'))
         self._logger.info('Reading DB file {}'.format(yamlFile))
-        with open(yamlFile, 'r') as stream:
-            _allParsVersions = yaml.load(stream, Loader=yaml.FullLoader)
+        _allParsVersions = self._loadYamlFile(yamlFile)
 
         _pars = dict()
         for parName, parInfo in _allParsVersions.items():
@@ -527,10 +1728,11 @@ class DatabaseHandler:
         site,
         version,
         runLocation,
-        onlyApplicable=False
+        onlyApplicable=False,
+        fields=None
     ):
         '''
-        Get parameters from MongoDB for a specific telescope.
+        Get parameters from MongoDB for a specific site.
 
         Parameters
         ----------
@@ -543,6 +1745,8 @@ class DatabaseHandler:
             The sim_telarray run location to write the tabulated data files into.
         onlyApplicable: bool
             If True, only applicable parameters will be read.
+        fields: list of str, optional
+            Fields of the entries to be read. If not given, all the fields are read.
 
         Returns
         -------
@@ -552,7 +1756,6 @@ class DatabaseHandler:
         if site not in ['North', 'South']:
             raise ValueError('Site must be "North" or "South" (case sensitive!)')
 
-        collection = DatabaseHandler.dbClient[dbName].sites
         _parameters = dict()
 
         _version = version
@@ -565,24 +1768,28 @@ class DatabaseHandler:
         }
         if onlyApplicable:
             query['Applicable'] = onlyApplicable
-        if collection.count_documents(query) < 1:
+        with DatabaseHandler.metrics.measure(
+            'getSiteParameters',
+            site=site,
+            version=_version,
+            source=self._getParametersSource()
+        ) as event:
+            if DatabaseHandler.snapshot is not None:
+                _parameters = self._readSnapshot('sites', site, _version, onlyApplicable)
+            else:
+                collection = self._getParametersCollection(dbName, 'sites')
+                for post in collection.find(query, self._getParametersProjection(fields)):
+                    parNow = post.pop('Parameter')
+                    post.pop('Site', None)
+                    _parameters[parNow] = post
+            event['documents'] = len(_parameters)
+        if len(_parameters) == 0:
             raise ValueError(
                 'The following query returned zero results! Check the input data and rerun.\n',
                 query
             )
-        for post in collection.find(query):
-            parNow = post['Parameter']
-            _parameters[parNow] = post
-            _parameters[parNow].pop('Parameter', None)
-            _parameters[parNow].pop('Site', None)
-            _parameters[parNow]['entryDate'] = ObjectId(post['_id']).generation_time
-            if _parameters[parNow]['File']:
-                file = self.getFileMongoDB(
-                    dbName,
-                    _parameters[parNow]['Value']
-                )
 
-                self.writeFileFromMongoToDisk(dbName, runLocation, file)
+        self._writeMissingFilesFromMongoToDisk(dbName, runLocation, _parameters)
 
         return _parameters
 
@@ -634,22 +1841,150 @@ class DatabaseHandler:
 
         Returns
         -------
-        GridOut
-            A file instance returned by GridFS find_one
+        GridOut or SnapshotFile
+            A file instance returned by GridFS find_one (latest revision of the file), or by the
+            snapshot, if used.
         '''
 
-        db = DatabaseHandler.dbClient[dbName]
+        if DatabaseHandler.snapshot is not None:
+            return DatabaseHandler.snapshot.getFile(fileName)
+
+        db = self._getDBClient()[dbName]
         fileSystem = gridfs.GridFS(db)
-        if fileSystem.exists({'filename': fileName}):
-            return fileSystem.find_one({'filename': fileName})
-        else:
+        with DatabaseHandler.metrics.measure('getFileMongoDB', file=fileName) as event:
+            file = fileSystem.find_one(
+                {'filename': fileName},
+                sort=DatabaseHandler.GRIDFS_LATEST_FIRST
+            )
+            event['documents'] = int(file is not None)
+        if file is None:
             raise FileNotFoundError(
                 'The file {} does not exist in the database {}'.format(fileName, dbName)
             )
+        return file
+
+    def writeFilesFromMongoToDisk(self, dbName, path, fileNames):
+        '''
+        Extract several files from MongoDB and write them to disk. All the files are looked up
+        with a single query and the ones not yet present in path (with the same content, see
+        _isFileWritten) are downloaded concurrently, using fileDownloadMaxWorkers threads.
+
+        Parameters
+        ----------
+        dbName: str
+            the name of the DB with files of tabulated data
+        path: str or Path
+            The path to write the files to
+        fileNames: list of str
+            The names of the files requested
+
+        Raises
+        ------
+        FileNotFoundError
+            If any of the files does not exist in the DB.
+        '''
+        fileNames = set(fileNames)
+        if len(fileNames) == 0:
+            return
+
+        files = dict()
+        if DatabaseHandler.snapshot is not None:
+            for fileName in fileNames:
+                try:
+                    files[fileName] = DatabaseHandler.snapshot.getFile(fileName)
+                except FileNotFoundError:
+                    pass
+        else:
+            db = self._getDBClient()[dbName]
+            fileSystem = gridfs.GridFS(db)
+            with DatabaseHandler.metrics.measure(
+                'getFilesMongoDB',
+                files=sorted(fileNames)
+            ) as event:
+                for file in fileSystem.find(
+                    {'filename': {'$in': sorted(fileNames)}},
+                    sort=DatabaseHandler.GRIDFS_LATEST_FIRST
+                ):
+                    # Keeping the latest revision of each file.
+                    files.setdefault(file.filename, file)
+                event['documents'] = len(files)
+
+        missingInDB = fileNames - files.keys()
+        if len(missingInDB) > 0:
+            raise FileNotFoundError(
+                'The files {} do not exist in the database {}'.format(
+                    sorted(missingInDB),
+                    dbName
+                )
+            )
+
+        filesToWrite = list()
+        for fileName, file in files.items():
+            if self._isFileWritten(Path(path).joinpath(fileName), file):
+                continue
+            filesToWrite.append(file)
+        if len(filesToWrite) == 0:
+            return
+
+        self._logger.debug('Writing {} files from {} into {}'.format(
+            len(filesToWrite),
+            dbName,
+            path
+        ))
+        if DatabaseHandler.fileDownloadMaxWorkers == 1 or len(filesToWrite) == 1:
+            for file in filesToWrite:
+                self.writeFileFromMongoToDisk(dbName, path, file)
+            return
+
+        with ThreadPoolExecutor(max_workers=DatabaseHandler.fileDownloadMaxWorkers) as executor:
+            futures = [
+                executor.submit(self.writeFileFromMongoToDisk, dbName, path, file)
+                for file in filesToWrite
+            ]
+            # Raising errors from the downloads.
+            for future in futures:
+                future.result()
+
+    def _isFileWritten(self, destFile, file):
+        '''
+        Check whether a file on disk has the content of a GridFS (or snapshot) file: it must be
+        a link to the file in the store (if useFileStore is True) or have the same size and md5
+        sum (e.g. copies of the stored file, or files whose stored file was evicted).
+
+        Parameters
+        ----------
+        destFile: Path
+            Path of the file on disk.
+        file: GridOut or SnapshotFile
+            A file instance returned by getFileMongoDB
+
+        Returns
+        -------
+        bool
+        '''
+        if not destFile.exists() or destFile.stat().st_size != file.length:
+            return False
+
+        if DatabaseHandler.useFileStore and not isinstance(file, SnapshotFile):
+            try:
+                if os.path.samefile(self._getFileStorePath(file), destFile):
+                    return True
+            except FileNotFoundError:
+                pass
+
+        md5 = getattr(file, 'md5', None)
+        if md5 is None:
+            if not isinstance(file, SnapshotFile):
+                return False
+            md5 = hashlib.md5(file.read()).hexdigest()
+        with open(destFile, 'rb') as stream:
+            return hashlib.md5(stream.read()).hexdigest() == md5
 
     def writeFileFromMongoToDisk(self, dbName, path, file):
         '''
-        Extract a file from MongoDB and write it to disk
+        Extract a file from MongoDB and write it to disk.
+        If useFileStore is True, the file is downloaded only once into the local file store
+        (see _getFileFromStore) and written to path as a hard link (or a copy) of the stored file.
 
         Parameters
         ----------
@@ -657,16 +1992,186 @@ class DatabaseHandler:
             the name of the DB with files of tabulated data
         path: str or Path
             The path to write the file to
+        file: GridOut or SnapshotFile
+            A file instance returned by getFileMongoDB
+        '''
+
+        with DatabaseHandler.metrics.measure('writeFileFromMongoToDisk', file=file.filename):
+            self._writeFileFromMongoToDisk(dbName, path, file)
+
+    def _writeFileFromMongoToDisk(self, dbName, path, file):
+        '''
+        Write a file to disk, see writeFileFromMongoToDisk. Existing files are replaced, never
+        written in place, since they can be hard links to the file store.
+        '''
+        destFile = Path(path).joinpath(file.filename)
+        if isinstance(file, SnapshotFile):
+            self._replaceFile(destFile, lambda outputFile: outputFile.write(file.read()))
+            return
+
+        if not DatabaseHandler.useFileStore:
+            self._downloadFile(dbName, file, destFile)
+            return
+
+        try:
+            storedFile = self._getFileFromStore(dbName, file)
+            if destFile.exists() and os.path.samefile(storedFile, destFile):
+                return
+            destFile.unlink(missing_ok=True)
+            try:
+                os.link(storedFile, destFile)
+            except FileNotFoundError:
+                raise
+            except OSError:
+                # Hard links are not possible across file systems.
+                shutil.copyfile(storedFile, destFile)
+        except FileNotFoundError:
+            # The stored file was evicted in the meantime (by another thread or process).
+            self._logger.debug(
+                'File {} removed from the file store, downloading it'.format(file.filename)
+            )
+            self._downloadFile(dbName, file, destFile)
+
+        return
+
+    def _downloadFile(self, dbName, file, destFile):
+        '''
+        Download a GridFS file into destFile (replaced if it exists, see _replaceFile).
+
+        Parameters
+        ----------
+        dbName: str
+            the name of the DB with files of tabulated data
         file: GridOut
             A file instance returned by GridFS find_one
+        destFile: Path
+            Path of the file to be written.
         '''
-
-        db = DatabaseHandler.dbClient[dbName]
+        db = self._getDBClient()[dbName]
         fsOutput = gridfs.GridFSBucket(db)
-        with open(Path(path).joinpath(file.filename), 'wb') as outputFile:
-            fsOutput.download_to_stream_by_name(file.filename, outputFile)
+        with DatabaseHandler.metrics.measure('downloadFile', file=file.filename) as event:
+            self._replaceFile(
+                destFile,
+                lambda outputFile: fsOutput.download_to_stream(file._id, outputFile)
+            )
+            event['nBytes'] = file.length
 
-        return
+    @staticmethod
+    def _replaceFile(destFile, writeContent):
+        '''
+        Write a file into a temporary file, which then replaces destFile (if it exists). Other
+        hard links to the previous destFile are not modified.
+
+        Parameters
+        ----------
+        destFile: Path
+            Path of the file to be written.
+        writeContent: callable
+            Function writing the content into the binary file object received.
+        '''
+        # The temporary file is created by open (mode x), not by tempfile, so that its
+        # permissions follow the umask as for the files written directly.
+        tmpFile = destFile.with_name('{}.{}.tmp'.format(destFile.name, uuid.uuid4().hex))
+        try:
+            with open(tmpFile, 'xb') as outputFile:
+                writeContent(outputFile)
+            os.replace(tmpFile, destFile)
+        except BaseException:
+            tmpFile.unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    def _getFileStoreKey(file):
+        '''
+        Get the key identifying the content of a GridFS file in the local file store. The md5 sum
+        is used if available. Otherwise, the key is built from the GridFS id (files are never
+        modified in GridFS) and the file length.
+
+        Parameters
+        ----------
+        file: GridOut
+            A file instance returned by GridFS find_one
+
+        Returns
+        -------
+        str
+        '''
+        md5 = getattr(file, 'md5', None)
+        if md5 is not None:
+            return 'md5-{}'.format(md5)
+        return 'id-{}-{}'.format(file._id, file.length)
+
+    def _getFileStorePath(self, file):
+        ''' Get the path of a GridFS file in the local file store (see _getFileStoreKey). '''
+        storeDirectory = io.getCacheDirectory(cfg.get('outputLocation'), 'gridfs')
+        return storeDirectory.joinpath(self._getFileStoreKey(file))
+
+    def _getFileFromStore(self, dbName, file):
+        '''
+        Get the path of a GridFS file in the local file store (content-addressed), downloading
+        it if it is not stored yet. The stored file can be evicted by other threads or processes
+        at any time, so FileNotFoundError must be handled when it is used.
+
+        Parameters
+        ----------
+        dbName: str
+            the name of the DB with files of tabulated data
+        file: GridOut
+            A file instance returned by GridFS find_one
+
+        Returns
+        -------
+        Path
+            Path of the stored file.
+        '''
+        storedFile = self._getFileStorePath(file)
+        storeDirectory = storedFile.parent
+
+        try:
+            # The modification time is used to evict the least recently used files.
+            os.utime(storedFile)
+            _isStored = True
+        except FileNotFoundError:
+            _isStored = False
+        DatabaseHandler.metrics.record('fileStore', cacheHit=_isStored, file=file.filename)
+        if _isStored:
+            self._logger.debug('File {} found in the file store'.format(file.filename))
+            return storedFile
+
+        self._logger.debug('Downloading file {} into the file store'.format(file.filename))
+        self._downloadFile(dbName, file, storedFile)
+
+        self._evictFileStore(storeDirectory)
+        return storedFile
+
+    def _evictFileStore(self, storeDirectory):
+        '''
+        Remove the least recently used files from the file store until its total size is below
+        fileStoreMaxSize. Files already written to run locations are not affected,
+        since they are hard links or copies.
+
+        Parameters
+        ----------
+        storeDirectory: Path
+            Directory of the file store.
+        '''
+        storedFiles = list()
+        for storedFile in storeDirectory.iterdir():
+            if storedFile.name.endswith('.tmp'):
+                continue
+            try:
+                fileStat = storedFile.stat()
+            except FileNotFoundError:
+                continue
+            storedFiles.append((fileStat.st_mtime, fileStat.st_size, storedFile))
+
+        totalSize = sum(size for _, size, _ in storedFiles)
+        for _, size, storedFile in sorted(storedFiles, key=lambda f: f[0]):
+            if totalSize <= DatabaseHandler.fileStoreMaxSize:
+                break
+            self._logger.debug('Removing {} from the file store'.format(storedFile.name))
+            storedFile.unlink(missing_ok=True)
+            totalSize -= size
 
     def copyTelescope(self, dbName, telToCopy, versionToCopy, newTelName, dbToCopyTo=None):
         '''
@@ -698,8 +2203,7 @@ class DatabaseHandler:
             dbToCopyTo
         ))
 
-        collection = DatabaseHandler.dbClient[dbName].telescopes
-        dbEntries = list()
+        collection = self._getDBClient()[dbName].telescopes
 
         _versionToCopy = versionToCopy
         if versionToCopy in ['Current', 'Latest']:
@@ -709,17 +2213,17 @@ class DatabaseHandler:
             'Telescope': telToCopy,
             'Version': _versionToCopy,
         }
-        for post in collection.find(query):
-            post['Telescope'] = newTelName
-            post.pop('_id', None)
-            dbEntries.append(post)
+
+        def _renamedPosts():
+            for post in self._findMatchingDocuments(collection, query):
+                post['Telescope'] = newTelName
+                yield post
 
         self._logger.info('Creating new telescope {}'.format(newTelName))
-        collection = DatabaseHandler.dbClient[dbToCopyTo].telescopes
         try:
-            collection.insert_many(dbEntries)
-        except BulkWriteError as exc:
-            raise exc(exc.details)
+            self._insertInChunks(self._getDBClient()[dbToCopyTo].telescopes, _renamedPosts())
+        finally:
+            self._invalidateParametersCache(dbToCopyTo, _versionToCopy)
 
         return
 
@@ -747,24 +2251,96 @@ class DatabaseHandler:
             The name of the DB to copy to.
         '''
 
-        _collection = DatabaseHandler.dbClient[dbName][collection]
-        dbEntries = list()
-
-        for post in _collection.find(query):
-            post.pop('_id', None)
-            dbEntries.append(post)
+        _collection = self._getDBClient()[dbName][collection]
 
         self._logger.info(
             'Copying documents matching the following query {}\nto {}'.format(query, dbToCopyTo)
         )
-        _collection = DatabaseHandler.dbClient[dbToCopyTo][collection]
         try:
-            _collection.insert_many(dbEntries)
-        except BulkWriteError as exc:
-            raise exc(exc.details)
+            self._insertInChunks(
+                self._getDBClient()[dbToCopyTo][collection],
+                self._findMatchingDocuments(_collection, query)
+            )
+        finally:
+            self._invalidateParametersCache(dbToCopyTo)
+            if collection == 'metadata':
+                self.refreshTaggedVersions(dbToCopyTo)
 
         return
 
+    @staticmethod
+    def _findMatchingDocuments(collection, query):
+        '''
+        Iterate over the documents matching a query when the iteration starts (without _id), so
+        that documents inserted meanwhile (e.g. copies into the same collection) are not
+        returned. Only the ids are kept in memory, the documents are read in chunks of
+        insertChunkSize, in the order of their ids.
+
+        Parameters
+        ----------
+        collection: pymongo.collection.Collection
+            The collection to read the documents from.
+        query: dict
+            The query selecting the documents.
+
+        Yields
+        ------
+        dict
+            Document, without _id.
+        '''
+        ids = sorted(post['_id'] for post in collection.find(query, {'_id': True}))
+        for iStart in range(0, len(ids), DatabaseHandler.insertChunkSize):
+            yield from collection.find(
+                {'_id': {'$in': ids[iStart:iStart + DatabaseHandler.insertChunkSize]}},
+                {'_id': False},
+                sort=[('_id', pymongo.ASCENDING)]
+            )
+
+    def _insertInChunks(self, collection, documents):
+        '''
+        Insert documents into a collection with one insert_many per insertChunkSize documents,
+        so that the documents do not need to be all in memory.
+
+        Parameters
+        ----------
+        collection: pymongo.collection.Collection
+            The collection to insert the documents into.
+        documents: iterable of dict
+            The documents to insert (e.g. a cursor).
+
+        Returns
+        -------
+        int
+            Number of inserted documents.
+
+        Raises
+        ------
+        BulkWriteError
+            If any insertion fails (the documents of previous chunks remain inserted).
+        '''
+        nInserted = 0
+        chunk = list()
+        for document in documents:
+            chunk.append(document)
+            if len(chunk) == DatabaseHandler.insertChunkSize:
+                nInserted += self._insertChunk(collection, chunk)
+                chunk = list()
+        if len(chunk) > 0:
+            nInserted += self._insertChunk(collection, chunk)
+
+        self._logger.debug('Inserted {} documents into {}'.format(nInserted, collection.name))
+        return nInserted
+
+    def _insertChunk(self, collection, chunk):
+        try:
+            return len(collection.insert_many(chunk).inserted_ids)
+        except BulkWriteError as exc:
+            self._logger.error('Inserting documents into {} failed: {}'.format(
+                collection.name,
+                exc.details
+            ))
+            raise
+
     def deleteQuery(self, dbName, collection, query):
         '''
         Delete all entries from the DB which correspond to the provided query.
@@ -784,7 +2360,7 @@ class DatabaseHandler:
             would delete the entire prod4 version from telescope North-LST-1.
         '''
 
-        _collection = DatabaseHandler.dbClient[dbName][collection]
+        _collection = self._getDBClient()[dbName][collection]
 
         if 'Version' in query:
             if query['Version'] in ['Current', 'Latest']:
@@ -796,6 +2372,9 @@ class DatabaseHandler:
         ))
 
         _collection.delete_many(query)
+        self._invalidateParametersCache(dbName, query.get('Version', None))
+        if collection == 'metadata':
+            self.refreshTaggedVersions(dbName)
 
         return
 
@@ -819,7 +2398,7 @@ class DatabaseHandler:
             The new value to set for the parameter
         '''
 
-        collection = DatabaseHandler.dbClient[dbName].telescopes
+        collection = self._getDBClient()[dbName].telescopes
 
         _version = version
         if version in ['Current', 'Latest']:
@@ -845,9 +2424,89 @@ class DatabaseHandler:
         queryUpdate = {'$set': {'Value': newValue}}
 
         collection.update_one(query, queryUpdate)
+        self._invalidateParametersCache(dbName, _version)
 
         return
 
+    def updateParameters(self, dbName, changes):
+        '''
+        Update several parameter values with a single (unordered) bulk write.
+        As for updateParameter, this function should be rarely used since new values
+        should ideally have their own version.
+
+        Parameters
+        ----------
+        dbName: str
+            the name of the DB
+        changes: list of tuple
+            Changes given as (telescope, version, parameter, newValue).
+
+        Returns
+        -------
+        list of tuple
+            The changes that failed, given as (change, error message). A change fails if
+            the write is rejected by the DB or if no entry matches the telescope, version
+            and parameter.
+        '''
+
+        collection = self._getDBClient()[dbName].telescopes
+
+        _taggedVersions = {
+            version: self._getTaggedVersion(dbName, version)
+            for version in {change[1] for change in changes}
+            if version in ['Current', 'Latest']
+        }
+
+        queries = [
+            {
+                'Telescope': telescope,
+                'Version': _taggedVersions.get(version, version),
+                'Parameter': parameter,
+            }
+            for telescope, version, parameter, _ in changes
+        ]
+        if len(queries) == 0:
+            return list()
+
+        self._logger.info('Updating {} parameter values in DB {}'.format(len(queries), dbName))
+
+        failed = dict()
+        try:
+            result = collection.bulk_write(
+                [
+                    UpdateOne(query, {'$set': {'Value': change[3]}})
+                    for query, change in zip(queries, changes)
+                ],
+                ordered=False
+            )
+            nMatched = result.matched_count
+        except BulkWriteError as exc:
+            for error in exc.details['writeErrors']:
+                failed[error['index']] = error['errmsg']
+            nMatched = exc.details['nMatched']
+        finally:
+            for version in {query['Version'] for query in queries}:
+                self._invalidateParametersCache(dbName, version)
+
+        if nMatched < len(queries) - len(failed):
+            # Finding which changes did not match any entry.
+            _matched = {
+                (post['Telescope'], post['Version'], post['Parameter'])
+                for post in collection.find(
+                    {'$or': queries},
+                    {'_id': False, 'Telescope': True, 'Version': True, 'Parameter': True}
+                )
+            }
+            for index, query in enumerate(queries):
+                if index in failed:
+                    continue
+                if (query['Telescope'], query['Version'], query['Parameter']) not in _matched:
+                    failed[index] = 'No entry found for {}'.format(query)
+
+        for index in sorted(failed.keys()):
+            self._logger.error('Update {} failed: {}'.format(changes[index], failed[index]))
+        return [(changes[index], failed[index]) for index in sorted(failed.keys())]
+
     def addParameter(self, dbName, telescope, parameter, newVersion, newValue):
         '''
         Add a parameter value for a specific telescope.
@@ -869,7 +2528,7 @@ class DatabaseHandler:
             The new value to set for the parameter
         '''
 
-        collection = DatabaseHandler.dbClient[dbName].telescopes
+        collection = self._getDBClient()[dbName].telescopes
 
         _newVersion = newVersion
         if newVersion in ['Current', 'Latest']:
@@ -888,6 +2547,7 @@ class DatabaseHandler:
         self._logger.info('Will add the following entry to DB\n', parEntry)
 
         collection.insert_one(parEntry)
+        self._invalidateParametersCache(dbName, _newVersion)
 
         return
 
@@ -914,7 +2574,7 @@ class DatabaseHandler:
             Any additional fields to add to the parameter
         '''
 
-        collection = DatabaseHandler.dbClient[dbName].telescopes
+        collection = self._getDBClient()[dbName].telescopes
 
         dbEntry = dict()
         dbEntry['Telescope'] = telescope
@@ -932,9 +2592,140 @@ class DatabaseHandler:
         self._logger.info('Will add the following entry to DB\n', dbEntry)
 
         collection.insert_one(dbEntry)
+        self._invalidateParametersCache(dbName, version)
 
         return
 
+    def ensureIndexes(self, dbName=None):
+        '''
+        Create the indexes (given by INDEXES) used by the queries of this class, if they
+        do not exist yet. Requires write permission on the DB.
+
+        Parameters
+        ----------
+        dbName: str, optional
+            the name of the DB (default is DB_CTA_SIMULATION_MODEL).
+
+        Returns
+        -------
+        dict
+            Names of the indexes of each collection.
+        '''
+        dbName = DatabaseHandler.DB_CTA_SIMULATION_MODEL if dbName is None else dbName
+        indexNames = dict()
+        for collectionName, indexes in DatabaseHandler.INDEXES.items():
+            collection = self._getDBClient()[dbName][collectionName]
+            indexNames[collectionName] = [collection.create_index(keys) for keys in indexes]
+            self._logger.info('Indexes of {}.{}: {}'.format(
+                dbName,
+                collectionName,
+                indexNames[collectionName]
+            ))
+        return indexNames
+
+    def _getStandardQueries(self, dbName):
+        '''
+        Build the standard queries run by this class, using the values of existing entries.
+
+        Returns
+        -------
+        dict
+            (collection name, query, sort) of each query name.
+        '''
+        db = self._getDBClient()[dbName]
+        queries = dict()
+        telEntry = db.telescopes.find_one({}, sort=[('_id', pymongo.DESCENDING)])
+        if telEntry is not None:
+            _tel = {'Telescope': telEntry['Telescope'], 'Version': telEntry['Version']}
+            queries['readMongoDB'] = ('telescopes', _tel, None)
+            queries['readMongoDB-onlyApplicable'] = (
+                'telescopes',
+                {**_tel, 'Applicable': True},
+                None
+            )
+            queries['updateParameter'] = (
+                'telescopes',
+                {**_tel, 'Parameter': telEntry['Parameter']},
+                None
+            )
+            queries['addParameter'] = (
+                'telescopes',
+                {'Telescope': telEntry['Telescope'], 'Parameter': telEntry['Parameter']},
+                [('_id', pymongo.DESCENDING)]
+            )
+            queries['getModelParametersMultiple'] = (
+                'telescopes',
+                {'$or': [{'Telescope': telEntry['Telescope'], 'Version': telEntry['Version']}]},
+                None
+            )
+        siteEntry = db.sites.find_one({}, sort=[('_id', pymongo.DESCENDING)])
+        if siteEntry is not None:
+            queries['getSiteParameters'] = (
+                'sites',
+                {'Site': siteEntry['Site'], 'Version': siteEntry['Version']},
+                None
+            )
+        queries['getTaggedVersion'] = (
+            'metadata',
+            {'Entry': 'Simulation-Model-Tags'},
+            [('_id', pymongo.DESCENDING)]
+        )
+        return queries
+
+    def explainQueries(self, dbName=None):
+        '''
+        Get the execution statistics (from explain) of the standard queries run by this class,
+        e.g. to check that indexes are used (docsExamined close to nReturned) after ensureIndexes.
+
+        Parameters
+        ----------
+        dbName: str, optional
+            the name of the DB (default is DB_CTA_SIMULATION_MODEL).
+
+        Returns
+        -------
+        dict
+            Statistics of each query: nReturned, docsExamined, keysExamined, executionTimeMillis
+            and the winning plan stages (e.g. IXSCAN or COLLSCAN). None if the server does not
+            provide execution statistics.
+        '''
+        dbName = DatabaseHandler.DB_CTA_SIMULATION_MODEL if dbName is None else dbName
+        stats = dict()
+        for queryName, (collectionName, query, sort) in self._getStandardQueries(dbName).items():
+            cursor = self._getDBClient()[dbName][collectionName].find(query)
+            if sort is not None:
+                cursor = cursor.sort(sort)
+            try:
+                explain = cursor.explain()
+            except (AttributeError, NotImplementedError):
+                # Stand-ins of the DB (e.g. mongomock) may not implement explain.
+                explain = dict()
+            if 'executionStats' not in explain:
+                stats[queryName] = None
+                continue
+
+            executionStats = explain['executionStats']
+            stats[queryName] = {
+                'nReturned': executionStats['nReturned'],
+                'docsExamined': executionStats['totalDocsExamined'],
+                'keysExamined': executionStats['totalKeysExamined'],
+                'executionTimeMillis': executionStats['executionTimeMillis'],
+                'stages': self._getPlanStages(explain['queryPlanner']['winningPlan'])
+            }
+            self._logger.info('{}: {}'.format(queryName, stats[queryName]))
+        return stats
+
+    @staticmethod
+    def _getPlanStages(plan):
+        ''' List the stages of a query plan (as returned by explain), from the outermost. '''
+        # Servers using the slot based engine nest the plan in queryPlan.
+        plan = plan.get('queryPlan', plan)
+        stages = list()
+        while plan is not None:
+            stages.append(plan['stage'])
+            plan = plan.get('inputStage', None)
+        return stages
+
     def _getTaggedVersion(self, dbName, version='Current'):
         '''
         Get the tag of the "Current" or "Latest" version of the MC Model.
@@ -957,9 +2748,19 @@ class DatabaseHandler:
         if version not in ['Current', 'Latest']:
             raise ValueError('The only default versions are "Current" or "Latest"')
 
-        collection = DatabaseHandler.dbClient[dbName].metadata
-        query = {'Entry': 'Simulation-Model-Tags'}
+        if DatabaseHandler.snapshot is not None:
+            return DatabaseHandler.snapshot.getTaggedVersion(version)
+
+        tags = DatabaseHandler.taggedVersionsCache.get(dbName)
+        DatabaseHandler.metrics.record('taggedVersionsCache', cacheHit=tags is not None, db=dbName)
+        if tags is None:
+            collection = self._getDBClient()[dbName].metadata
+            query = {'Entry': 'Simulation-Model-Tags'}
 
-        tags = collection.find(query).sort('_id', pymongo.DESCENDING)[0]
+            with DatabaseHandler.metrics.measure('getTaggedVersion', db=dbName) as event:
+                tags = collection.find(query).sort('_id', pymongo.DESCENDING)[0]['Tags']
+                event['documents'] = 1
+            DatabaseHandler.taggedVersionsCache.set(dbName, tags)
+            self._logger.debug('Tags of DB {}: {}'.format(dbName, tags))
 
-        return tags['Tags'][version]['Value']
+        return tags[version]['Value']
@@ -0,0 +1,233 @@
+''' Module to store a model version of the MongoDB in a local SQLite file. '''
+
+import logging
+import os
+import sqlite3
+from pathlib import Path
+from threading import Lock
+
+import bson
+from bson.errors import InvalidBSON
+
+__all__ = ['DBSnapshot', 'SnapshotFile']
+
+
+class SnapshotFile:
+    '''
+    File of tabulated data stored in a DBSnapshot. It provides the attributes of the
+    GridFS files used by the DatabaseHandler (filename, length and md5).
+    '''
+    def __init__(self, filename, md5, content):
+        self.filename = filename
+        self.md5 = md5
+        self.length = len(content)
+        self._content = content
+
+    def read(self):
+        ''' Return the content of the file (bytes). '''
+        return self._content
+
+
+class DBSnapshot:
+    '''
+    Read-only snapshot of one model version of the MongoDB, stored in a SQLite file.
+    It contains the model tags ("Current" and "Latest"), the entries of the telescopes and
+    sites collections and the files of tabulated data. Snapshots are written by
+    DatabaseHandler.exportSnapshot.
+
+    The parameter entries are stored (BSON encoded) as returned by DatabaseHandler.readMongoDB,
+    in rows indexed by (collection, name, version, parameter), where name is the telescope
+    label (e.g. North-MST-Structure-D) or the site.
+
+    Methods
+    -------
+    write(fileName, tags, entries, files)
+        Write a snapshot into a new SQLite file.
+    getTaggedVersion(version)
+        Get the version of the "Current" or "Latest" tag.
+    getParameters(collectionName, name, version, onlyApplicable=False)
+        Get the parameter entries of a telescope label or site.
+    getFile(fileName)
+        Get a file of tabulated data.
+    '''
+    def __init__(self, fileName, logger=__name__):
+        '''
+        DBSnapshot init.
+
+        Parameters
+        ----------
+        fileName: str or Path
+            Name of the SQLite file of the snapshot.
+        logger: str
+            Logger name to use in this instance
+        '''
+        self._logger = logging.getLogger(logger)
+        self.fileName = Path(fileName)
+        if not self.fileName.exists():
+            raise FileNotFoundError('DB snapshot {} does not exist'.format(self.fileName))
+
+        self._logger.debug('Opening DB snapshot {}'.format(self.fileName))
+        # The snapshot is read-only, so a single connection can be shared by several threads.
+        self._connection = sqlite3.connect(
+            self.fileName.resolve().as_uri() + '?mode=ro',
+            uri=True,
+            check_same_thread=False
+        )
+        self._lock = Lock()
+
+    def __repr__(self):
+        return 'DBSnapshot({})\n'.format(self.fileName)
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    @staticmethod
+    def write(fileName, tags, entries, files):
+        '''
+        Write a snapshot into a new SQLite file. An existing file is replaced only after
+        the new snapshot is complete.
+
+        Parameters
+        ----------
+        fileName: str or Path
+            Name of the SQLite file of the snapshot.
+        tags: dict
+            Version of each tag (e.g. {'Current': '2020-06-28'}).
+        entries: iterable
+            Parameter entries, given as (collection, name, version, parameter, entry), where
+            collection is 'telescopes' or 'sites' and entry is a dict.
+        files: iterable
+            Files of tabulated data, given as (filename, md5, content).
+        '''
+        fileName = Path(fileName)
+        tmpFile = fileName.with_name(fileName.name + '.{}.tmp'.format(os.getpid()))
+        tmpFile.unlink(missing_ok=True)
+
+        connection = sqlite3.connect(tmpFile)
+        try:
+            with connection:
+                connection.execute('CREATE TABLE tags (tag TEXT PRIMARY KEY, version TEXT)')
+                connection.execute(
+                    'CREATE TABLE parameters ('
+                    'collection TEXT, name TEXT, version TEXT, parameter TEXT, '
+                    'applicable INTEGER, entry BLOB, '
+                    'PRIMARY KEY (collection, name, version, parameter))'
+                )
+                connection.execute(
+                    'CREATE TABLE files (filename TEXT PRIMARY KEY, md5 TEXT, content BLOB)'
+                )
+                connection.executemany('INSERT INTO tags VALUES (?, ?)', tags.items())
+                # Repeated entries replace the previous ones, as in DatabaseHandler.readMongoDB.
+                connection.executemany(
+                    'INSERT OR REPLACE INTO parameters VALUES (?, ?, ?, ?, ?, ?)',
+                    (
+                        (
+                            collection,
+                            name,
+                            version,
+                            parameter,
+                            bool(entry.get('Applicable', False)),
+                            bson.encode(dict(entry))
+                        )
+                        for collection, name, version, parameter, entry in entries
+                    )
+                )
+                connection.executemany(
+                    'INSERT OR REPLACE INTO files VALUES (?, ?, ?)',
+                    files
+                )
+        except BaseException:
+            connection.close()
+            tmpFile.unlink(missing_ok=True)
+            raise
+        connection.close()
+        os.replace(tmpFile, fileName)
+
+    def getTaggedVersion(self, version='Current'):
+        '''
+        Get the version of the "Current" or "Latest" tag, as it was when the snapshot was written.
+
+        Parameters
+        ----------
+        version: str
+            Can be "Current" or "Latest" (default: "Current").
+
+        Returns
+        -------
+        str
+        '''
+        rows = self._query('SELECT version FROM tags WHERE tag = ?', (version,))
+        if len(rows) == 0:
+            raise ValueError('Tag {} not found in the DB snapshot {}'.format(
+                version,
+                self.fileName
+            ))
+        return rows[0][0]
+
+    def getParameters(self, collectionName, name, version, onlyApplicable=False):
+        '''
+        Get the parameter entries of a telescope label or site.
+
+        Parameters
+        ----------
+        collectionName: str
+            'telescopes' or 'sites'
+        name: str
+            Telescope label (e.g. North-LST-1) or site.
+        version: str
+            Version of the model.
+        onlyApplicable: bool
+            If True, only applicable parameters are returned.
+
+        Returns
+        -------
+        dict
+            Entries (dicts) of each parameter, empty if none is found.
+
+        Raises
+        ------
+        ValueError
+            If the entries cannot be decoded (e.g. snapshot written with pickled entries).
+        '''
+        sql = (
+            'SELECT parameter, entry FROM parameters '
+            'WHERE collection = ? AND name = ? AND version = ?'
+        )
+        if onlyApplicable:
+            sql += ' AND applicable = 1'
+        rows = self._query(sql + ' ORDER BY rowid', (collectionName, name, version))
+        try:
+            return {parameter: bson.decode(entry) for parameter, entry in rows}
+        except InvalidBSON:
+            msg = 'Invalid parameter entries in the DB snapshot {}'.format(self.fileName)
+            self._logger.error(msg)
+            raise ValueError(msg)
+
+    def getFile(self, fileName):
+        '''
+        Get a file of tabulated data.
+
+        Parameters
+        ----------
+        fileName: str
+            The name of the file requested
+
+        Returns
+        -------
+        SnapshotFile
+
+        Raises
+        ------
+        FileNotFoundError
+            If the file is not in the snapshot.
+        '''
+        rows = self._query('SELECT md5, content FROM files WHERE filename = ?', (fileName,))
+        if len(rows) == 0:
+            raise FileNotFoundError(
+                'The file {} does not exist in the DB snapshot {}'.format(fileName, self.fileName)
+            )
+        md5, content = rows[0]
+        return SnapshotFile(fileName, md5, content)
+
+# END of DBSnapshot
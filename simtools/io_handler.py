@@ -10,6 +10,7 @@ __all__ = [
     'getModelOutputDirectory',
     'getRayTracingOutputDirectory',
     'getCorsikaOutputDirectory',
+    'getCacheDirectory',
     'getTestDataFile',
     'getTestPlotFile'
 ]
@@ -127,6 +128,26 @@ def getApplicationOutputDirectory(filesLocation, label):
     return getOutputDirectory(filesLocation, label, 'application')
 
 
+def getCacheDirectory(filesLocation, kind):
+    '''
+    Get directory for cached files (e.g. parsed model files), shared by all labels.
+
+    Parameters
+    ----------
+    filesLocation: str, or Path
+        Main location of the output files.
+    kind: str
+        Kind of cached files, used as sub-directory name.
+
+    Returns
+    -------
+    Path
+    '''
+    path = Path(filesLocation).joinpath('simtools-output').joinpath('cache').joinpath(kind)
+    path.mkdir(parents=True, exist_ok=True)
+    return path.absolute()
+
+
 def getTestDataFile(fileName):
     '''
     Get path of a test file, using the  testDataLocation taken from the config file.
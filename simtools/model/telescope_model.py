@@ -1,13 +1,23 @@
+import asyncio
+import hashlib
 import logging
+import os
+import uuid
 import yaml
 import copy
+import numpy as np
+import astropy.units as u
+from collections import ChainMap
 from pathlib import Path
+from threading import Lock
 
 import simtools.config as cfg
 import simtools.io_handler as io
 from simtools import db_handler
+from simtools.async_db_handler import AsyncDatabaseHandler
 from simtools.util import names
 from simtools.util.model import validateModelParameter
+from simtools.util.simtel_config import readSimtelConfigFile
 from simtools.model.mirrors import Mirrors
 from simtools.model.camera import Camera
 from simtools.model.model_parameters import MODEL_PARS
@@ -36,23 +46,37 @@ class TelescopeModel:
 
     Methods
     -------
-    fromConfigFile(configFileName, telescopeName, label=None, filesLocation=None)
+    fromConfigFile(configFileName, telescopeName, label=None, filesLocation=None, definitions=None)
         Create a TelescopeModel from a sim_telarray cfg file.
+    fromDBConcurrently(telescopeNames, version='Current', label=None, maxConcurrency=8)
+        Create the TelescopeModels of several telescopes, reading the DB concurrently (asyncio).
+    getSharedModel(telescopeName, version='Current')
+        Get the unmodifiable model of a telescope shared by all the callers in the process.
+    evictSharedModels(telescopeName=None, version=None)
+        Remove shared models, so that they are loaded again by getSharedModel.
     hasParameter(parName):
         Verify if parameter is in the model.
     getParameter(parName):
         Get an existing parameter of the model.
+    getParameterValue(parName, unit=None, asArray=False)
+        Get the numerical value of an existing parameter (float, array or astropy quantity).
     addParameters(**kwargs)
         Add new parameters to the model.
     changeParameters(**kwargs)
         Change the value of existing parameters to the model.
     removeParameters(**args)
         Remove parameters from the model.
+    derive(label=None, **kwargs)
+        Create a copy of the model with some parameters changed, sharing the other ones.
     exportConfigFile()
         Export config file for sim_telarray.
     getConfigFile()
         Get the path to the config file for sim_telarray.
     '''
+    # Models shared by getSharedModel, with a lock for each one to load it only once.
+    _sharedModels = dict()
+    _sharedModelsLock = Lock()
+
     def __init__(
         self,
         telescopeName,
@@ -95,6 +119,15 @@ class TelescopeModel:
         self._filesLocation = cfg.getConfigArg('outputLocation', filesLocation)
 
         self._parameters = dict()
+        # Numerical values parsed from _parameters (see getParameterValue).
+        self._parsedParameters = dict()
+        # True if _parameters is shared with derived models (see derive).
+        self._parametersShared = False
+        # True for the shared models, which cannot be modified (see getSharedModel).
+        self._isFrozen = False
+        # Lock of the lazy loading of the mirrors and camera, which are loaded only once even
+        # if several threads use a (shared) model at the same time.
+        self._loadLock = Lock()
 
         if readFromDB:
             self._loadParametersFromDB()
@@ -102,16 +135,29 @@ class TelescopeModel:
         self._setConfigFileDirectory()
         self._isConfigFileUpdated = False
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_loadLock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._loadLock = Lock()
+
     @property
     def mirrors(self):
         if '_mirrors' not in self.__dict__:
-            self._loadMirrors()
+            with self._loadLock:
+                if '_mirrors' not in self.__dict__:
+                    self._loadMirrors()
         return self._mirrors
 
     @property
     def camera(self):
         if '_camera' not in self.__dict__:
-            self._loadCamera()
+            with self._loadLock:
+                if '_camera' not in self.__dict__:
+                    self._loadCamera()
         return self._camera
 
     @classmethod
@@ -122,15 +168,14 @@ class TelescopeModel:
         label=None,
         modelFilesLocations=None,
         filesLocation=None,
+        definitions=None,
         logger=__name__
     ):
         '''
-        Create a TelescopeModel from a sim_telarray config file.
-
-        Note
-        ----
-        Todo: Dealing with ifdef/indef etc. By now it just keeps the last version of the parameters
-        in the file.
+        Create a TelescopeModel from a sim_telarray config file. The preprocessor directives of
+        the file (#include, #define, #ifdef, #if etc) are resolved as in sim_telarray (see
+        simtools.util.simtel_config.readSimtelConfigFile). The included files are searched in the
+        directory of the config file and in the model files locations.
 
         Parameters
         ----------
@@ -145,14 +190,22 @@ class TelescopeModel:
         filesLocation: str (or Path), optional
             Parent location of the output files created by this class. If not given, it will be
             taken from the config.yml file.
+        definitions: dict, optional
+            Preprocessor macros defined before reading the file (ex. {'TELESCOPE': 1}).
         logger: str
             Logger name to use in this instance
 
         Returns
         -------
         Instance of the TelescopeModel class.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the file or an included file does not exist.
+        ValueError
+            If the preprocessor directives of the file are not valid.
         '''
-        parameters = dict()
         tel = cls(
             telescopeName=telescopeName,
             label=label,
@@ -162,44 +215,16 @@ class TelescopeModel:
             logger=logger
         )
 
-        def _processLine(words):
-            '''
-            Process a line of the input config file that contains a parameter.
-
-            Parameters
-            ----------
-            words: list of str
-                List of str from the split of a line from the file.
-
-            Returns
-            -------
-            (parName, parValue)
-            '''
-            iComment = len(words)  # Index of any possible comment
-            for w in words:
-                if '%' in w:
-                    iComment = words.index(w)
-                    break
-            words = words[0:iComment]  # Removing comment
-            parName = words[0].replace('=', '')
-            parValue = ''
-            for w in words[1:]:
-                w = w.replace('=', '')
-                w = w.replace(',', ' ')
-                parValue += w + ' '
-            return parName, parValue
-
-        with open(configFileName, 'r') as file:
-            for line in file:
-                words = line.split()
-                if len(words) == 0:
-                    continue
-                elif '%' in words[0] or 'echo' in words:
-                    continue
-                elif '#' not in line and len(words) > 0:
-                    par, value = _processLine(words)
-                    par, value = validateModelParameter(par, value)
-                    parameters[par] = value
+        includePaths = tel._modelFilesLocations
+        includePaths = includePaths if isinstance(includePaths, list) else [includePaths]
+        fileParameters = readSimtelConfigFile(
+            configFileName,
+            includePaths=[path for path in includePaths if path is not None],
+            definitions=definitions
+        )
+        parameters = dict(
+            validateModelParameter(par, value) for par, value in fileParameters.items()
+        )
 
         tel.addParameters(**parameters)
         return tel
@@ -212,6 +237,159 @@ class TelescopeModel:
             self._logger.info('Creating directory {}'.format(self._configFileDirectory))
         return
 
+    @classmethod
+    async def fromDBConcurrently(
+        cls,
+        telescopeNames,
+        version='Current',
+        label=None,
+        maxConcurrency=8,
+        modelFilesLocations=None,
+        filesLocation=None,
+        logger=__name__
+    ):
+        '''
+        Create the TelescopeModels of several telescopes, reading their parameters from the DB
+        concurrently with AsyncDatabaseHandler. To be awaited, e.g.
+        asyncio.run(TelescopeModel.fromDBConcurrently(['North-LST-1', 'North-MST-FlashCam-D'])).
+
+        Parameters
+        ----------
+        telescopeNames: list of str
+            Telescope names (ex. North-LST-1, ...).
+        version: str, optional
+            Version of the model (ex. prod4) (default: "Current").
+        label: str, optional
+            Instance label. Important for output file naming.
+        maxConcurrency: int
+            Maximum number of models read at the same time.
+        modelFilesLocation: str (or Path), optional
+            Location of the MC model files. If not given, it will be taken from the config.yml file.
+        filesLocation: str (or Path), optional
+            Parent location of the output files created by this class. If not given, it will be
+            taken from the config.yml file.
+        logger: str
+            Logger name to use in this instance
+
+        Returns
+        -------
+        list of TelescopeModel
+            In the same order as telescopeNames.
+        '''
+        semaphore = asyncio.Semaphore(maxConcurrency)
+
+        async with AsyncDatabaseHandler(logger) as db:
+
+            async def _loadModel(telescopeName):
+                async with semaphore:
+                    tel = cls(
+                        telescopeName=telescopeName,
+                        version=version,
+                        label=label,
+                        modelFilesLocations=modelFilesLocations,
+                        filesLocation=filesLocation,
+                        readFromDB=False,
+                        logger=logger
+                    )
+                    await tel._loadParametersFromDBAsync(db)
+                    return tel
+
+            return await asyncio.gather(*[_loadModel(tel) for tel in telescopeNames])
+
+    @classmethod
+    def getSharedModel(
+        cls,
+        telescopeName,
+        version='Current',
+        modelFilesLocations=None,
+        filesLocation=None,
+        logger=__name__
+    ):
+        '''
+        Get the model of a telescope shared by all the callers in the process, so that the
+        parameters are read from the DB only once per (telescopeName, version,
+        modelFilesLocations, filesLocation). The mirrors and camera are loaded when first used,
+        also only once, even if several threads use the model at the same time. The shared model
+        has no label and cannot be modified (addParameters, changeParameters and
+        removeParameters raise ValueError): callers needing modifications or their own label
+        must use derive.
+
+        Shared models are kept until evicted with evictSharedModels (e.g. to read again a
+        version given by the "Current" or "Latest" tags).
+
+        Parameters
+        ----------
+        telescopeName: str
+            Telescope name (ex. North-LST-1, ...).
+        version: str, optional
+            Version of the model (ex. prod4) (default: "Current").
+        modelFilesLocation: str (or Path), optional
+            Location of the MC model files. If not given, it will be taken from the config.yml file.
+        filesLocation: str (or Path), optional
+            Parent location of the output files created by this class. If not given, it will be
+            taken from the config.yml file.
+        logger: str
+            Logger name to use in the shared model, if created by this call.
+
+        Returns
+        -------
+        TelescopeModel
+        '''
+        _modelFilesLocations = cfg.getConfigArg('modelFilesLocations', modelFilesLocations)
+        key = (
+            names.validateTelescopeName(telescopeName),
+            names.validateModelVersionName(version),
+            repr(_modelFilesLocations),
+            str(cfg.getConfigArg('outputLocation', filesLocation))
+        )
+        with cls._sharedModelsLock:
+            entry = cls._sharedModels.setdefault(key, {'lock': Lock(), 'model': None})
+
+        # Models of different telescopes can be loaded concurrently.
+        with entry['lock']:
+            if entry['model'] is None:
+                tel = cls(
+                    telescopeName=telescopeName,
+                    version=version,
+                    modelFilesLocations=modelFilesLocations,
+                    filesLocation=filesLocation,
+                    logger=logger
+                )
+                tel._isFrozen = True
+                entry['model'] = tel
+            return entry['model']
+
+    @classmethod
+    def evictSharedModels(cls, telescopeName=None, version=None):
+        '''
+        Remove shared models (see getSharedModel), so that they are loaded again when requested.
+        The models already obtained by callers are not affected.
+
+        Parameters
+        ----------
+        telescopeName: str, optional
+            Telescope name. If not given, the models of all telescopes are removed.
+        version: str, optional
+            Version of the model. If not given, the models of all versions are removed.
+
+        Returns
+        -------
+        int
+            Number of models removed.
+        '''
+        _telescopeName = (
+            names.validateTelescopeName(telescopeName) if telescopeName is not None else None
+        )
+        _version = names.validateModelVersionName(version) if version is not None else None
+        with cls._sharedModelsLock:
+            keys = [
+                key for key in cls._sharedModels.keys()
+                if _telescopeName in [None, key[0]] and _version in [None, key[1]]
+            ]
+            for key in keys:
+                del cls._sharedModels[key]
+        return len(keys)
+
     def _loadParametersFromDB(self):
         ''' Read parameters from DB and store them in _parameters. '''
 
@@ -219,11 +397,12 @@ class TelescopeModel:
 
         self._setConfigFileDirectory()
         db = db_handler.DatabaseHandler(self._logger.name)
-        self._parameters = db.getModelParameters(
+        _pars = db.getModelParameters(
             self.telescopeName,
             self.version,
             self._configFileDirectory,
-            onlyApplicable=True
+            onlyApplicable=True,
+            fields=['Value']
         )
 
         self._logger.debug('Reading site parameters from DB')
@@ -233,8 +412,59 @@ class TelescopeModel:
             site,
             self.version,
             self._configFileDirectory,
-            onlyApplicable=True
+            onlyApplicable=True,
+            fields=['Value']
+        )
+        self._setParametersFromDB(_pars, _sitePars)
+
+    async def _loadParametersFromDBAsync(self, db):
+        '''
+        Read parameters from DB and store them in _parameters, reading the telescope and site
+        parameters concurrently.
+
+        Parameters
+        ----------
+        db: AsyncDatabaseHandler
+        '''
+
+        self._logger.debug('Reading telescope and site parameters from DB')
+
+        self._setConfigFileDirectory()
+        site = names.getSiteFromTelescopeName(self.telescopeName)
+        _pars, _sitePars = await asyncio.gather(
+            db.getModelParameters(
+                self.telescopeName,
+                self.version,
+                self._configFileDirectory,
+                onlyApplicable=True,
+                fields=['Value']
+            ),
+            db.getSiteParameters(
+                site,
+                self.version,
+                self._configFileDirectory,
+                onlyApplicable=True,
+                fields=['Value']
+            )
         )
+        self._setParametersFromDB(_pars, _sitePars)
+
+    def _setParametersFromDB(self, parameters, siteParameters):
+        '''
+        Store the parameters read from DB in _parameters, keeping only the ones
+        that can be read by sim_telarray.
+
+        Parameters
+        ----------
+        parameters: dict
+            Telescope parameters, as returned by DatabaseHandler.getModelParameters.
+        siteParameters: dict
+            Site parameters, as returned by DatabaseHandler.getSiteParameters.
+        '''
+        self._parameters = parameters
+        self._parametersShared = False
+        self._parsedParameters = dict()
+        _sitePars = siteParameters
 
         # Only the following are read by sim_telarray, the others produce an error.
         # TODO - Should we find a better solution for this?
@@ -264,7 +494,7 @@ class TelescopeModel:
             if _parNow in self._parameters:
                 self._parameters.pop(_parNow, None)
 
-    # END _loadParametersFromDB
+    # END _setParametersFromDB
 
     def hasParameter(self, parName):
         '''
@@ -306,6 +536,79 @@ class TelescopeModel:
             self._logger.error(msg)
             raise ValueError(msg)
 
+    def getParameterValue(self, parName, unit=None, asArray=False):
+        '''
+        Get the numerical value of an EXISTING parameter of the model, parsed from its value
+        (number or str with values separated by spaces or commas). The parsed values are cached
+        until the parameter is changed, so they can be used in loops without parsing the
+        parameter again. Arrays are returned as read-only.
+
+        Parameters
+        ----------
+        parName: str
+            Name of the parameter.
+        unit: str or astropy.units.Unit, optional
+            If given, the value is returned as an astropy quantity with this unit. Values set as
+            astropy quantities are converted to this unit (required for them).
+        asArray: bool
+            If True, an array is returned even if the parameter has a single value.
+
+        Returns
+        -------
+        float, numpy.ndarray or astropy.units.Quantity
+            Value of the parameter (array if it has several values or asArray is True).
+
+        Raises
+        ------
+        ValueError
+            If parName does not match any parameter in _parameters, if its value is not
+            numerical, or if its value is a quantity and unit is not given (or not compatible).
+        '''
+        key = (parName, None if unit is None else u.Unit(unit), asArray)
+        if key in self._parsedParameters:
+            return self._parsedParameters[key]
+
+        value = self.getParameter(parName)
+        if isinstance(value, u.Quantity):
+            # Quantities are converted to the requested unit, their unit is never dropped.
+            if unit is None:
+                msg = 'Parameter {} has a unit ({}), the unit must be given'.format(
+                    parName,
+                    value.unit
+                )
+                self._logger.error(msg)
+                raise ValueError(msg)
+            try:
+                value = value.to_value(key[1])
+            except u.UnitConversionError:
+                msg = 'Parameter {} ({}) cannot be converted to {}'.format(parName, value, unit)
+                self._logger.error(msg)
+                raise ValueError(msg)
+        try:
+            if isinstance(value, str):
+                values = np.array(value.replace(',', ' ').split(), dtype=float)
+            else:
+                values = np.array(value, dtype=float, ndmin=1)
+        except ValueError:
+            msg = 'Parameter {} is not numerical ({})'.format(parName, value)
+            self._logger.error(msg)
+            raise ValueError(msg)
+
+        parsed = values if asArray or values.size != 1 else values[0]
+        if unit is not None:
+            parsed = u.Quantity(parsed, key[1])
+        if isinstance(parsed, np.ndarray):
+            parsed.setflags(write=False)
+        else:
+            parsed = float(parsed)
+        self._parsedParameters[key] = parsed
+        return parsed
+
+    def _invalidateParsedParameters(self, *parNames):
+        ''' Remove the cached values of parameters (see getParameterValue). '''
+        for key in [key for key in self._parsedParameters if key[0] in parNames]:
+            del self._parsedParameters[key]
+
     def addParameters(self, **kwargs):
         '''
         Add a NEW parameters to the model.
@@ -319,8 +622,11 @@ class TelescopeModel:
         Raises
         ------
         ValueError
-            If an existing parameter is tried to be set added.
+            If an existing parameter is tried to be set added, or if the model is shared
+            (see getSharedModel).
         '''
+        self._checkIsNotFrozen()
+        self._unshareParameters()
         for par, value in kwargs.items():
             if par in self._parameters.keys():
                 msg = 'Parameter {} already in the model, use changeParameter instead'.format(par)
@@ -329,6 +635,7 @@ class TelescopeModel:
             else:
                 self._logger.info('Adding {}={} to the model'.format(par, value))
                 self._parameters[par] = str(value)
+        self._invalidateParsedParameters(*kwargs.keys())
         self._isConfigFileUpdated = False
 
     def changeParameters(self, **kwargs):
@@ -344,18 +651,26 @@ class TelescopeModel:
         Raises
         ------
         ValueError
-            If the parameter to be changed does not exist.
+            If the parameter to be changed does not exist, or if the model is shared
+            (see getSharedModel).
         '''
+        self._checkIsNotFrozen()
+        self._unshareParameters()
         for par, value in kwargs.items():
             if par not in self._parameters.keys():
                 msg = 'Parameter {} not in the model, use addParameters instead'.format(par)
                 self._logger.error(msg)
                 raise ValueError(msg)
             else:
-                if type(self._parameters[par]) != type(value):
+                currentValue = self._parameters[par]
+                # Values can be arrays or quantities, for which == is elementwise.
+                if type(currentValue) == type(value) and np.array_equal(currentValue, value):
+                    continue
+                if type(currentValue) != type(value):
                     self._logger.warning('Value type differs from the current one')
                 self._parameters[par] = value
-        self._isConfigFileUpdated = False
+                self._invalidateParsedParameters(par)
+                self._isConfigFileUpdated = False
 
     def removeParameters(self, *args):
         '''
@@ -369,44 +684,150 @@ class TelescopeModel:
         Raises
         ------
         ValueError
-            If the parameter to be removed is not on the model.
+            If the parameter to be removed is not on the model, or if the model is shared
+            (see getSharedModel).
         '''
+        self._checkIsNotFrozen()
+        self._unshareParameters()
+        if isinstance(self._parameters, ChainMap):
+            # Parameters of the shared layers cannot be deleted from a ChainMap.
+            self._parameters = dict(self._parameters)
         for par in args:
             if par in self._parameters.keys():
                 self._logger.info('Removing parameter {}'.format(par))
                 del self._parameters[par]
+                self._invalidateParsedParameters(par)
             else:
                 msg = 'Could not remove parameter {} because it does not exist'.format(par)
                 self._logger.error(msg)
                 raise ValueError(msg)
         self._isConfigFileUpdated = False
 
+    def derive(self, label=None, **kwargs):
+        '''
+        Create a copy of the model with some parameters changed (e.g. for parameter scans),
+        without reading the DB again or copying the parameters. The copy stores only the changed
+        parameters and shares the other ones with this model (copy-on-write: later changes of
+        either model do not affect the other one). The mirrors and camera are shared as well,
+        unless the parameters they are built from are changed.
+
+        The copy has its own label (used by e.g. RayTracing to name its outputs), while the model
+        files are kept in the directory of this model. Config files are named by the hash of the
+        parameters (see exportConfigFile), so derived models with the same parameters share the
+        same config file. Several derived models can be used concurrently.
+
+        Parameters
+        ----------
+        label: str, optional
+            Label of the derived model. If not given, it is built from the label of this model
+            and a hash of the changed parameters.
+        **kwargs
+            Parameters to be changed, passed as parameterName=value (see changeParameters).
+
+        Returns
+        -------
+        TelescopeModel
+
+        Raises
+        ------
+        ValueError
+            If a parameter to be changed does not exist.
+        '''
+        if label is None:
+            label = '{}-{}'.format(
+                self.label if self.label is not None else 'derived',
+                hashlib.sha1(repr(sorted(kwargs.items())).encode()).hexdigest()[:8]
+            )
+
+        # The current parameters are not modified anymore, neither by this model nor by the copy.
+        self._parametersShared = True
+        tel = copy.copy(self)
+        tel.label = label
+        tel._parametersShared = True
+        tel._isFrozen = False
+        tel._parsedParameters = dict(self._parsedParameters)
+        tel.__dict__.pop('_singleMirrorListFilePaths', None)
+        if 'mirror_list' in kwargs:
+            tel.__dict__.pop('_mirrors', None)
+        if any(par in kwargs for par in [
+            'camera_config_file',
+            'effective_focal_length',
+            'focal_length'
+        ]):
+            tel.__dict__.pop('_camera', None)
+
+        tel.changeParameters(**kwargs)
+        return tel
+
+    def _checkIsNotFrozen(self):
+        ''' Raise ValueError if the model is shared (see getSharedModel). '''
+        if self._isFrozen:
+            msg = 'The shared model of {} cannot be modified, use derive instead'.format(
+                self.telescopeName
+            )
+            self._logger.error(msg)
+            raise ValueError(msg)
+
+    def _unshareParameters(self):
+        '''
+        Make _parameters modifiable if it is shared with derived models, by adding an empty
+        layer on top of the shared parameters (copy-on-write).
+        '''
+        if not self._parametersShared:
+            return
+        maps = (
+            self._parameters.maps if isinstance(self._parameters, ChainMap)
+            else [self._parameters]
+        )
+        if len(maps) >= 8:
+            # Flattening long chains of derived models.
+            self._parameters = dict(ChainMap(*maps))
+        else:
+            self._parameters = ChainMap(dict(), *maps)
+        self._parametersShared = False
+
     def exportConfigFile(self):
-        ''' Export the config file used by sim_telarray. '''
+        '''
+        Export the config file used by sim_telarray. The parameters are written sorted by name
+        and the file is named by a hash of its content, so that models with the same parameters
+        (e.g. derived models) share the same file, and it is only written if it does not exist
+        yet.
+        '''
+
+        header = (
+            '%{}\n'.format(99 * '=')
+            + '% Configuration file for:\n'
+            + '% TelescopeName: {}\n'.format(self.telescopeName)
+            + '% Version: {}\n'.format(self.version)
+            + '%{}\n'.format(99 * '=')
+        )
+        content = header + ''.join(
+            '{} = {}\n'.format(par, value) for par, value in sorted(self._parameters.items())
+        )
 
         # Setting file name and the location
         configFileName = names.simtelConfigFileName(
             self.version,
             self.telescopeName,
-            self.label
+            self.label,
+            configHash=hashlib.sha1(content.encode()).hexdigest()[:16]
         )
         self._configFilePath = self._configFileDirectory.joinpath(configFileName)
 
-        # Writing parameters to the file
-        self._logger.info('Writing config file - {}'.format(self._configFilePath))
-        with open(self._configFilePath, 'w') as file:
-            header = (
-                '%{}\n'.format(99 * '=')
-                + '% Configuration file for:\n'
-                + '% TelescopeName: {}\n'.format(self.telescopeName)
-                + '% Label: {}\n'.format(self.label) if self.label is not None else ''
-                + '%{}\n'.format(99 * '=')
+        if self._configFilePath.exists():
+            self._logger.debug('Using existing config file - {}'.format(self._configFilePath))
+        else:
+            # Writing parameters to a temporary file, moved to its final name when complete,
+            # so that concurrent exports of the same parameters never see a partial file. The
+            # temporary file is created by open (not tempfile), so that its permissions follow
+            # the umask.
+            self._logger.info('Writing config file - {}'.format(self._configFilePath))
+            tmpFileName = self._configFilePath.with_name(
+                '{}.{}.tmp'.format(configFileName, uuid.uuid4().hex)
             )
-
-            file.write(header)
-            for par in self._parameters:
-                value = self._parameters[par]
-                file.write('{} = {}\n'.format(par, value))
+            with open(tmpFileName, 'x') as file:
+                file.write(content)
+            os.replace(tmpFileName, self._configFilePath)
 
         self._isConfigFileUpdated = True
     # END exportConfigFile
@@ -420,7 +841,7 @@ class TelescopeModel:
         -------
         Path of the exported config file for sim_telarray.
         '''
-        if not self._isConfigFileUpdated:
+        if not self._isConfigFileUpdated or not self._configFilePath.exists():
             self.exportConfigFile()
         return self._configFilePath
 
@@ -434,10 +855,7 @@ class TelescopeModel:
         list of floats
             List of 4 parameters that decsribe the tel. transmission vs off-axis.
         '''
-        pars = list()
-        for p in self.getParameter('telescope_transmission').split():
-            pars.append(float(p))
-        return pars
+        return list(self.getParameterValue('telescope_transmission', asArray=True))
 
     def exportSingleMirrorListFile(self, mirrorNumber, setFocalLengthToZero):
         '''
@@ -460,14 +878,19 @@ class TelescopeModel:
             mirrorNumber,
             self.label
         )
-        if '_singleMirrorListFilePath' not in self.__dict__:
+        if '_singleMirrorListFilePaths' not in self.__dict__:
             self._singleMirrorListFilePaths = dict()
         self._singleMirrorListFilePaths[mirrorNumber] = self._configFileDirectory.joinpath(fileName)
 
         __, __, diameter, flen, shape = self.mirrors.getSingleMirrorParameters(mirrorNumber)
 
-        print(self._singleMirrorListFilePaths[mirrorNumber])
-        with open(self._singleMirrorListFilePaths[mirrorNumber], 'w') as file:
+        # The file is written into a temporary file and then moved to its final name, so that
+        # concurrent sim_telarray jobs never read a partially written file. The temporary file
+        # is created by open (not tempfile), so that its permissions follow the umask.
+        filePath = self._singleMirrorListFilePaths[mirrorNumber]
+        self._logger.debug('Writing single mirror list file - {}'.format(filePath))
+        tmpFileName = filePath.with_name('{}.{}.tmp'.format(fileName, uuid.uuid4().hex))
+        with open(tmpFileName, 'x') as file:
             file.write('# Column 1: X pos. [cm] (North/Down)\n')
             file.write('# Column 2: Y pos. [cm] (West/Right from camera)\n')
             file.write('# Column 3: flat-to-flat diameter [cm]\n')
@@ -488,6 +911,7 @@ class TelescopeModel:
                 flen if not setFocalLengthToZero else 0,
                 shape
             ))
+        os.replace(tmpFileName, filePath)
     # END of exportSingleMirrorListFile
 
     def getSingleMirrorListFile(self, mirrorNumber, setFocalLengthToZero=False):
@@ -506,10 +930,10 @@ class TelescopeModel:
 
     def _loadCamera(self):
         cameraConfigFile = self._parameters['camera_config_file']
-        focalLength = self._parameters['effective_focal_length']
+        focalLength = self.getParameterValue('effective_focal_length')
         if focalLength == 0.:
             self._logger.warning('Using focal_length because effective_focal_length is 0.')
-            focalLength = self._parameters['focal_length']
+            focalLength = self.getParameterValue('focal_length')
         try:
             cameraConfigFilePath = cfg.findFile(cameraConfigFile, self._configFileDirectory)
         except:
@@ -7,7 +7,8 @@ Author: Raul R Prado
 '''
 
 import logging
-from math import sqrt, fabs, pi
+from math import pi
+from pathlib import Path
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -20,11 +21,13 @@ __all__ = ['PSFImage']
 
 class PSFImage:
     '''
-    Image composed of list of photon positions (2D).
+    Image composed of arrays of photon positions (2D).
 
     Load photon list from sim_telarray file and compute centroids, psf containers, effective area,
     as well as plot the image as a 2D histogram.
     Internal units: photon positions in cm internally.
+    Photon radii w.r.t. the centroid are kept sorted, so that containment numbers and radii are
+    obtained by a binary search instead of a loop over photons.
 
     Parameters
     ----------
@@ -39,7 +42,7 @@ class PSFImage:
 
     Methods
     -------
-    readSimtelFile(file)
+    readSimtelFile(file, useBinaryCache=False)
         Read a photon list produced by sim_telarray.
     getPSF(fraction=0.8, unit='cm')
         Compute and return a PSF container.
@@ -63,10 +66,12 @@ class PSFImage:
         '''
 
         self._logger = logging.getLogger(logger)
-        self.photonPosX = list()
-        self.photonPosY = list()
+        self.photonPosX = np.array([], dtype=float)
+        self.photonPosY = np.array([], dtype=float)
         self.centroidX = None
         self.centroidY = None
+        self._sortedRadii = None
+        self._sortedRadiiCentroid = None
         self._totalArea = totalScatteredArea
         self._storedPSF = dict()
         if focalLength is not None:
@@ -75,7 +80,7 @@ class PSFImage:
         else:
             self._hasFocalLength = False
 
-    def readSimtelFile(self, file):
+    def readSimtelFile(self, file, useBinaryCache=False):
         '''
         Read photon list file generated by sim_telarray and store the photon positions (2D).
 
@@ -83,6 +88,11 @@ class PSFImage:
         ----------
         file: str
             Name of sim_telarray file with photon list.
+        useBinaryCache: bool
+            If True, the photon positions and the header information are read from a binary
+            sidecar file (see getBinaryCacheFileName), if it exists and the photon list file was
+            not modified since it was written. Otherwise, the photon list file is parsed and the
+            sidecar file is (re)written.
 
         Raises
         ------
@@ -91,10 +101,19 @@ class PSFImage:
 
         '''
         self._logger.info('Reading SimtelFile {}'.format(file))
+
+        data = self._readBinaryCache(file) if useBinaryCache else None
+        if data is None:
+            data = self._parseSimtelFile(file)
+            if useBinaryCache:
+                self._writeBinaryCache(file, data)
+
         self._totalPhotons = 0
-        with open(file, 'r') as f:
-            for line in f:
-                self._processSimtelLine(line)
+        for nPhotons, totalAreaInFile in zip(data['headerPhotons'], data['headerAreas']):
+            self._processSimtelHeader(int(nPhotons), float(totalAreaInFile))
+        self.photonPosX = np.ascontiguousarray(data['photonPosX'], dtype=float)
+        self.photonPosY = np.ascontiguousarray(data['photonPosY'], dtype=float)
+        self._sortedRadii = None
 
         if not self._isPhotonPositionsOK():
             msg = 'Problems reading Simtel file - invalid data'
@@ -106,6 +125,128 @@ class PSFImage:
         self._numberOfDetectedPhotons = len(self.photonPosX)
         self._effectiveArea = self._numberOfDetectedPhotons * self._totalArea / self._totalPhotons
 
+    @staticmethod
+    def getBinaryCacheFileName(file):
+        '''
+        Get the name of the binary sidecar file of a photon list file.
+
+        Parameters
+        ----------
+        file: str or Path
+            Name of sim_telarray file with photon list.
+
+        Returns
+        -------
+        Path
+        '''
+        file = Path(file)
+        return file.with_name(file.name + '.npz')
+
+    def _parseSimtelFile(self, file):
+        '''
+        Parse the photon list file in a single pass. Header lines ("falling on an area of") are
+        processed separately and the numeric columns of all photon lines are loaded at once.
+
+        Parameters
+        ----------
+        file: str or Path
+            Name of sim_telarray file with photon list.
+
+        Returns
+        -------
+        dict
+            photonPosX, photonPosY, headerPhotons and headerAreas as numpy arrays.
+        '''
+        with open(file, 'r') as f:
+            lines = f.read().splitlines()
+
+        headerPhotons, headerAreas = list(), list()
+        dataLines = list()
+        for line in lines:
+            if 'falling on an area of' in line:
+                words = line.split()
+                headerPhotons.append(int(words[4]))
+                headerAreas.append(float(words[14]))
+            elif '#' not in line and not line.isspace() and len(line) > 0:
+                dataLines.append(line)
+
+        if len(dataLines) > 0:
+            # Storing photon position from cols 2 and 3
+            positions = np.loadtxt(dataLines, usecols=(2, 3), ndmin=2, dtype=float)
+        else:
+            positions = np.empty((0, 2), dtype=float)
+
+        return {
+            'photonPosX': positions[:, 0],
+            'photonPosY': positions[:, 1],
+            'headerPhotons': np.array(headerPhotons, dtype=int),
+            'headerAreas': np.array(headerAreas, dtype=float)
+        }
+
+    def _readBinaryCache(self, file):
+        '''
+        Read the binary sidecar file of a photon list file.
+
+        Parameters
+        ----------
+        file: str or Path
+            Name of sim_telarray file with photon list.
+
+        Returns
+        -------
+        dict or None
+            Same content as returned by _parseSimtelFile. None if the sidecar file does not exist
+            or if it is outdated w.r.t. the photon list file.
+        '''
+        cacheFile = self.getBinaryCacheFileName(file)
+        if not cacheFile.exists():
+            return None
+
+        fileStat = Path(file).stat()
+        try:
+            with np.load(cacheFile) as cache:
+                if (
+                    int(cache['sourceMtime']) != fileStat.st_mtime_ns
+                    or int(cache['sourceSize']) != fileStat.st_size
+                ):
+                    self._logger.debug('Binary cache {} is outdated'.format(cacheFile))
+                    return None
+                data = {
+                    key: cache[key]
+                    for key in ['photonPosX', 'photonPosY', 'headerPhotons', 'headerAreas']
+                }
+        except (OSError, KeyError, ValueError):
+            self._logger.warning('Binary cache {} could not be read'.format(cacheFile))
+            return None
+
+        self._logger.debug('Reading photons from binary cache {}'.format(cacheFile))
+        return data
+
+    def _writeBinaryCache(self, file, data):
+        '''
+        Write the binary sidecar file of a photon list file.
+
+        Parameters
+        ----------
+        file: str or Path
+            Name of sim_telarray file with photon list.
+        data: dict
+            Content returned by _parseSimtelFile.
+        '''
+        cacheFile = self.getBinaryCacheFileName(file)
+        fileStat = Path(file).stat()
+        self._logger.debug('Writing binary cache {}'.format(cacheFile))
+        try:
+            with open(cacheFile, 'wb') as f:
+                np.savez(
+                    f,
+                    sourceMtime=fileStat.st_mtime_ns,
+                    sourceSize=fileStat.st_size,
+                    **data
+                )
+        except OSError:
+            self._logger.warning('Binary cache {} could not be written'.format(cacheFile))
+
     def _isPhotonPositionsOK(self):
         '''
         Verify if the photon positions are ok.
@@ -120,37 +261,30 @@ class PSFImage:
         cond3 = len(self.photonPosX) == len(self.photonPosY)
         return cond1 and cond2 and cond3
 
-    def _processSimtelLine(self, line):
+    def _processSimtelHeader(self, nPhotons, totalAreaInFile):
         '''
-        Supporting function to readSimtelFile.
+        Supporting function to readSimtelFile. Process the information from a header line
+        ("falling on an area of") of the photon list file.
 
         Parameters
         ----------
-        line: str
-            A line from the photon list file generated by sim_telarray.
-        '''
-        words = line.split()
-        if 'falling on an area of' in line:
-            self._totalPhotons += int(words[4])
-            totalAreaInFile = float(words[14])
-            if self._totalArea is None:
-                self._totalArea = totalAreaInFile
-            elif totalAreaInFile != self._totalArea:
-                self._logger.warning(
-                    'Conflicting value of the total area found'
-                    ' {} != {}'.format(self._totalArea, totalAreaInFile) +
-                    ' - Keeping the original value'
-                )
-            else:
-                # Do nothing - Keep the original value of _totalArea
-                pass
-        elif '#' in line or len(words) == 0:
-            # Skipping comments
-            pass
+        nPhotons: int
+            Number of simulated photons.
+        totalAreaInFile: float
+            Area on which the photons were simulated.
+        '''
+        self._totalPhotons += nPhotons
+        if self._totalArea is None:
+            self._totalArea = totalAreaInFile
+        elif totalAreaInFile != self._totalArea:
+            self._logger.warning(
+                'Conflicting value of the total area found'
+                ' {} != {}'.format(self._totalArea, totalAreaInFile) +
+                ' - Keeping the original value'
+            )
         else:
-            # Storing photon position from cols 2 and 3
-            self.photonPosX.append(float(words[2]))
-            self.photonPosY.append(float(words[3]))
+            # Do nothing - Keep the original value of _totalArea
+            pass
 
     def getEffectiveArea(self):
         '''
@@ -237,8 +371,7 @@ class PSFImage:
 
     def _findPSF(self, fraction):
         '''
-        Try to find PSF by a smart algorithm first. If it fails, _findRadiusByScanning is called and
-        do it by brute force.
+        Find PSF directly from the sorted radii of the photons.
 
         Parameters
         ----------
@@ -252,100 +385,54 @@ class PSFImage:
 
         '''
         self._logger.debug('Finding PSF for fraction = {}'.format(fraction))
-
-        xPosSq = [i**2 for i in self.photonPosX]
-        yPosSq = [i**2 for i in self.photonPosY]
-        xPosSig = sqrt(np.mean(xPosSq) - self.centroidX**2)
-        yPosSig = sqrt(np.mean(yPosSq) - self.centroidY**2)
-        radiusSig = sqrt(xPosSig**2 + yPosSig**2)
-
         targetNumber = fraction * self._numberOfDetectedPhotons
-        currentRadius = 1.5 * radiusSig
-        startNumber = self._sumPhotonsInRadius(currentRadius)
-        SCALE = 0.5 * sqrt(currentRadius * currentRadius / startNumber)
-        deltaNumber = startNumber - targetNumber
-        nIter = 0
-        MAX_ITER = 100
-        TOLERANCE = self._numberOfDetectedPhotons / 1000.
-        foundRadius = False
-        while not foundRadius and nIter < MAX_ITER:
-            nIter += 1
-            dr = -deltaNumber * SCALE / sqrt(targetNumber)
-            while currentRadius + dr < 0:
-                dr *= 0.5
-            currentRadius += dr
-            currentNumber = self._sumPhotonsInRadius(currentRadius)
-            deltaNumber = currentNumber - targetNumber
-            foundRadius = fabs(deltaNumber) < TOLERANCE
-
-        if foundRadius:
-            # Diameter = 2 * radius
-            return 2 * currentRadius
-        else:
-            self._logger.warning('Could not find PSF efficiently - trying by scanning')
-            return self._findRadiusByScanning(targetNumber, radiusSig)
+        # Diameter = 2 * radius
+        return 2 * self._findRadiusByNumber(targetNumber)
 
-    def _findRadiusByScanning(self, targetNumber, radiusSig):
+    def _findRadiusByNumber(self, targetNumber):
         '''
-        Find radius by scanning, aka brute force.
+        Find the radius containing targetNumber photons by interpolating the cumulative number of
+        photons between two consecutive sorted radii.
 
         Parameters
         ----------
         targetNumber: float
-            Number of photons inside the diameter to be found.
-        radiusSig: float
-            Sigma of the radius to be used as scale.
+            Number of photons inside the radius to be found.
 
         Returns
         -------
         float:
             Radius of the circle with targetNumber photons inside.
         '''
-        self._logger.debug('Finding PSF by scanning')
-
-        def scan(dr, radMin, radMax):
-            '''
-            Scan the image from radMin to radMax uin steps of dr ntil it finds targetNumber photons
-            inside.
-
-            Returns
-            -------
-            (float, float, float):
-                Average radius, min radius, max radius of the interval where targetNumber photons
-                are inside.
-            '''
-            r0, r1 = radMin, radMin + dr
-            s0, s1 = 0, 0
-            foundRadius = False
-            while not foundRadius:
-                s0, s1 = self._sumPhotonsInRadius(r0), self._sumPhotonsInRadius(r1)
-                if s0 < targetNumber and s1 > targetNumber:
-                    foundRadius = True
-                    break
-                if r1 > radMax:
-                    break
-                r0 += dr
-                r1 += dr
-            if foundRadius:
-                return (r0 + r1) / 2, r0, r1
-            else:
-                self._logger.error('Could not find PSF by scanning')
-                raise RuntimeError
-
-        # Run scan few times with smaller dr to optimize search.
-        # Step 0
-        radius, radMin, radMax = scan(0.1*radiusSig, 0, 4*radiusSig)
-        # Step 1
-        radius, radMin, radMax = scan(0.005*radiusSig, radMin, radMax)
-        return radius
+        sortedRadii = self._getSortedRadii()
+        nPhotons = len(sortedRadii)
+        # The i-th sorted radius (0-based) contains i+1 photons.
+        iUp = min(max(int(np.ceil(targetNumber)) - 1, 0), nPhotons - 1)
+        iLow = max(iUp - 1, 0)
+        if iUp == iLow:
+            return float(sortedRadii[iUp])
+        weight = min(max(targetNumber - iUp, 0.), 1.)
+        return float(sortedRadii[iLow] + weight * (sortedRadii[iUp] - sortedRadii[iLow]))
+
+    def _getSortedRadii(self):
+        '''
+        Return the photon radii w.r.t. the centroid, sorted in increasing order. The sorted array is
+        cached and only rebuilt if the centroid changes (e.g. when it is set from rx results).
+
+        Returns
+        -------
+        numpy.array
+        '''
+        centroid = (self.centroidX, self.centroidY)
+        if self._sortedRadii is None or self._sortedRadiiCentroid != centroid:
+            radii = np.hypot(self.photonPosX - self.centroidX, self.photonPosY - self.centroidY)
+            self._sortedRadii = np.sort(radii)
+            self._sortedRadiiCentroid = centroid
+        return self._sortedRadii
 
     def _sumPhotonsInRadius(self, radius):
-        ''' Return the number of photons inside a certain radius. '''
-        nPhotons = 0
-        for xx, yy in zip(self.photonPosX, self.photonPosY):
-            rr2 = (xx - self.centroidX)**2 + (yy - self.centroidY)**2
-            nPhotons += 1 if rr2 < radius**2 else 0
-        return nPhotons
+        ''' Return the number of photons inside a certain radius (or array of radii). '''
+        return np.searchsorted(self._getSortedRadii(), radius, side='left')
 
     def getImageData(self, centralized=True):
         '''
@@ -361,11 +448,11 @@ class PSFImage:
         (x, y), the photons positions in cm.
         '''
         if centralized:
-            xPosData = (np.array(self.photonPosX) - self.centroidX)
-            yPosData = (np.array(self.photonPosY) - self.centroidY)
+            xPosData = self.photonPosX - self.centroidX
+            yPosData = self.photonPosY - self.centroidY
         else:
-            xPosData = np.array(self.photonPosX)
-            yPosData = np.array(self.photonPosY)
+            xPosData = self.photonPosX
+            yPosData = self.photonPosY
         dType = {
             'names': ('X', 'Y'),
             'formats': ('f8', 'f8')
@@ -414,10 +501,8 @@ class PSFImage:
         -------
         (radius, intensity)
         '''
-        radiusAll = list(np.linspace(0, 1.6 * self.getPSF(0.8), 30))
-        intensity = list()
-        for rad in radiusAll:
-            intensity.append(self._sumPhotonsInRadius(rad) / self._numberOfDetectedPhotons)
+        radiusAll = np.linspace(0, 1.6 * self.getPSF(0.8), 30)
+        intensity = self._sumPhotonsInRadius(radiusAll) / self._numberOfDetectedPhotons
         dType = {
             'names': ('Radius [cm]', 'Relative intensity'),
             'formats': ('f8', 'f8')
@@ -1,8 +1,10 @@
 import logging
+import os
 import subprocess
 import matplotlib.pyplot as plt
 from copy import copy
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from math import pi, tan
 
 import numpy as np
@@ -34,7 +36,7 @@ class RayTracing:
 
     Methods
     -------
-    simulate(test=False, force=False)
+    simulate(test=False, force=False, maxWorkers=1, maxParallelRuns=1)
         Simulate RayTracing using SimtelRunner.
     analyse(export=True, force=False, useRX=False, noTelTransmission=False)
         Analyze RayTracing, meaning read simtel files, compute psfs and eff areas and store the
@@ -122,8 +124,8 @@ class RayTracing:
                 allInputs=self.ALL_INPUTS,
                 **kwargs
             )
-            mirFlen = self._telescopeModel.getParameter('mirror_focal_length')
-            self._sourceDistance = 2 * float(mirFlen) * u.cm.to(u.km)  # km
+            mirFlen = self._telescopeModel.getParameterValue('mirror_focal_length')
+            self._sourceDistance = 2 * mirFlen * u.cm.to(u.km)  # km
             self._mirrorNumbers = mirrorNumbers
         else:
             collectArguments(
@@ -170,39 +172,98 @@ class RayTracing:
             self._logger.error(msg)
             raise ValueError(msg)
 
-    def simulate(self, test=False, force=False):
+    def simulate(self, test=False, force=False, maxWorkers=1, maxParallelRuns=1):
         '''
         Simulate RayTracing using SimtelRunner.
 
+        Each (offAxis, mirror) combination is an independent sim_telarray job with its own
+        photons, stars and log files. With maxWorkers != 1, these jobs run concurrently.
+
         Parameters
         ----------
         test: bool
             Test flag will make it faster by simulating much fewer photons.
         force: bool
             Force flag will remove existing files and simulate again.
+        maxWorkers: int or None
+            Maximum number of sim_telarray jobs running at the same time. Default is 1, meaning
+            that jobs run one after another. If None, the number of CPUs is used.
+        maxParallelRuns: int or None
+            Maximum number of repetitions of each job running at the same time (see
+            SimtelRunner.run). Default is 1.
         '''
         allMirrors = self._mirrorNumbers if self._singleMirrorMode else [0]
-        for thisOffAxis in self._offAxisAngle:
-            for thisMirror in allMirrors:
-                self._logger.info('Simulating RayTracing for offAxis={}, mirror={}'.format(
+        allJobs = [
+            (thisOffAxis, thisMirror)
+            for thisOffAxis in self._offAxisAngle
+            for thisMirror in allMirrors
+        ]
+
+        if maxWorkers == 1:
+            for thisOffAxis, thisMirror in allJobs:
+                self._simulateSingleJob(thisOffAxis, thisMirror, test, force, maxParallelRuns)
+            return
+
+        # The config file is shared by all jobs and must be exported before any of them starts.
+        self._telescopeModel.getConfigFile()
+
+        nWorkers = maxWorkers if maxWorkers is not None else os.cpu_count()
+        self._logger.info('Simulating {} RayTracing jobs with {} workers'.format(
+            len(allJobs),
+            nWorkers
+        ))
+        with ThreadPoolExecutor(max_workers=nWorkers) as executor:
+            futures = [
+                executor.submit(
+                    self._simulateSingleJob,
                     thisOffAxis,
-                    thisMirror
-                ))
-                simtel = SimtelRunner(
-                    simtelSourcePath=self._simtelSourcePath,
-                    filesLocation=self._filesLocation,
-                    mode='ray-tracing' if not self._singleMirrorMode else 'raytracing-singlemirror',
-                    telescopeModel=self._telescopeModel,
-                    zenithAngle=self._zenithAngle * u.deg,
-                    sourceDistance=self._sourceDistance * u.km,
-                    offAxisAngle=thisOffAxis * u.deg,
-                    mirrorNumber=thisMirror,
-                    useRandomFocalLength=self._useRandomFocalLength,
-                    logger=self._logger.name
+                    thisMirror,
+                    test,
+                    force,
+                    maxParallelRuns
                 )
-                simtel.run(test=test, force=force)
+                for thisOffAxis, thisMirror in allJobs
+            ]
+            # Raising errors (e.g. SimtelExecutionError) from the jobs.
+            for future in futures:
+                future.result()
     # END of simulate
 
+    def _simulateSingleJob(self, offAxis, mirror, test, force, maxParallelRuns=1):
+        '''
+        Simulate RayTracing for a single (offAxis, mirror) combination.
+
+        Parameters
+        ----------
+        offAxis: float
+            Off-axis angle in deg.
+        mirror: int
+            Mirror number (only used in single mirror mode).
+        test: bool
+            Test flag will make it faster by simulating much fewer photons.
+        force: bool
+            Force flag will remove existing files and simulate again.
+        maxParallelRuns: int or None
+            Maximum number of repetitions running at the same time.
+        '''
+        self._logger.info('Simulating RayTracing for offAxis={}, mirror={}'.format(
+            offAxis,
+            mirror
+        ))
+        simtel = SimtelRunner(
+            simtelSourcePath=self._simtelSourcePath,
+            filesLocation=self._filesLocation,
+            mode='ray-tracing' if not self._singleMirrorMode else 'raytracing-singlemirror',
+            telescopeModel=self._telescopeModel,
+            zenithAngle=self._zenithAngle * u.deg,
+            sourceDistance=self._sourceDistance * u.km,
+            offAxisAngle=offAxis * u.deg,
+            mirrorNumber=mirror,
+            useRandomFocalLength=self._useRandomFocalLength,
+            logger=self._logger.name
+        )
+        simtel.run(test=test, force=force, maxParallelRuns=maxParallelRuns)
+
     def analyze(self, export=True, force=False, useRX=False, noTelTransmission=False):
         '''
         Analyze RayTracing, meaning read simtel files, compute psfs and eff areas and store the
@@ -224,7 +285,7 @@ class RayTracing:
 
         doAnalyze = (not self._fileResults.exists() or force)
 
-        focalLength = float(self._telescopeModel.getParameter('focal_length'))
+        focalLength = self._telescopeModel.getParameterValue('focal_length')
         telTransmissionPars = (
             self._telescopeModel.getTelescopeTransmissionParameters()
             if not noTelTransmission else [1, 0, 0, 0]
@@ -258,7 +319,7 @@ class RayTracing:
                 photonsFile = self._outputDirectory.joinpath(photonsFileName)
                 telTransmission = computeTelescopeTransmission(telTransmissionPars, thisOffAxis)
                 image = PSFImage(focalLength, None, self._logger.name)
-                image.readSimtelFile(photonsFile)
+                image.readSimtelFile(photonsFile, useBinaryCache=True)
                 self._psfImages[thisOffAxis] = copy(image)
 
                 if not doAnalyze:
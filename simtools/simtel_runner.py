@@ -1,7 +1,10 @@
 import logging
 import subprocess
 import os
+import random
+import shutil
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 import astropy.units as u
 
@@ -33,9 +36,9 @@ class SimtelRunner:
 
     Methods
     -------
-    run(test=False, force=False)
+    run(test=False, force=False, maxParallelRuns=1)
         Run sim_telarray. test=True will make it faster and force=True will remove existing files
-        and run again.
+        and run again. maxParallelRuns != 1 runs the repetitions concurrently.
     '''
     ALL_INPUTS = {
         'zenithAngle': {'default': 20, 'unit': u.deg},
@@ -141,7 +144,7 @@ class SimtelRunner:
             self._logger.error(msg)
             raise ValueError(msg)
 
-    def run(self, test=False, force=False):
+    def run(self, test=False, force=False, maxParallelRuns=1):
         '''
         Run sim_telarray.
 
@@ -151,6 +154,10 @@ class SimtelRunner:
             If True, make simulations faster.
         force: bool
             If True, remove possible existing output files and run again.
+        maxParallelRuns: int or None
+            Maximum number of the RUNS_PER_SET repetitions running at the same time. Default is 1,
+            meaning that repetitions run one after another. If None, the number of CPUs is used.
+            See _runParallel.
         '''
         self._logger.debug('Running at mode {}'.format(self.mode))
         # write all the important parameters
@@ -160,12 +167,15 @@ class SimtelRunner:
             return
 
         self._loadRequiredFiles()
-        command = self._makeRunCommand()
 
         if test:
+            command = self._makeRunCommand()
             self._logger.info('Running (test) with command:{}'.format(command))
             sysOutput = os.system(command)
+        elif maxParallelRuns != 1 and self.RUNS_PER_SET > 1:
+            self._runParallel(maxParallelRuns)
         else:
+            command = self._makeRunCommand()
             self._logger.info('Running ({}x) with command:{}'.format(self.RUNS_PER_SET, command))
             sysOutput = os.system(command)
             for _ in range(self.RUNS_PER_SET - 1):
@@ -182,6 +192,70 @@ class SimtelRunner:
         else:
             self._logger.debug('Everything looks fine with simtel run')
 
+    def _runParallel(self, maxParallelRuns):
+        '''
+        Run the RUNS_PER_SET repetitions as concurrent sim_telarray processes. Each repetition
+        gets its own random seed and writes into its own temporary photon list and log files.
+        These files are merged into the final photon list and log files (in the order of the
+        repetitions) after all processes finished.
+
+        Parameters
+        ----------
+        maxParallelRuns: int or None
+            Maximum number of processes running at the same time. If None, the number of CPUs is
+            used.
+
+        Raises
+        ------
+        SimtelExecutionError
+            If any of the processes returns a non-zero exit status.
+        '''
+        nParallel = maxParallelRuns if maxParallelRuns is not None else os.cpu_count()
+        seeds = random.sample(range(1, 2**31), self.RUNS_PER_SET)
+
+        allRuns = list()
+        for iRun, seed in enumerate(seeds):
+            photonsFile = self._photonsFileName.with_name(
+                self._photonsFileName.name + '.run{}'.format(iRun)
+            )
+            logFile = self._logFileName.with_name(self._logFileName.name + '.run{}'.format(iRun))
+            # sim_telarray appends to the photon list file, leftovers have to be removed.
+            if photonsFile.exists():
+                photonsFile.unlink()
+            command = self._makeRunCommand(photonsFile=photonsFile, logFile=logFile, seed=seed)
+            allRuns.append((photonsFile, logFile, command))
+
+        self._logger.info(
+            'Running ({}x, {} in parallel) with command:{}'.format(
+                self.RUNS_PER_SET,
+                nParallel,
+                allRuns[0][2]
+            )
+        )
+
+        with ThreadPoolExecutor(max_workers=nParallel) as executor:
+            returnCodes = list(executor.map(
+                lambda command: subprocess.call(command, shell=True),
+                [command for _, _, command in allRuns]
+            ))
+
+        # Merging photon list and log files
+        with open(self._photonsFileName, 'a') as photonsOut, open(self._logFileName, 'a') as logOut:
+            for photonsFile, logFile, _ in allRuns:
+                for file, fileOut in [(photonsFile, photonsOut), (logFile, logOut)]:
+                    if file.exists():
+                        with open(file, 'r') as f:
+                            shutil.copyfileobj(f, fileOut)
+                        file.unlink()
+
+        failedRuns = [iRun for iRun, code in enumerate(returnCodes) if code != 0]
+        if len(failedRuns) > 0:
+            self._logger.error('sim_telarray failed for repetitions {} (seeds {})'.format(
+                failedRuns,
+                [seeds[iRun] for iRun in failedRuns]
+            ))
+            self._raiseSimtelError()
+
     def _simtelFailed(self, sysOutput):
         return sysOutput != '0'
 
@@ -280,8 +354,21 @@ class SimtelRunner:
         #     pass
     # END of _loadRequiredFiles
 
-    def _makeRunCommand(self):
-        ''' Return the command to run simtel_array. '''
+    def _makeRunCommand(self, photonsFile=None, logFile=None, seed=None):
+        '''
+        Return the command to run simtel_array.
+
+        Parameters
+        ----------
+        photonsFile: Path, optional
+            Photon list file. If not given, _photonsFileName is used.
+        logFile: Path, optional
+            Log file. If not given, _logFileName is used.
+        seed: int, optional
+            Random seed. If not given, sim_telarray chooses it.
+        '''
+        photonsFile = photonsFile if photonsFile is not None else self._photonsFileName
+        logFile = logFile if logFile is not None else self._logFileName
 
         def _configOption(par, value=None):
             c = ' -C {}'.format(par)
@@ -289,13 +376,13 @@ class SimtelRunner:
             return c
 
         if self._isSingleMirrorMode():
-            _mirrorFocalLength = float(self.telescopeModel.getParameter('mirror_focal_length'))
+            _mirrorFocalLength = self.telescopeModel.getParameterValue('mirror_focal_length')
 
         # RayTracing
         command = str(self._simtelSourcePath.joinpath('sim_telarray/bin/sim_telarray'))
         command += ' -c {}'.format(self.telescopeModel.getConfigFile())
         command += ' -I../cfg/CTA'
-        command += _configOption('IMAGING_LIST', str(self._photonsFileName))
+        command += _configOption('IMAGING_LIST', str(photonsFile))
         command += _configOption('stars', str(self._starsFileName))
         command += _configOption('altitude', self.telescopeModel.getParameter('altitude'))
         command += _configOption('telescope_theta', self._zenithAngle + self._offAxisAngle)
@@ -330,8 +417,10 @@ class SimtelRunner:
             # command += _configOption('random_focal_length', '0.')
             command += _configOption('mirror_align_random_distance', '0.')
             command += _configOption('mirror_align_random_vertical', '0.,28.,0.,0.')
+        if seed is not None:
+            command += _configOption('random_seed', seed)
         command += ' ' + str(self._corsikaFileName)
-        command += ' 2>&1 > ' + str(self._logFileName) + ' 2>&1'
+        command += ' 2>&1 > ' + str(logFile) + ' 2>&1'
 
         return command
     # END of makeRunCommand
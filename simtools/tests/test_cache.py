@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+
+import logging
+import time
+from pathlib import Path
+
+from simtools.util.cache import TimedLRUCache
+
+logger = logging.getLogger()
+logger.setLevel(logging.DEBUG)
+
+testDataDirectory = './data/test-output'
+
+
+def test_lru():
+    cache = TimedLRUCache(maxSize=2, logger=logger.name)
+    cache.set(('a', 1), 'A')
+    cache.set(('b', 1), 'B')
+    assert cache.get(('a', 1)) == 'A'
+
+    # ('b', 1) is the least recently used one
+    cache.set(('c', 1), 'C')
+    assert cache.get(('b', 1)) is None
+    assert cache.get(('a', 1)) == 'A'
+    assert cache.get(('c', 1)) == 'C'
+
+    cache.invalidate(lambda key: key[0] == 'a')
+    assert cache.get(('a', 1)) is None
+    assert len(cache) == 1
+
+
+def test_ttl():
+    cache = TimedLRUCache(maxSize=10, ttl=0.05, logger=logger.name)
+    cache.set('key', 'value')
+    assert cache.get('key') == 'value'
+    time.sleep(0.1)
+    assert cache.get('key', 'expired') == 'expired'
+
+
+def test_disk_cache():
+    cacheDirectory = Path(testDataDirectory).joinpath('test-cache')
+    cache = TimedLRUCache(maxSize=10, cacheDirectory=cacheDirectory, logger=logger.name)
+    cache.set(('model', 'North-LST-1'), {'camera_pixels': 1855})
+
+    # A new instance reads the entry from disk
+    newCache = TimedLRUCache(maxSize=10, cacheDirectory=cacheDirectory, logger=logger.name)
+    assert newCache.get(('model', 'North-LST-1')) == {'camera_pixels': 1855}
+
+    # Entries on disk are selected by their keys, without reading their values
+    cache.set(('model', 'North-LST-2'), {'camera_pixels': 1855})
+    cache._getCacheFile(('model', 'North-LST-2')).write_bytes(b'not a pickle')
+    newCache.invalidate(lambda key: key[1] == 'North-LST-1')
+    assert newCache.get(('model', 'North-LST-1')) is None
+    assert len(list(cacheDirectory.glob('*.pickle'))) == 1
+
+    newCache.invalidate()
+    assert len(list(cacheDirectory.iterdir())) == 0
+    cacheDirectory.rmdir()
+
+
+if __name__ == '__main__':
+
+    test_lru()
+    test_ttl()
+    test_disk_cache()
@@ -1,6 +1,9 @@
 #!/usr/bin/python3
 
 import logging
+import os
+import time
+from pathlib import Path
 
 import simtools.config as cfg
 
@@ -27,9 +30,87 @@ def test_find_file():
     print(f2)
 
 
+def test_config_cache(monkeypatch):
+    testConfigFile = Path('./data/test-output/test-config.yml')
+    testConfigFile.write_text('outputLocation: first\nsimtelPath: $SIMTELPATH_TEST\n')
+    monkeypatch.setenv('SIMTELPATH_TEST', 'simtel')
+
+    cfg.setConfigFileName(str(testConfigFile))
+    assert cfg.get('outputLocation') == 'first'
+    assert cfg.get('simtelPath') == 'simtel'
+
+    # Changed parameters are applied on top of the cached config
+    cfg.change('outputLocation', 'changed')
+    assert cfg.get('outputLocation') == 'changed'
+    assert cfg.loadConfig()['outputLocation'] == 'changed'
+    cfg.CONFIG_CHANGED_PARS.pop('outputLocation')
+
+    # Modifying the file invalidates the cached config
+    time.sleep(0.01)
+    testConfigFile.write_text('outputLocation: second\nsimtelPath: $SIMTELPATH_TEST\n')
+    assert cfg.get('outputLocation') == 'second'
+
+    cfg.setConfigFileName('config.yml')
+    testConfigFile.unlink()
+
+
+def test_find_file_index():
+    testDirectory = Path('./data/test-output/test-find-file')
+    testDirectory.joinpath('subdir').mkdir(parents=True, exist_ok=True)
+    testDirectory.joinpath('subdir', 'file_a.dat').write_text('a')
+    cacheFile = Path('./data/test-output/test-file-index.json')
+    cfg.setFileIndexCacheFileName(cacheFile)
+
+    f1 = cfg.findFile('file_a.dat', testDirectory)
+    assert f1.name == 'file_a.dat'
+    assert cacheFile.exists()
+
+    # Files added after the directory was indexed are also found
+    testDirectory.joinpath('subdir', 'file_b.dat').write_text('b')
+    f2 = cfg.findFile('file_b.dat', testDirectory)
+    assert f2.name == 'file_b.dat'
+
+    # Index reloaded from disk
+    cfg.clearFileIndexes()
+    cfg.setFileIndexCacheFileName(cacheFile)
+    assert os.path.abspath(testDirectory) in cfg.FILE_INDEXES
+    assert cfg.findFile('file_b.dat', testDirectory) == f2
+
+    try:
+        cfg.findFile('file_c.dat', testDirectory)
+        assert False
+    except FileNotFoundError:
+        pass
+
+    # Files found in a later location do not revalidate the indexes of the previous ones
+    otherDirectory = Path('./data/test-output/test-file-index-other')
+    otherDirectory.mkdir(parents=True, exist_ok=True)
+    f3 = otherDirectory.joinpath('file_d.dat')
+    f3.write_text('d')
+    cfg.findFile('file_d.dat', [testDirectory, otherDirectory])
+    isFileIndexOutdated = cfg._isFileIndexOutdated
+    checkedIndexes = list()
+    cfg._isFileIndexOutdated = lambda index: checkedIndexes.append(index) or False
+    try:
+        assert cfg.findFile('file_d.dat', [testDirectory, otherDirectory]).name == 'file_d.dat'
+    finally:
+        cfg._isFileIndexOutdated = isFileIndexOutdated
+    assert len(checkedIndexes) == 0
+    f3.unlink()
+    otherDirectory.rmdir()
+
+    cfg.setFileIndexCacheFileName(None)
+    for f in [f1, f2, cacheFile]:
+        f.unlink()
+    testDirectory.joinpath('subdir').rmdir()
+    testDirectory.rmdir()
+
+
 if __name__ == '__main__':
 
     # test_get()
     # test_input_options()
     # test_find_file()
+    # test_config_cache() requires the monkeypatch fixture of pytest
+    # test_find_file_index()
     pass
@@ -1,12 +1,23 @@
 #!/usr/bin/python3
 
+import asyncio
+import datetime
 import logging
 import subprocess
+import threading
+import time
 from pathlib import Path
 
-from simtools import db_handler
+import mongomock
+import pytest
+from bson.codec_options import CodecOptions
+
+from simtools import async_db_handler, db_handler
+from simtools.async_db_handler import AsyncDatabaseHandler
+from simtools.db_snapshot import DBSnapshot
 import simtools.config as cfg
 from simtools.model.telescope_model import TelescopeModel
+from simtools.util.cache import TimedLRUCache
 
 logger = logging.getLogger()
 logger.setLevel(logging.DEBUG)
@@ -147,6 +158,18 @@ def test_modify_db():
     pars = db.readMongoDB('sandbox', 'North-LST-Test', 'test', testDataDirectory, False)
     assert(pars['camera_config_version_test']['Value'] == 999)
 
+    logger.info('----Testing updating several parameters-----')
+    failed = db.updateParameters(
+        'sandbox',
+        [
+            ('North-LST-Test', 'test', 'camera_config_version', 1000),
+            ('North-LST-Test', 'test', 'camera_config_version_not_existing', 1000)
+        ]
+    )
+    assert(len(failed) == 1)
+    pars = db.readMongoDB('sandbox', 'North-LST-Test', 'test', testDataDirectory, False)
+    assert(pars['camera_config_version']['Value'] == 1000)
+
     logger.info('----Testing deleting a query (a whole telescope in this case and metadata)-----')
     query = {'Telescope': 'North-LST-Test'}
     db.deleteQuery('sandbox', 'telescopes', query)
@@ -192,6 +215,367 @@ def test_reading_db_sites():
     return
 
 
+def test_yaml_cache():
+
+    logger.info('----Testing the cache of the Yaml DB files-----')
+    yamlFile = Path(testDataDirectory).joinpath('parValues-Test.yml')
+    yamlFile.write_text(
+        'camera_pixels:\n  Applicable: true\n  prod4: 1855\n'
+    )
+    db = db_handler.DatabaseHandler(logger.name)
+    pars = db._loadYamlFile(yamlFile)
+    assert pars['camera_pixels']['prod4'] == 1855
+
+    # Second call is served from the memory cache
+    assert db._loadYamlFile(yamlFile) is pars
+
+    # Disk cache is used if the memory cache is empty
+    db_handler.DatabaseHandler.parsedYamlFiles.clear()
+    assert db._loadYamlFile(yamlFile) == pars
+
+    # Modifying the file invalidates the cache
+    yamlFile.write_text(
+        'camera_pixels:\n  Applicable: true\n  prod4: 18560\n'
+    )
+    assert db._loadYamlFile(yamlFile)['camera_pixels']['prod4'] == 18560
+
+    yamlFile.unlink()
+
+    return
+
+
+def test_file_store():
+
+    # This test is only relevant for the MongoDB
+    if not cfg.get('useMongoDB'):
+        return
+
+    logger.info('----Testing the local store of the GridFS files-----')
+    db = db_handler.DatabaseHandler(logger.name)
+    dirs = [Path(testDataDirectory).joinpath('file-store-{}'.format(i)) for i in range(2)]
+    for d in dirs:
+        d.mkdir(parents=True, exist_ok=True)
+        db.getModelParameters('north-lst-1', 'Current', d)
+
+    # Files written in both directories are links to the same stored file
+    for file in dirs[0].iterdir():
+        assert file.samefile(dirs[1].joinpath(file.name))
+
+    for d in dirs:
+        subprocess.call(['rm -rf {}'.format(d)], shell=True)
+
+    return
+
+
+def test_reading_db_multiple():
+
+    logger.info('----Testing reading several telescopes at once-----')
+    db = db_handler.DatabaseHandler(logger.name)
+    telescopes = ['north-lst-1', 'north-mst-NectarCam-D', 'south-sst-D']
+    allPars = db.getModelParametersMultiple(telescopes, 'Current')
+    for tel in telescopes:
+        assert allPars[tel] == db.getModelParameters(tel, 'Current')
+
+    # Telescopes with different versions
+    versions = ['prod4', 'Current', 'prod4']
+    allPars = db.getModelParametersMultiple(telescopes, versions)
+    for tel, version in zip(telescopes, versions):
+        assert allPars[tel] == db.getModelParameters(tel, version)
+
+    return
+
+
+def test_diff_model_versions():
+
+    logger.info('----Testing the differences between model versions-----')
+    db = db_handler.DatabaseHandler(logger.name)
+    telescopes = ['north-lst-1', 'north-mst-NectarCam-D', 'south-sst-D']
+    diffs = db.diffModelVersions(telescopes, 'prod4', 'Current')
+    for tel in telescopes:
+        pars1 = db.getModelParameters(tel, 'prod4')
+        pars2 = db.getModelParameters(tel, 'Current')
+        assert sorted(diffs[tel]['added']) == sorted(pars2.keys() - pars1.keys())
+        assert sorted(diffs[tel]['removed']) == sorted(pars1.keys() - pars2.keys())
+        for parName in diffs[tel]['changed']:
+            assert parName in pars1 and parName in pars2
+        logger.info('{}: {} changed parameters'.format(tel, len(diffs[tel]['changed'])))
+
+    return
+
+
+def _writeTestSnapshot(snapshotFile):
+    version = '2020-06-28'
+    entries = [
+        ('telescopes', 'North-LST-1', version, 'camera_pixels', {
+            'Value': 1855, 'Applicable': True, 'File': False,
+            'Entry_Date': datetime.datetime(2020, 6, 28, 12, 0)
+        }),
+        ('telescopes', 'North-LST-1', version, 'camera_filter', {
+            'Value': 'filter-test.dat', 'Applicable': True, 'File': True
+        }),
+        ('telescopes', 'North-LST-1', version, 'mirror_class', {
+            'Value': 1, 'Applicable': False, 'File': False
+        }),
+        ('sites', 'North', version, 'altitude', {
+            'Value': 2158, 'Applicable': True, 'File': False
+        })
+    ]
+    files = [('filter-test.dat', None, b'1 0.5\n')]
+    DBSnapshot.write(snapshotFile, {'Current': version}, entries, files)
+
+
+def test_snapshot():
+
+    logger.info('----Testing reading the parameters from a DB snapshot-----')
+    snapshotFile = Path(testDataDirectory).joinpath('db-snapshot-test.sqlite')
+    _writeTestSnapshot(snapshotFile)
+
+    # Entries are stored as BSON, keeping the types of the values
+    entries = DBSnapshot(snapshotFile).getParameters('telescopes', 'North-LST-1', '2020-06-28')
+    assert entries['camera_pixels']['Entry_Date'] == datetime.datetime(2020, 6, 28, 12, 0)
+    assert entries['camera_filter']['Value'] == 'filter-test.dat'
+
+    useMongoDB = cfg.get('useMongoDB')
+    cfg.change('useMongoDB', True)
+    db_handler.DatabaseHandler.setSnapshotFile(snapshotFile)
+    try:
+        runLocation = Path(testDataDirectory).joinpath('db-snapshot-test')
+        runLocation.mkdir(parents=True, exist_ok=True)
+        db = db_handler.DatabaseHandler(logger.name)
+        db.getMetrics(reset=True)
+
+        pars = db.getModelParameters('north-lst-1', 'Current', runLocation, onlyApplicable=True)
+        assert pars['camera_pixels']['Value'] == 1855
+        assert 'mirror_class' not in pars
+        assert runLocation.joinpath('filter-test.dat').read_bytes() == b'1 0.5\n'
+
+        pars = db.getSiteParameters('North', 'Current', runLocation)
+        assert pars['altitude']['Value'] == 2158
+
+        metrics = db.getMetrics()
+        assert metrics['readMongoDB']['documents'] == 2
+        assert metrics['getSiteParameters']['calls'] == 1
+        assert metrics['parametersCache']['cacheMisses'] == 2
+
+        diff = db.diffModelVersions('north-lst-1', 'Current', '2020-06-28')['north-lst-1']
+        assert diff == {'added': dict(), 'removed': dict(), 'changed': dict()}
+        diff = db.diffModelVersions('north-lst-1', 'Current', 'prod4', onlyApplicable=True)
+        assert sorted(diff['north-lst-1']['removed']) == ['camera_filter', 'camera_pixels']
+    finally:
+        db_handler.DatabaseHandler.setSnapshotFile(None)
+        cfg.change('useMongoDB', useMongoDB)
+        subprocess.call(['rm -rf {} {}'.format(runLocation, snapshotFile)], shell=True)
+
+    return
+
+
+def test_explain_queries():
+
+    # This test is only relevant for the MongoDB
+    if not cfg.get('useMongoDB'):
+        return
+
+    logger.info('----Testing the statistics of the standard queries-----')
+    db = db_handler.DatabaseHandler(logger.name)
+    stats = db.explainQueries()
+    assert 'readMongoDB' in stats
+    if stats['readMongoDB'] is not None:
+        assert stats['readMongoDB']['docsExamined'] >= stats['readMongoDB']['nReturned']
+
+    return
+
+
+def test_explain_queries_mock_db(monkeypatch):
+
+    logger.info('----Testing the indexes and query statistics with a mongomock DB-----')
+    client = mongomock.MongoClient()
+    monkeypatch.setattr(db_handler.DatabaseHandler, 'dbClient', client)
+    monkeypatch.setattr(db_handler.DatabaseHandler, 'tunnel', None)
+    db = client[DB_CTA_SIMULATION_MODEL]
+    db.telescopes.insert_one({
+        'Telescope': 'North-LST-1', 'Version': '2020-06-28', 'Parameter': 'camera_pixels',
+        'Value': 1855, 'Applicable': True, 'File': False
+    })
+    db.sites.insert_one({
+        'Site': 'North', 'Version': '2020-06-28', 'Parameter': 'altitude',
+        'Value': 2158, 'Applicable': True, 'File': False
+    })
+
+    dbh = db_handler.DatabaseHandler(logger.name)
+    indexNames = dbh.ensureIndexes()
+    for collectionName, indexes in db_handler.DatabaseHandler.INDEXES.items():
+        assert len(indexNames[collectionName]) == len(indexes)
+        assert set(indexNames[collectionName]) <= set(db[collectionName].index_information())
+
+    # Indexes already existing are not created again
+    assert dbh.ensureIndexes() == indexNames
+
+    stats = dbh.explainQueries()
+    assert {
+        'readMongoDB',
+        'readMongoDB-onlyApplicable',
+        'updateParameter',
+        'addParameter',
+        'getModelParametersMultiple',
+        'getSiteParameters',
+        'getTaggedVersion'
+    } == stats.keys()
+
+    return
+
+
+def test_async_db_handler():
+
+    logger.info('----Testing the asyncio interface to the DB (with a DB snapshot)-----')
+    snapshotFile = Path(testDataDirectory).joinpath('db-snapshot-test-async.sqlite')
+    _writeTestSnapshot(snapshotFile)
+
+    async def _getParameters():
+        async with AsyncDatabaseHandler(logger.name) as db:
+            return await asyncio.gather(
+                db.getModelParameters('north-lst-1', 'Current'),
+                db.getSiteParameters('North', 'Current', None)
+            )
+
+    useMongoDB = cfg.get('useMongoDB')
+    cfg.change('useMongoDB', True)
+    db_handler.DatabaseHandler.setSnapshotFile(snapshotFile)
+    try:
+        pars, sitePars = asyncio.run(_getParameters())
+        assert pars['camera_pixels']['Value'] == 1855
+        assert sitePars['altitude']['Value'] == 2158
+    finally:
+        db_handler.DatabaseHandler.setSnapshotFile(None)
+        cfg.change('useMongoDB', useMongoDB)
+        snapshotFile.unlink()
+
+    return
+
+
+class _AsyncMockClient:
+    ''' Minimal asyncio client (as AsyncMongoClient) reading a mongomock client. '''
+
+    class _Cursor:
+        def __init__(self, documents):
+            self._documents = iter(documents)
+
+        def __aiter__(self):
+            return self
+
+        async def __anext__(self):
+            try:
+                return next(self._documents)
+            except StopIteration:
+                raise StopAsyncIteration
+
+    class _Collection:
+        def __init__(self, collection, codecOptions):
+            self._collection = collection
+            self.codec_options = codecOptions
+
+        def with_options(self, codec_options):
+            return _AsyncMockClient._Collection(self._collection, codec_options)
+
+        def find(self, query, projection=None):
+            documentClass = self.codec_options.document_class
+            return _AsyncMockClient._Cursor(
+                [documentClass(post) for post in self._collection.find(query, projection)]
+            )
+
+        async def find_one(self, query, sort=None):
+            return self._collection.find_one(query, sort=sort)
+
+    class _Database:
+        def __init__(self, database):
+            self._database = database
+
+        def __getitem__(self, collectionName):
+            return _AsyncMockClient._Collection(self._database[collectionName], CodecOptions())
+
+        def __getattr__(self, collectionName):
+            return self[collectionName]
+
+    nClients = 0
+
+    def __init__(self, *args, **kwargs):
+        _AsyncMockClient.nClients += 1
+
+    def __getitem__(self, dbName):
+        return _AsyncMockClient._Database(db_handler.DatabaseHandler.dbClient[dbName])
+
+    async def close(self):
+        pass
+
+
+def test_async_db_handler_mongodb(monkeypatch):
+
+    logger.info('----Testing the asyncio interface to the DB (with a mongomock DB)-----')
+    client = mongomock.MongoClient()
+    db = client[DB_CTA_SIMULATION_MODEL]
+    db.metadata.insert_one({
+        'Entry': 'Simulation-Model-Tags',
+        'Tags': {'Current': {'Value': '2020-06-28'}, 'Latest': {'Value': '2020-06-28'}}
+    })
+    db.telescopes.insert_one({
+        'Telescope': 'North-LST-1', 'Version': '2020-06-28', 'Parameter': 'camera_pixels',
+        'Value': 1855, 'Applicable': True, 'File': False
+    })
+    db.sites.insert_one({
+        'Site': 'North', 'Version': '2020-06-28', 'Parameter': 'altitude',
+        'Value': 2158, 'Applicable': True, 'File': False
+    })
+
+    # The SSH tunnel is opened once, outside of the event loop thread
+    tunnelThreads = list()
+
+    def _openTunnel(self):
+        time.sleep(0.05)
+        tunnelThreads.append(threading.current_thread())
+
+    def _getDBClient(self):
+        raise AssertionError('The synchronous client must not be used')
+
+    DatabaseHandler = db_handler.DatabaseHandler
+    monkeypatch.setattr(DatabaseHandler, 'dbClient', client)
+    monkeypatch.setattr(DatabaseHandler, 'tunnel', None)
+    monkeypatch.setattr(DatabaseHandler, 'snapshot', None)
+    monkeypatch.setattr(DatabaseHandler, 'dbDetails', dict(
+        dbPort=0, userDB='user', passDB='pass', authenticationDatabase='admin'
+    ))
+    monkeypatch.setattr(DatabaseHandler, '_openTunnel', _openTunnel)
+    monkeypatch.setattr(DatabaseHandler, '_getDBClient', _getDBClient)
+    monkeypatch.setattr(DatabaseHandler, 'parametersCache', TimedLRUCache(logger=logger.name))
+    monkeypatch.setattr(DatabaseHandler, 'taggedVersionsCache', TimedLRUCache(logger=logger.name))
+    monkeypatch.setattr(async_db_handler, 'AsyncMongoClient', _AsyncMockClient)
+    monkeypatch.setattr(_AsyncMockClient, 'nClients', 0)
+    useMongoDB = cfg.get('useMongoDB')
+    cfg.change('useMongoDB', True)
+
+    async def _getParameters():
+        async with AsyncDatabaseHandler(logger.name) as dbh:
+            return await asyncio.gather(
+                dbh.getModelParameters('north-lst-1', 'Current'),
+                dbh.getSiteParameters('North', 'Current', None),
+                dbh.readMongoDB(
+                    DB_CTA_SIMULATION_MODEL, 'North-LST-1', '2020-06-28', None, False
+                )
+            )
+
+    try:
+        pars, sitePars, labelPars = asyncio.run(_getParameters())
+    finally:
+        cfg.change('useMongoDB', useMongoDB)
+
+    assert pars['camera_pixels']['Value'] == 1855
+    assert sitePars['altitude']['Value'] == 2158
+    assert labelPars['camera_pixels']['Value'] == 1855
+    assert len(tunnelThreads) == 1
+    assert tunnelThreads[0] is not threading.main_thread()
+    assert _AsyncMockClient.nClients == 1
+
+    return
+
+
 if __name__ == '__main__':
 
     # test_get_model_file()
@@ -201,4 +585,13 @@ if __name__ == '__main__':
     # test_reading_db_sst()
     # test_modify_db()
     test_reading_db_sites()
+    # test_yaml_cache()
+    # test_file_store()
+    # test_reading_db_multiple()
+    # test_snapshot()
+    # test_explain_queries()
+    # test_explain_queries_mock_db() requires the monkeypatch fixture of pytest
+    # test_diff_model_versions()
+    # test_async_db_handler()
+    # test_async_db_handler_mongodb() requires the monkeypatch fixture of pytest
     pass
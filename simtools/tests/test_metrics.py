@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+
+import json
+import logging
+
+import pytest
+
+from simtools.util.metrics import QueryMetrics
+
+logger = logging.getLogger()
+logger.setLevel(logging.DEBUG)
+
+
+def test_measure():
+    metrics = QueryMetrics(logger=logger.name)
+    with metrics.measure('readMongoDB', telescope='North-LST-1') as event:
+        event['documents'] = 10
+    with metrics.measure('readMongoDB', telescope='North-LST-2') as event:
+        event['documents'] = 5
+        event['cacheHit'] = False
+    with pytest.raises(ValueError):
+        with metrics.measure('readMongoDB'):
+            raise ValueError('Query failed')
+    metrics.record('getFile', nBytes=100, cacheHit=True)
+
+    stats = metrics.snapshot()
+    assert stats['readMongoDB']['calls'] == 3
+    assert stats['readMongoDB']['errors'] == 1
+    assert stats['readMongoDB']['documents'] == 15
+    assert stats['readMongoDB']['cacheMisses'] == 1
+    assert stats['readMongoDB']['totalTime'] >= stats['readMongoDB']['maxTime'] > 0
+    assert stats['getFile']['bytes'] == 100
+    assert stats['getFile']['cacheHits'] == 1
+
+    metrics.reset()
+    assert metrics.snapshot() == dict()
+
+
+def test_log_events(caplog):
+    metrics = QueryMetrics(logEvents=True, logger=logger.name)
+    with caplog.at_level(logging.INFO):
+        with metrics.measure('readMongoDB', telescope='North-LST-1') as event:
+            event['documents'] = 10
+
+    record = caplog.records[-1]
+    assert record.dbMetricsEvent['telescope'] == 'North-LST-1'
+    assert json.loads(record.getMessage())['documents'] == 10
+
+
+if __name__ == '__main__':
+
+    test_measure()
+    # test_log_events() requires the caplog fixture of pytest
@@ -1,6 +1,8 @@
 #!/usr/bin/python3
 
 import logging
+import shutil
+from pathlib import Path
 
 import yaml
 
@@ -10,6 +12,8 @@ import simtools.io_handler as io
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+testOutputDirectory = Path('./data/test-output')
+
 
 def test_reading_simtel_file():
     testFile = io.getTestDataFile('photons-LST-d12.0-za20.0-off0.000_lst_integral.lis')
@@ -18,6 +22,51 @@ def test_reading_simtel_file():
     logger.info(image.getPSF(0.8, 'cm'))
 
 
+def test_containment():
+    testFile = io.getTestDataFile('photons-LST-d12.0-za20.0-off0.000_lst_integral.lis')
+    image = PSFImage(focalLength=2800., logger=logger.name)
+    image.readSimtelFile(testFile)
+
+    nPhotons = len(image.photonPosX)
+    for fraction in [0.5, 0.8, 0.95]:
+        radius = image.getPSF(fraction, 'cm') / 2
+        nInside = image._sumPhotonsInRadius(radius)
+        logger.info('fraction={}, radius={}, nInside={}'.format(fraction, radius, nInside))
+        assert abs(nInside - fraction * nPhotons) <= 1
+
+    data = image.getCumulativeData()
+    assert all(data['Relative intensity'][1:] >= data['Relative intensity'][:-1])
+
+
+def test_binary_cache():
+    testFile = io.getTestDataFile('photons-LST-d12.0-za20.0-off0.000_lst_integral.lis')
+    copiedFile = testOutputDirectory.joinpath(testFile.name)
+    shutil.copy(testFile, copiedFile)
+    cacheFile = PSFImage.getBinaryCacheFileName(copiedFile)
+
+    image = PSFImage(focalLength=2800., logger=logger.name)
+    image.readSimtelFile(copiedFile)
+    assert not cacheFile.exists()
+
+    imageCached = PSFImage(focalLength=2800., logger=logger.name)
+    imageCached.readSimtelFile(copiedFile, useBinaryCache=True)
+    assert cacheFile.exists()
+
+    # Second reading comes from the binary cache
+    imageCached = PSFImage(focalLength=2800., logger=logger.name)
+    imageCached.readSimtelFile(copiedFile, useBinaryCache=True)
+
+    assert (image.photonPosX == imageCached.photonPosX).all()
+    assert (image.photonPosY == imageCached.photonPosY).all()
+    assert image.getEffectiveArea() == imageCached.getEffectiveArea()
+    assert image.getPSF(0.8, 'cm') == imageCached.getPSF(0.8, 'cm')
+
+    cacheFile.unlink()
+    copiedFile.unlink()
+
+
 if __name__ == '__main__':
 
     test_reading_simtel_file()
+    test_containment()
+    test_binary_cache()
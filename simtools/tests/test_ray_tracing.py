@@ -178,6 +178,30 @@ def test_single_mirror(plot=False):
     plt.savefig(plotFile)
 
 
+def test_single_mirror_parallel():
+
+    # Test MST, single mirror PSF simulation with concurrent sim_telarray jobs
+    version = 'prod3'
+
+    tel = TelescopeModel(
+        telescopeName='north-mst-FlashCam-D',
+        version=version,
+        label='test-mst-parallel',
+        logger=logger.name
+    )
+
+    ray = RayTracing(
+        telescopeModel=tel,
+        singleMirrorMode=True,
+        mirrorNumbers=list(range(1, 9)),
+        offAxisAngle=[0, 1.0] * u.deg
+    )
+    ray.simulate(test=True, force=True, maxWorkers=4)
+    ray.analyze(force=True)
+
+    assert len(ray._results) == 16
+
+
 def test_integral_curve():
     sourceDistance = 10 * u.km
     version = 'prod4'
@@ -219,6 +243,7 @@ if __name__ == '__main__':
     # test_ssts()
     test_rx()
     # test_single_mirror()
+    # test_single_mirror_parallel()
     # test_plot_image()
     # test_integral_curve()
     pass
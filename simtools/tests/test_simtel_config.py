@@ -0,0 +1,122 @@
+#!/usr/bin/python3
+
+import logging
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from simtools.util.simtel_config import readSimtelConfigFile
+from simtools.model.telescope_model import TelescopeModel
+
+logger = logging.getLogger()
+logger.setLevel(logging.DEBUG)
+
+testDataDirectory = './data/test-output'
+
+
+def _writeTestFiles(directory):
+    directory.mkdir(parents=True, exist_ok=True)
+    includeDirectory = directory.joinpath('include')
+    includeDirectory.mkdir(exist_ok=True)
+    includeDirectory.joinpath('common.cfg').write_text(
+        '% Common parameters\n'
+        'camera_pixel = 1855\n'
+        'echo Reading the common parameters\n'
+        'mirror_list = mirror_list_$(MIRRORS).dat\n'
+    )
+    configFile = directory.joinpath('telescope.cfg')
+    configFile.write_text(
+        '#define MIRRORS 198\n'
+        '#include <common.cfg>\n'
+        '#ifdef LARGE_TELESCOPE\n'
+        '   focal_length = 2800.0  % in cm\n'
+        '#elif TELESCOPE == 2\n'
+        '   focal_length = 1600.0\n'
+        '#else\n'
+        '   focal_length = 560.0\n'
+        '#endif\n'
+        '#if !defined(LARGE_TELESCOPE) && TELESCOPE > 1\n'
+        '   dsum_shaping 1, 2, \\\n'
+        '      3\n'
+        '#endif\n'
+        'telescope_transmission=0.969\n'
+    )
+    return configFile, includeDirectory
+
+
+def test_read_config_file():
+    directory = Path(testDataDirectory).joinpath('simtel-config-test')
+    configFile, includeDirectory = _writeTestFiles(directory)
+    try:
+        pars = readSimtelConfigFile(configFile, includePaths=[includeDirectory])
+        assert pars['camera_pixel'] == '1855'
+        assert pars['mirror_list'] == 'mirror_list_198.dat'
+        assert pars['focal_length'] == '560.0'
+        assert pars['telescope_transmission'] == '0.969'
+        assert 'dsum_shaping' not in pars
+
+        pars = readSimtelConfigFile(
+            configFile,
+            includePaths=[includeDirectory],
+            definitions={'TELESCOPE': 2}
+        )
+        assert pars['focal_length'] == '1600.0'
+        assert pars['dsum_shaping'] == '1 2 3'
+
+        pars = readSimtelConfigFile(
+            configFile,
+            includePaths=[includeDirectory],
+            definitions={'LARGE_TELESCOPE': ''}
+        )
+        assert pars['focal_length'] == '2800.0'
+
+        # Modifying an included file invalidates the cached results
+        includeDirectory.joinpath('common.cfg').write_text('camera_pixels = 1764\n')
+        pars = readSimtelConfigFile(configFile, includePaths=[includeDirectory])
+        assert pars['camera_pixels'] == '1764'
+
+        # A file appearing next to the config file is included instead of the one found before
+        directory.joinpath('common.cfg').write_text('camera_pixels = 2048\n')
+        pars = readSimtelConfigFile(configFile, includePaths=[includeDirectory])
+        assert pars['camera_pixels'] == '2048'
+        directory.joinpath('common.cfg').unlink()
+
+        with pytest.raises(FileNotFoundError):
+            readSimtelConfigFile(configFile)
+
+        configFile.write_text('#ifdef TELESCOPE\ncamera_pixels = 1855\n')
+        with pytest.raises(ValueError):
+            readSimtelConfigFile(configFile, definitions={'TELESCOPE': 1})
+    finally:
+        subprocess.call(['rm -rf {}'.format(directory)], shell=True)
+
+    return
+
+
+def test_telescope_model_from_config_file():
+    directory = Path(testDataDirectory).joinpath('simtel-config-test-model')
+    configFile, includeDirectory = _writeTestFiles(directory)
+    try:
+        tel = TelescopeModel.fromConfigFile(
+            configFileName=configFile,
+            telescopeName='north-lst-1',
+            label='test-simtel-config',
+            modelFilesLocations=includeDirectory,
+            definitions={'TELESCOPE': 2},
+            logger=logger.name
+        )
+        assert tel.getParameter('camera_pixels') == '1855'
+        assert tel.getParameter('focal_length') == '1600.0'
+        assert tel.getParameter('dsum_shaping') == '1 2 3'
+    finally:
+        subprocess.call(['rm -rf {}'.format(directory)], shell=True)
+
+    return
+
+
+if __name__ == '__main__':
+
+    test_read_config_file()
+    # test_telescope_model_from_config_file()
+    pass
@@ -31,6 +31,26 @@ def test_ray_tracing_mode():
     # simtel.run(test=True, force=True)
 
 
+def test_ray_tracing_parallel_runs():
+    tel = TelescopeModel(
+        telescopeName='north-lst-1',
+        version='Current',
+        label='test-simtel-parallel',
+        logger=logger.name
+    )
+
+    simtel = SimtelRunner(
+        mode='ray-tracing',
+        telescopeModel=tel,
+        zenithAngle=20 * u.deg,
+        offAxisAngle=0 * u.deg,
+        sourceDistance=12 * u.km
+    )
+
+    logger.info(simtel)
+    simtel.run(force=True, maxParallelRuns=4)
+
+
 def test_catching_model_error():
     tel = TelescopeModel(
         telescopeName='north-lst-1',
@@ -64,4 +84,5 @@ def test_catching_model_error():
 if __name__ == '__main__':
 
     test_ray_tracing_mode()
+    # test_ray_tracing_parallel_runs()
     test_catching_model_error()
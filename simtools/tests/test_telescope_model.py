@@ -2,6 +2,13 @@
 
 import yaml
 import logging
+import pickle
+import threading
+import time
+
+import astropy.units as u
+import numpy as np
+import pytest
 
 from simtools.model.telescope_model import TelescopeModel
 
@@ -97,6 +104,175 @@ def test_cfg_input():
     return
 
 
+def test_derive():
+    tel = TelescopeModel(
+        telescopeName='north-lst-1',
+        version='Current',
+        label='test-derive',
+        readFromDB=False,
+        logger=logger.name
+    )
+    tel.addParameters(mirror_reflection_random_angle='0.0075', focal_length='2800.')
+
+    tel1 = tel.derive(mirror_reflection_random_angle='0.0080')
+    tel2 = tel.derive(mirror_reflection_random_angle='0.0090')
+    assert tel1.getParameter('mirror_reflection_random_angle') == '0.0080'
+    assert tel2.getParameter('mirror_reflection_random_angle') == '0.0090'
+    assert tel1.getParameter('focal_length') == '2800.'
+    assert tel1.label != tel2.label
+    assert tel1.getConfigFile() != tel2.getConfigFile()
+    assert tel1.getConfigFile().parent == tel.getConfigFile().parent
+
+    # Models with the same parameters share the config file, which is not written again
+    tel3 = tel.derive(label='test-derive-3', mirror_reflection_random_angle='0.0080')
+    modificationTime = tel1.getConfigFile().stat().st_mtime_ns
+    assert tel3.getConfigFile() == tel1.getConfigFile()
+    assert tel1.getConfigFile().stat().st_mtime_ns == modificationTime
+
+    # The config file does not depend on the order in which the parameters were set
+    tel4 = TelescopeModel(
+        telescopeName='north-lst-1',
+        version='Current',
+        label='test-derive-4',
+        readFromDB=False,
+        logger=logger.name
+    )
+    tel4.addParameters(focal_length='2800.', mirror_reflection_random_angle='0.0080')
+    assert tel4.getConfigFile().name == tel1.getConfigFile().name
+
+    # Copy-on-write, in both directions
+    tel.changeParameters(focal_length='2900.')
+    tel1.addParameters(new_parameter='1')
+    assert tel1.getParameter('focal_length') == '2800.'
+    assert not tel.hasParameter('new_parameter')
+    assert not tel2.hasParameter('new_parameter')
+
+    tel2.removeParameters('focal_length')
+    assert tel.getParameter('focal_length') == '2900.'
+    assert tel1.getParameter('focal_length') == '2800.'
+    return
+
+
+def test_shared_model():
+    tel = TelescopeModel.getSharedModel('north-lst-1', 'Current', logger=logger.name)
+    assert TelescopeModel.getSharedModel('North-LST-1', 'Current') is tel
+
+    with pytest.raises(ValueError):
+        tel.changeParameters(mirror_reflection_random_angle='0.0080 0 0')
+
+    telDerived = tel.derive(label='test-shared', mirror_reflection_random_angle='0.0080 0 0')
+    assert telDerived.getParameter('mirror_reflection_random_angle') == '0.0080 0 0'
+
+    assert TelescopeModel.evictSharedModels(telescopeName='north-lst-1') == 1
+    assert TelescopeModel.getSharedModel('north-lst-1', 'Current') is not tel
+    TelescopeModel.evictSharedModels()
+    return
+
+
+def test_parameter_value():
+    tel = TelescopeModel(
+        telescopeName='north-lst-1',
+        version='Current',
+        label='test-parameter-value',
+        readFromDB=False,
+        logger=logger.name
+    )
+    tel.addParameters(
+        focal_length='2800.',
+        mirror_reflection_random_angle='0.0075, 0.125 0.037',
+        camera_config_name='LST'
+    )
+
+    assert tel.getParameterValue('focal_length') == 2800.
+    assert tel.getParameterValue('focal_length', asArray=True).tolist() == [2800.]
+    assert tel.getParameterValue('focal_length', unit='cm').to(u.m).value == 28.
+    rnda = tel.getParameterValue('mirror_reflection_random_angle')
+    assert rnda.tolist() == [0.0075, 0.125, 0.037]
+    assert tel.getParameterValue('mirror_reflection_random_angle') is rnda
+    with pytest.raises(ValueError):
+        rnda[0] = 0.
+    with pytest.raises(ValueError):
+        tel.getParameterValue('camera_config_name')
+
+    # Changed parameters are parsed again, also in derived models
+    telDerived = tel.derive(focal_length='2900.')
+    tel.changeParameters(mirror_reflection_random_angle='0.0080')
+    assert tel.getParameterValue('mirror_reflection_random_angle') == 0.008
+    assert telDerived.getParameterValue('mirror_reflection_random_angle') is rnda
+    assert telDerived.getParameterValue('focal_length') == 2900.
+    assert tel.getParameterValue('focal_length') == 2800.
+
+    tel.removeParameters('focal_length')
+    with pytest.raises(ValueError):
+        tel.getParameterValue('focal_length')
+
+    # Arrays and quantities can be set as values
+    tel.changeParameters(mirror_reflection_random_angle=np.array([0.0075, 0.125, 0.037]))
+    tel.changeParameters(mirror_reflection_random_angle=np.array([0.0075, 0.125, 0.037]))
+    assert tel.getParameterValue('mirror_reflection_random_angle').tolist()[0] == 0.0075
+    tel.addParameters(mirror_focal_length='1600.')
+    tel.changeParameters(mirror_focal_length=16. * u.m)
+    tel.changeParameters(mirror_focal_length=1600. * u.cm)
+    assert tel.getParameter('mirror_focal_length') == 1600. * u.cm
+    assert tel.getParameterValue('mirror_focal_length', unit='m') == 16. * u.m
+    assert tel.getParameterValue('mirror_focal_length', unit='cm').value == 1600.
+    with pytest.raises(ValueError):
+        tel.getParameterValue('mirror_focal_length')
+    with pytest.raises(ValueError):
+        tel.getParameterValue('mirror_focal_length', unit='deg')
+    tel.changeParameters(mirror_focal_length=16. * u.m)
+    assert tel.getParameterValue('mirror_focal_length', unit='cm').value == 1600.
+    return
+
+
+def test_load_camera_once(monkeypatch):
+    nLoads = list()
+
+    def _loadCamera(self):
+        nLoads.append(1)
+        time.sleep(0.05)
+        self._camera = 'camera'
+
+    monkeypatch.setattr(TelescopeModel, '_loadCamera', _loadCamera)
+    tel = TelescopeModel(
+        telescopeName='north-lst-1',
+        version='Current',
+        label='test-load-camera',
+        readFromDB=False,
+        logger=logger.name
+    )
+    threads = [threading.Thread(target=lambda: tel.camera) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tel.camera == 'camera'
+    assert len(nLoads) == 1
+
+    # The cameras of different models are loaded concurrently (not waiting for each other)
+    barrier = threading.Barrier(2, timeout=5)
+
+    def _loadCameraConcurrently(self):
+        barrier.wait()
+        self._camera = 'camera'
+
+    monkeypatch.setattr(TelescopeModel, '_loadCamera', _loadCameraConcurrently)
+    tels = [tel.derive(label='test-load-camera-{}'.format(i)) for i in range(2)]
+    for telDerived in tels:
+        del telDerived._camera
+    threads = [threading.Thread(target=lambda tel=tel: tel.camera) for tel in tels]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not barrier.broken
+    assert all(telDerived.camera == 'camera' for telDerived in tels)
+
+    # Models can be pickled (without their lock)
+    assert pickle.loads(pickle.dumps(tel)).camera == 'camera'
+    return
+
+
 if __name__ == '__main__':
 
     # test_handling_parameters()
@@ -104,5 +280,9 @@ if __name__ == '__main__':
     # test_flen_type()
     # test_cfg_file()
     # test_cfg_input()
+    # test_derive()
+    # test_shared_model()
+    # test_parameter_value()
+    # test_load_camera_once() requires the monkeypatch fixture of pytest
     test_pars_from_db_handler()
     pass
@@ -0,0 +1,208 @@
+''' Module with a generic cache used to avoid repeating expensive calls (e.g. DB queries). '''
+
+import ast
+import logging
+import hashlib
+import os
+import pickle
+import time
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+
+__all__ = ['TimedLRUCache']
+
+
+class TimedLRUCache:
+    '''
+    Bounded least-recently-used cache with time-to-live, optionally backed by a directory on disk
+    so that entries survive between processes. The cache is safe to be used from several threads.
+
+    Keys must be hashable and their repr must be a python literal (e.g. tuples of str, int, bool
+    and None), since the repr is used to name the files on disk and is stored next to each entry
+    (.key file), so that entries can be invalidated without reading their values.
+
+    Attributes
+    ----------
+    maxSize: int
+        Maximum number of entries kept in memory.
+    ttl: float
+        Time-to-live of the entries in seconds. None means that entries never expire.
+
+    Methods
+    -------
+    get(key, default=None)
+        Get the value of an entry, if it exists and is not expired.
+    set(key, value)
+        Add or replace an entry.
+    invalidate(condition=None)
+        Remove the entries for which condition(key) is True (all entries if condition is None).
+    '''
+    def __init__(self, maxSize=128, ttl=None, cacheDirectory=None, logger=__name__):
+        '''
+        TimedLRUCache init.
+
+        Parameters
+        ----------
+        maxSize: int
+            Maximum number of entries kept in memory.
+        ttl: float, optional
+            Time-to-live of the entries in seconds. If not given, entries never expire.
+        cacheDirectory: str or Path, optional
+            Directory where entries are pickled. If not given, entries are only kept in memory.
+        logger: str
+            Logger name to use in this instance
+        '''
+        self._logger = logging.getLogger(logger)
+        self.maxSize = maxSize
+        self.ttl = ttl
+        self._cacheDirectory = Path(cacheDirectory) if cacheDirectory is not None else None
+        if self._cacheDirectory is not None:
+            self._cacheDirectory.mkdir(parents=True, exist_ok=True)
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return 'TimedLRUCache(maxSize={}, ttl={}, entries={})\n'.format(
+            self.maxSize,
+            self.ttl,
+            len(self)
+        )
+
+    def _isExpired(self, timestamp):
+        return self.ttl is not None and time.time() - timestamp > self.ttl
+
+    def _getCacheFile(self, key):
+        return self._cacheDirectory.joinpath(
+            hashlib.sha1(repr(key).encode()).hexdigest() + '.pickle'
+        )
+
+    @staticmethod
+    def _readKeyFile(keyFile):
+        ''' Read the key stored in a .key file, None if it cannot be read. '''
+        try:
+            return ast.literal_eval(keyFile.read_text())
+        except (OSError, ValueError, SyntaxError):
+            return None
+
+    def get(self, key, default=None):
+        '''
+        Get the value of an entry. If the entry is not in memory, it is searched in the cache
+        directory (if set).
+
+        Parameters
+        ----------
+        key: hashable
+            Key of the entry.
+        default: any
+            Value returned if the entry does not exist or is expired.
+
+        Returns
+        -------
+        Value of the entry.
+        '''
+        with self._lock:
+            if key in self._entries:
+                timestamp, value = self._entries[key]
+                if not self._isExpired(timestamp):
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+
+            if self._cacheDirectory is None:
+                return default
+
+            entry = self._readEntryFromDisk(key)
+            if entry is None:
+                return default
+            self._addEntry(key, *entry)
+            return entry[1]
+
+    def set(self, key, value):
+        '''
+        Add or replace an entry.
+
+        Parameters
+        ----------
+        key: hashable
+            Key of the entry.
+        value: any
+            Value of the entry (must be picklable if a cache directory is set).
+        '''
+        timestamp = time.time()
+        with self._lock:
+            self._addEntry(key, timestamp, value)
+            if self._cacheDirectory is not None:
+                self._writeEntryToDisk(key, timestamp, value)
+
+    def invalidate(self, condition=None):
+        '''
+        Remove entries from memory and from the cache directory (if set). The entries on disk are
+        selected by their .key files, without reading their values.
+
+        Parameters
+        ----------
+        condition: callable, optional
+            Function receiving a key and returning True if the entry must be removed. If not
+            given, all entries are removed.
+        '''
+        # Entries on disk are removed first (without holding the lock), so that entries read
+        # from disk in the meantime are removed from memory afterwards.
+        if self._cacheDirectory is not None:
+            keyFiles = {keyFile.stem: keyFile for keyFile in self._cacheDirectory.glob('*.key')}
+            for cacheFile in self._cacheDirectory.glob('*.pickle'):
+                keyFile = keyFiles.pop(cacheFile.stem, None)
+                # Entries without a readable key file are always removed.
+                key = self._readKeyFile(keyFile) if keyFile is not None else None
+                if key is None or condition is None or condition(key):
+                    cacheFile.unlink(missing_ok=True)
+                    if keyFile is not None:
+                        keyFile.unlink(missing_ok=True)
+            # Key files without entry (e.g. entry being written)
+            for keyFile in keyFiles.values():
+                key = self._readKeyFile(keyFile)
+                if key is None or condition is None or condition(key):
+                    keyFile.unlink(missing_ok=True)
+
+        with self._lock:
+            for key in list(self._entries.keys()):
+                if condition is None or condition(key):
+                    del self._entries[key]
+
+    def _addEntry(self, key, timestamp, value):
+        self._entries[key] = (timestamp, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxSize:
+            self._entries.popitem(last=False)
+
+    def _readEntryFromDisk(self, key):
+        cacheFile = self._getCacheFile(key)
+        if not cacheFile.exists():
+            return None
+        try:
+            with open(cacheFile, 'rb') as stream:
+                fileKey, timestamp, value = pickle.load(stream)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            self._logger.warning('Cache file {} could not be read'.format(cacheFile))
+            return None
+        if fileKey != key or self._isExpired(timestamp):
+            return None
+        self._logger.debug('Reading cache entry from {}'.format(cacheFile))
+        return timestamp, value
+
+    def _writeEntryToDisk(self, key, timestamp, value):
+        cacheFile = self._getCacheFile(key)
+        tmpFile = cacheFile.with_name(cacheFile.name + '.{}.tmp'.format(os.getpid()))
+        try:
+            # The key file is written first, so that every entry on disk can be invalidated.
+            cacheFile.with_suffix('.key').write_text(repr(key))
+            with open(tmpFile, 'wb') as stream:
+                pickle.dump((key, timestamp, value), stream, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpFile, cacheFile)
+        except (OSError, pickle.PicklingError):
+            self._logger.warning('Cache file {} could not be written'.format(cacheFile))
+
+# END of TimedLRUCache
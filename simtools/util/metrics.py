@@ -0,0 +1,176 @@
+''' Module with a collector of metrics of DB queries and file transfers. '''
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+__all__ = ['QueryMetrics']
+
+
+class QueryMetrics:
+    '''
+    Thread-safe collector of the timings, number of documents returned, bytes transferred and
+    cache hits/misses of named operations (e.g. DB queries). The accumulated metrics of each
+    operation are given by snapshot. Optionally, each recorded event is also logged as a JSON
+    line (the event dict is also attached to the log record as dbMetricsEvent).
+
+    Nested operations are recorded independently, so the time of an operation may include the
+    time of the operations it calls.
+
+    Attributes
+    ----------
+    logEvents: bool
+        If True, each recorded event is logged (INFO level).
+
+    Methods
+    -------
+    measure(operation, **details)
+        Context manager measuring the duration of an operation.
+    record(operation, duration=0., documents=0, nBytes=0, cacheHit=None, error=False, **details)
+        Record an event of an operation.
+    snapshot()
+        Get the accumulated metrics of each operation.
+    reset()
+        Forget all the recorded events.
+    '''
+    def __init__(self, logEvents=False, logger=__name__):
+        '''
+        QueryMetrics init.
+
+        Parameters
+        ----------
+        logEvents: bool
+            If True, each recorded event is logged.
+        logger: str
+            Logger name to use in this instance
+        '''
+        self._logger = logging.getLogger(logger)
+        self.logEvents = logEvents
+        self._metrics = dict()
+        self._lock = Lock()
+
+    def __repr__(self):
+        return 'QueryMetrics(operations={})\n'.format(sorted(self._metrics.keys()))
+
+    @contextmanager
+    def measure(self, operation, **details):
+        '''
+        Measure the duration of an operation. The yielded dict can be used to set the number of
+        documents returned ('documents'), the bytes transferred ('nBytes'), whether a cache was
+        hit ('cacheHit') and any other detail to be logged. Exceptions are counted as errors
+        and raised again.
+
+        Parameters
+        ----------
+        operation: str
+            Name of the operation.
+        details: dict
+            Details of the event, only used in the log events (e.g. telescope name).
+
+        Yields
+        ------
+        dict
+            Event of the operation.
+        '''
+        event = dict(details)
+        start = time.perf_counter()
+        error = False
+        try:
+            yield event
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(
+                operation,
+                duration=time.perf_counter() - start,
+                error=error,
+                **event
+            )
+
+    def record(
+        self,
+        operation,
+        duration=0.,
+        documents=0,
+        nBytes=0,
+        cacheHit=None,
+        error=False,
+        **details
+    ):
+        '''
+        Record an event of an operation.
+
+        Parameters
+        ----------
+        operation: str
+            Name of the operation.
+        duration: float
+            Duration in seconds.
+        documents: int
+            Number of documents returned.
+        nBytes: int
+            Number of bytes transferred.
+        cacheHit: bool, optional
+            Whether a cache was hit (None if no cache is involved).
+        error: bool
+            Whether the operation failed.
+        details: dict
+            Details of the event, only used in the log events.
+        '''
+        with self._lock:
+            metrics = self._metrics.setdefault(operation, {
+                'calls': 0,
+                'errors': 0,
+                'totalTime': 0.,
+                'maxTime': 0.,
+                'documents': 0,
+                'bytes': 0,
+                'cacheHits': 0,
+                'cacheMisses': 0
+            })
+            metrics['calls'] += 1
+            metrics['errors'] += int(error)
+            metrics['totalTime'] += duration
+            metrics['maxTime'] = max(metrics['maxTime'], duration)
+            metrics['documents'] += documents
+            metrics['bytes'] += nBytes
+            if cacheHit is not None:
+                metrics['cacheHits' if cacheHit else 'cacheMisses'] += 1
+
+        if self.logEvents:
+            event = {
+                'operation': operation,
+                'duration': duration,
+                'documents': documents,
+                'bytes': nBytes,
+                'cacheHit': cacheHit,
+                'error': error,
+                **details
+            }
+            self._logger.info(
+                json.dumps(event, default=str),
+                extra={'dbMetricsEvent': event}
+            )
+
+    def snapshot(self):
+        '''
+        Get the accumulated metrics of each operation: number of calls and errors, total and
+        maximum time (in seconds), documents returned, bytes transferred and cache hits/misses.
+
+        Returns
+        -------
+        dict
+            Metrics (dict) of each operation name.
+        '''
+        with self._lock:
+            return {operation: dict(metrics) for operation, metrics in self._metrics.items()}
+
+    def reset(self):
+        ''' Forget all the recorded events. '''
+        with self._lock:
+            self._metrics = dict()
+
+# END of QueryMetrics
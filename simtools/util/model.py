@@ -16,6 +16,12 @@ __all__ = [
 
 logger = logging.getLogger(__name__)
 
+# Name in MODEL_PARS of each parameter name and alias.
+_MODEL_PARS_NAMES = {
+    **{alias: parName for parName, parInfo in MODEL_PARS.items() for alias in parInfo['names']},
+    **{parName: parName for parName in MODEL_PARS.keys()}
+}
+
 
 def computeTelescopeTransmission(pars, offAxis):
     '''
@@ -59,11 +65,10 @@ def validateModelParameter(parNameIn, parValueIn):
     information is available in MODEL_PARS
     '''
     logger.debug('Validating parameter {}'.format(parNameIn))
-    for parNameModel in MODEL_PARS.keys():
-        if parNameIn == parNameModel or parNameIn in MODEL_PARS[parNameModel]['names']:
-            parType = MODEL_PARS[parNameModel]['type']
-            return parNameModel, parType(parValueIn)
-    return parNameIn, parValueIn
+    parNameModel = _MODEL_PARS_NAMES.get(parNameIn, None)
+    if parNameModel is None:
+        return parNameIn, parValueIn
+    return parNameModel, MODEL_PARS[parNameModel]['type'](parValueIn)
 
 
 def getCameraName(telescopeName):
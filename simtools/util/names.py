@@ -353,7 +353,7 @@ allArrayNames = {
 }
 
 
-def simtelConfigFileName(version, telescopeName, label):
+def simtelConfigFileName(version, telescopeName, label, configHash=None):
     '''
     sim_telarray config file name.
 
@@ -365,6 +365,9 @@ def simtelConfigFileName(version, telescopeName, label):
         North-LST-1, South-MST-FlashCam, ...
     label: str
         Instance label.
+    configHash: str, optional
+        Hash of the content of the file. If given, it is used instead of the label, so that
+        files with the same content are shared by instances with different labels.
 
     Returns
     -------
@@ -372,7 +375,10 @@ def simtelConfigFileName(version, telescopeName, label):
         File name.
     '''
     name = 'CTA-{}-{}'.format(version, telescopeName)
-    name += '_{}'.format(label) if label is not None else ''
+    if configHash is not None:
+        name += '_{}'.format(configHash)
+    elif label is not None:
+        name += '_{}'.format(label)
     name += '.cfg'
     return name
 
@@ -0,0 +1,332 @@
+''' Module to read sim_telarray config files, resolving the preprocessor directives. '''
+
+import hashlib
+import logging
+import os
+import re
+from pathlib import Path
+
+import simtools.config as cfg
+from simtools.util.cache import TimedLRUCache
+
+__all__ = ['readSimtelConfigFile']
+
+logger = logging.getLogger(__name__)
+
+# Parsed files, validated by the stat of the files they include (see readSimtelConfigFile).
+_parsedFiles = TimedLRUCache(maxSize=64, logger=__name__)
+
+# Maximum depth of nested includes, to stop recursive includes.
+MAX_INCLUDE_DEPTH = 32
+
+_DIRECTIVE = re.compile(r'#\s*(\w+)\s*(.*)$')
+_PARAMETER = re.compile(r'([A-Za-z_][\w.@\[\]-]*)\s*(?:=\s*)?(.*)$')
+_MACRO = re.compile(r'\$[({](\w+)[)}]')
+_EXPRESSION_TOKEN = re.compile(
+    r'\s*(\d+\.?\d*(?:[eE][-+]?\d+)?|[A-Za-z_]\w*|"[^"]*"|==|!=|<=|>=|&&|\|\||[<>!()+\-*/])'
+)
+
+
+def readSimtelConfigFile(fileName, includePaths=None, definitions=None):
+    '''
+    Read the parameters of a sim_telarray config file, as sim_telarray uses them.
+    The preprocessor directives are resolved: #include (searched in the directory of the
+    including file and then in includePaths), #define, #undef, #if, #ifdef, #ifndef, #elif,
+    #else, #endif and #error. Macros are expanded in the values and included file names when
+    written as $(NAME) or ${NAME} (environment variables are used for undefined macros).
+    Comments (starting with %) and echo lines are ignored, commas in the values are replaced
+    by spaces and the last value of repeated parameters is kept.
+
+    The results are cached by the hash of the file, and reused as long as the included files
+    are not modified and no file with their names appears in the locations searched first.
+
+    Parameters
+    ----------
+    fileName: str or Path
+        Path of the config file.
+    includePaths: list of str or Path, optional
+        Directories where the included files are searched for (recursively).
+    definitions: dict, optional
+        Macros defined before reading the file (e.g. {'TELESCOPE': 1}).
+
+    Returns
+    -------
+    dict
+        Value (str) of each parameter, with the names as written in the file.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the file or an included file does not exist.
+    ValueError
+        If the preprocessor directives are not valid, or on #error.
+    '''
+    fileName = Path(fileName).absolute()
+    includePaths = [str(path) for path in (includePaths if includePaths is not None else [])]
+    definitions = {name: str(value) for name, value in (definitions or dict()).items()}
+
+    with open(fileName, 'rb') as file:
+        content = file.read()
+    key = (
+        hashlib.sha1(content).hexdigest(),
+        str(fileName.parent),
+        tuple(includePaths),
+        tuple(sorted(definitions.items()))
+    )
+    cached = _parsedFiles.get(key)
+    if cached is not None:
+        dependencies, parameters = cached
+        if all(_getFileStat(dependency) == stat for dependency, stat in dependencies.items()):
+            logger.debug('Using cached parameters of {}'.format(fileName))
+            return dict(parameters)
+
+    reader = _SimtelConfigReader(includePaths, definitions)
+    reader.readLines(content.decode(), fileName, depth=0)
+    _parsedFiles.set(key, (reader.dependencies, dict(reader.parameters)))
+    return reader.parameters
+
+
+def _getFileStat(fileName):
+    try:
+        fileStat = os.stat(fileName)
+    except OSError:
+        return None
+    return (fileStat.st_mtime_ns, fileStat.st_size)
+
+
+def _stripComment(line):
+    ''' Remove the comment (starting with %, outside quotes) from a line. '''
+    if '%' not in line:
+        return line
+    inQuotes = False
+    for iChar, char in enumerate(line):
+        if char == '"':
+            inQuotes = not inQuotes
+        elif char == '%' and not inQuotes:
+            return line[:iChar]
+    return line
+
+
+class _SimtelConfigReader:
+    ''' State of the preprocessor while reading a config file and its includes. '''
+
+    def __init__(self, includePaths, definitions):
+        self.includePaths = includePaths
+        self.definitions = dict(definitions)
+        self.parameters = dict()
+        # (mtime, size) of the included files, None for the missing candidates searched first.
+        self.dependencies = dict()
+
+    def readLines(self, content, fileName, depth):
+        '''
+        Read the lines of a file, adding its parameters and resolving its directives.
+
+        Parameters
+        ----------
+        content: str
+            Content of the file.
+        fileName: Path
+            Path of the file, used to resolve relative includes and in error messages.
+        depth: int
+            Depth of nested includes.
+        '''
+        # Stack of conditional blocks: [active, any branch taken, parent active]
+        conditions = list()
+        active = True
+
+        lines = content.splitlines()
+        iLine = 0
+        while iLine < len(lines):
+            line = lines[iLine]
+            iLine += 1
+            # Continuation lines
+            while line.endswith('\\') and iLine < len(lines):
+                line = line[:-1] + ' ' + lines[iLine]
+                iLine += 1
+
+            location = '{}:{}'.format(fileName, iLine)
+            line = _stripComment(line).strip()
+            if len(line) == 0:
+                continue
+
+            if line.startswith('#'):
+                match = _DIRECTIVE.match(line)
+                if match is None:
+                    continue
+                directive, argument = match.group(1).lower(), match.group(2).strip()
+
+                if directive in ['if', 'ifdef', 'ifndef']:
+                    condition = active and self._evaluateCondition(directive, argument, location)
+                    conditions.append([condition, condition, active])
+                elif directive in ['elif', 'else', 'endif']:
+                    if len(conditions) == 0:
+                        raise ValueError('#{} without #if in {}'.format(directive, location))
+                    block = conditions[-1]
+                    if directive == 'endif':
+                        conditions.pop()
+                    elif block[1] or not block[2]:
+                        block[0] = False
+                    else:
+                        block[0] = (
+                            directive == 'else'
+                            or self._evaluateCondition('if', argument, location)
+                        )
+                        block[1] = block[0]
+                else:
+                    if active:
+                        self._processDirective(directive, argument, fileName, depth, location)
+                active = conditions[-1][0] if len(conditions) > 0 else True
+                continue
+
+            if not active:
+                continue
+
+            words = line.split(None, 1)
+            if words[0].lower() == 'echo':
+                continue
+            match = _PARAMETER.match(line)
+            if match is None:
+                logger.warning('Line not understood in {}: {}'.format(location, line))
+                continue
+            self.parameters[match.group(1)] = self._normalizeValue(
+                self._expandMacros(match.group(2))
+            )
+
+        if len(conditions) > 0:
+            raise ValueError('Missing #endif in {}'.format(fileName))
+
+    def _processDirective(self, directive, argument, fileName, depth, location):
+        ''' Process the directives other than the conditional ones. '''
+        if directive == 'define':
+            words = argument.split(None, 1)
+            if len(words) == 0:
+                raise ValueError('#define without name in {}'.format(location))
+            self.definitions[words[0]] = self._expandMacros(words[1]) if len(words) > 1 else ''
+        elif directive == 'undef':
+            self.definitions.pop(argument, None)
+        elif directive == 'include':
+            self._include(self._expandMacros(argument).strip('<>"\' '), fileName, depth, location)
+        elif directive == 'error':
+            raise ValueError('#error in {}: {}'.format(location, argument))
+        else:
+            logger.debug('Ignoring directive #{} in {}'.format(directive, location))
+
+    def _include(self, includeName, fileName, depth, location):
+        ''' Read an included file, searched in the directory of fileName and in includePaths. '''
+        if depth >= MAX_INCLUDE_DEPTH:
+            raise ValueError('Too many nested includes in {}'.format(location))
+
+        includeFile = fileName.parent.joinpath(includeName)
+        if not includeFile.exists():
+            # The candidates searched first (directory of fileName, then the current directory
+            # and includePaths, as in cfg.findFile) are recorded as missing, so that the cached
+            # results are not used anymore if the file appears in any of them.
+            for candidate in [
+                includeFile,
+                Path(includeName),
+                *[Path(path).joinpath(includeName) for path in self.includePaths]
+            ]:
+                candidate = candidate.absolute()
+                if not candidate.exists():
+                    self.dependencies.setdefault(str(candidate), None)
+            try:
+                includeFile = cfg.findFile(includeName, self.includePaths)
+            except FileNotFoundError:
+                raise FileNotFoundError(
+                    'Included file {} not found ({})'.format(includeName, location)
+                )
+        includeFile = Path(includeFile).absolute()
+
+        logger.debug('Including {}'.format(includeFile))
+        self.dependencies[str(includeFile)] = _getFileStat(includeFile)
+        with open(includeFile, 'r') as file:
+            self.readLines(file.read(), includeFile, depth + 1)
+
+    def _expandMacros(self, text):
+        ''' Expand the macros written as $(NAME) or ${NAME}. '''
+        if '$' not in text:
+            return text
+
+        def _expand(match):
+            name = match.group(1)
+            if name in self.definitions:
+                return self.definitions[name]
+            return os.environ.get(name, match.group(0))
+
+        return _MACRO.sub(_expand, text)
+
+    @staticmethod
+    def _normalizeValue(value):
+        ''' Normalize the separators of a value (commas and spaces), keeping quoted strings. '''
+        value = value.strip()
+        if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+            return value[1:-1]
+        return ' '.join(value.replace(',', ' ').split())
+
+    def _evaluateCondition(self, directive, argument, location):
+        ''' Evaluate the condition of #if, #ifdef or #ifndef. '''
+        if directive == 'ifdef':
+            return argument in self.definitions
+        if directive == 'ifndef':
+            return argument not in self.definitions
+
+        # The expression is translated token by token into a python expression.
+        tokens = list()
+        position = 0
+        argument = argument.strip()
+        while position < len(argument):
+            match = _EXPRESSION_TOKEN.match(argument, position)
+            if match is None:
+                raise ValueError('Invalid expression in {}: {}'.format(location, argument))
+            tokens.append(match.group(1))
+            position = match.end()
+            while position < len(argument) and argument[position].isspace():
+                position += 1
+
+        expression = list()
+        iToken = 0
+        while iToken < len(tokens):
+            token = tokens[iToken]
+            iToken += 1
+            if token == 'defined':
+                names = tokens[iToken:iToken + 3]
+                if len(names) == 3 and names[0] == '(' and names[2] == ')':
+                    name = names[1]
+                    iToken += 3
+                elif iToken < len(tokens):
+                    name = tokens[iToken]
+                    iToken += 1
+                else:
+                    raise ValueError('Invalid defined() in {}'.format(location))
+                expression.append(str(name in self.definitions))
+            elif token[0].isalpha() or token[0] == '_':
+                # Undefined macros are 0, as in the C preprocessor.
+                expression.append(self._getMacroLiteral(token))
+            elif token == '&&':
+                expression.append(' and ')
+            elif token == '||':
+                expression.append(' or ')
+            elif token == '!':
+                expression.append(' not ')
+            else:
+                expression.append(token)
+
+        try:
+            return bool(eval(''.join(expression), {'__builtins__': {}}, dict()))
+        except Exception:
+            raise ValueError('Invalid expression in {}: {}'.format(location, argument))
+
+    def _getMacroLiteral(self, name):
+        ''' Python literal of the value of a macro in an expression. '''
+        if name not in self.definitions:
+            return '0'
+        value = self.definitions[name].strip()
+        if value == '':
+            return '1'
+        try:
+            float(value)
+            return value
+        except ValueError:
+            return repr(value.strip('"'))
+
+# END of _SimtelConfigReader